@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'TRCF ZKTeco Attendance Sync',
-    'version': '1.0.0',
+    'version': '1.1.0',
     'category': 'Human Resources/Attendances',
     'summary': 'Đồng bộ dữ liệu chấm công từ thiết bị ZKTeco',
     'description': """
@@ -13,12 +13,15 @@
         * Quản lý danh sách thiết bị ZKTeco
         * Kết nối và kiểm tra trạng thái thiết bị
         * Đồng bộ dữ liệu chấm công
+        * Nhập file chấm công xuất từ máy ra USB
+        * Lưu trữ nén chấm công cũ, khôi phục khi cần
         * Tự động cập nhật thông tin thiết bị
         * Theo dõi lịch sử đồng bộ
         
         Yêu cầu:
         --------
         * Python library: pyzk (pip install pyzk)
+        * Tuỳ chọn: numpy (pip install numpy) để ghép cặp chấm công nhanh hơn
         * Thiết bị ZKTeco hỗ trợ giao thức TCP/IP
     """,
     'author': 'Tuấn Rang Cà Phê',
@@ -33,7 +36,16 @@
     },
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
+        'data/trcf_payroll_summary_data.xml',
+        'wizard/trcf_zkteco_attlog_import_wizard_views.xml',
+        'wizard/trcf_attendance_payroll_export_wizard_views.xml',
         'views/trcf_zkteco_device_views.xml',
+        'views/trcf_zkteco_sync_job_views.xml',
+        'views/trcf_zkteco_sync_run_views.xml',
+        'views/trcf_zkteco_punch_views.xml',
+        'views/trcf_attendance_payroll_summary_views.xml',
+        'views/trcf_attendance_archive_views.xml',
         'views/trcf_menu_views.xml',
         'views/trcf_hr_attendance_views.xml',
         'views/trcf_hr_employee_views.xml',
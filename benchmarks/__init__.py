@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+# Benchmark đồng bộ chấm công với thiết bị ZKTeco giả lập (không được nạp cùng module Odoo).
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Đo thời gian từng giai đoạn đồng bộ chấm công với thiết bị giả lập.
+
+Chạy độc lập (không cần Odoo) cho các giai đoạn fetch / decode / pair::
+
+    python -m benchmarks.bench_sync --sizes 1000 10000 100000
+
+Chạy trong ``odoo-bin shell`` để đo thêm stage / ghép cặp / ghi trên database
+(mọi dữ liệu tạo ra được rollback)::
+
+    from odoo.addons.trcf_zkteco_attendance_sync.benchmarks import bench_sync
+    bench_sync.run_odoo(env, sizes=[1000, 10000])
+"""
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    from ..lib import attendance_decoder, device_io, punch_pairing
+    from ..lib.sync_profiler import SyncProfiler
+    from .fake_device import FakeDevice
+except ImportError:
+    # Chạy bằng python -m benchmarks.bench_sync từ thư mục module
+    from lib import attendance_decoder, device_io, punch_pairing
+    from lib.sync_profiler import SyncProfiler
+    from benchmarks.fake_device import FakeDevice
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+LEGACY_MAX_SIZE = 10000  # pyzk get_attendance tốn O(n^2) khi cắt buffer, không chạy với dữ liệu lớn hơn
+PAIRING_PHASES = ('pair', 'dedupe', 'create')  # Giai đoạn SyncProfiler trong _pair_dirty_punches
+
+
+class PhaseTimer:
+    """Ghi lại thời gian của từng giai đoạn"""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, count=None):
+        started = time.perf_counter()
+        yield
+        self.phases.append((name, time.perf_counter() - started, count))
+
+    def add_profiler(self, prefix, profiler, names, total, count=None):
+        """Thêm các giai đoạn của SyncProfiler, phần còn lại của total ghi là '<prefix>: khác'"""
+        for name in names:
+            self.phases.append((f'{prefix}: {name}', profiler.phases.get(name, 0.0), count))
+        other = total - sum(profiler.phases.get(name, 0.0) for name in names)
+        self.phases.append((f'{prefix}: khác', max(0.0, other), count))
+
+
+def make_device(size, users=None, days=30, duplicate_rate=0.1, latency=0.0, bandwidth=None):
+    """Thiết bị giả lập với size lần chấm công"""
+    users = users or max(10, min(300, size // 60))
+    return FakeDevice(users=users, punches=size, days=days, duplicate_rate=duplicate_rate,
+                      latency=latency, bandwidth=bandwidth)
+
+
+def bench_pure(size, timer, legacy=True, **device_kwargs):
+    """Các giai đoạn không cần ORM, trả về (thiết bị, PunchBuffer)"""
+    device = make_device(size, **device_kwargs)
+    params = device_io.DeviceParams(0, 'fake', 4370, 5)
+    conn = device.connect(params)
+
+    with timer.phase('fetch', size):
+        data, record_count = attendance_decoder.read_attendance_buffer(conn)
+
+    punches = punch_pairing.PunchBuffer()
+    with timer.phase('decode', size):
+        attendance_decoder.decode_attendance(data, record_count, punches)
+
+    if legacy and size <= LEGACY_MAX_SIZE:
+        try:
+            from zk.base import ZK
+        except ImportError:
+            pass
+        else:
+            with timer.phase('decode (pyzk get_attendance)', size):
+                ZK.get_attendance(conn)
+
+    with timer.phase('pair', size):
+        punch_pairing.pair_punches(punches.user_codes, punches.epochs, 15 * 60)
+    return device, punches
+
+
+class _Rollback(Exception):
+    pass
+
+
+def bench_odoo(env, size, timer, **device_kwargs):
+    """Các giai đoạn ghi database: lưu bảng tạm, ghép cặp / dò trùng / ghi các ngày mới, đồng bộ lại khi không có gì mới.
+
+    Thời gian ghép cặp các ngày được tách theo giai đoạn của SyncProfiler (pair, dedupe, create);
+    'khác' là phần đọc bảng tạm và đánh dấu đã ghép cặp.
+    """
+    device, punches = bench_pure(size, timer, legacy=False, **device_kwargs)
+    try:
+        with env.cr.savepoint():
+            env['hr.employee'].create([
+                {'name': user.name, 'trcf_device_id_num': user.user_id} for user in device.users
+            ])
+            zk_device = env['trcf.zkteco.device'].create({'name': 'Benchmark', 'ip_address': 'fake'})
+            Punch = env['trcf.zkteco.punch']
+
+            with timer.phase('stage', size):
+                Punch._ingest(zk_device, punches)
+            profiler = SyncProfiler(zk_device.name)
+            started = time.perf_counter()
+            zk_device._pair_dirty_punches(profiler=profiler)
+            timer.add_profiler('pair dirty days', profiler, PAIRING_PHASES, time.perf_counter() - started, size)
+            with timer.phase('stage (all existing)', size):
+                Punch._ingest(zk_device, punches)
+            with timer.phase('pair dirty days (none)', size):
+                zk_device._pair_dirty_punches()
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def report(size, timer, out=sys.stdout):
+    out.write(f'\n=== {size} lần chấm công ===\n')
+    for name, seconds, count in timer.phases:
+        rate = f'{count / seconds:,.0f}/s' if count and seconds else ''
+        out.write(f'  {name:<32} {seconds * 1000:>10.1f} ms  {rate:>14}\n')
+
+
+def run(sizes=DEFAULT_SIZES, out=sys.stdout, **device_kwargs):
+    for size in sizes:
+        timer = PhaseTimer()
+        bench_pure(size, timer, **device_kwargs)
+        report(size, timer, out)
+
+
+def run_odoo(env, sizes=(1000, 10000), out=sys.stdout, **device_kwargs):
+    for size in sizes:
+        timer = PhaseTimer()
+        bench_odoo(env, size, timer, **device_kwargs)
+        report(size, timer, out)
+
+
+def bench_parallel(devices=8, size=10000, latency=0.05, bandwidth=2_000_000, workers=8, out=sys.stdout):
+    """So sánh tải tuần tự và song song nhiều thiết bị qua đường truyền chậm"""
+    fakes = {index: make_device(size, latency=latency, bandwidth=bandwidth) for index in range(devices)}
+    device_io.connection_factory = lambda params: fakes[params.device_id].connect(params)
+    try:
+        jobs = {index: (device_io.DeviceParams(index, f'fake-{index}', 4370, 5),) for index in fakes}
+        timer = PhaseTimer()
+        with timer.phase(f'fetch {devices} devices, 1 worker', devices * size):
+            device_io.run_parallel(device_io.fetch_attendance, jobs, 1)
+        device_io.close_idle_sessions()
+        with timer.phase(f'fetch {devices} devices, {workers} workers', devices * size):
+            device_io.run_parallel(device_io.fetch_attendance, jobs, workers)
+        device_io.close_idle_sessions()
+        report(size, timer, out)
+    finally:
+        device_io.connection_factory = None
+
+
+def bench_merge(devices=40, size=10000, out=sys.stdout):
+    """Gộp lần chấm của nhiều thiết bị: k-way merge + ghép cặp đã sắp so với nối rồi sắp xếp"""
+    streams = []
+    for index in range(devices):
+        conn = make_device(size).connect()
+        data, record_count = attendance_decoder.read_attendance_buffer(conn)
+        punches = punch_pairing.PunchBuffer()
+        attendance_decoder.decode_attendance(data, record_count, punches)
+        # Bảng tạm trả về từng thiết bị theo thứ tự (ID trên máy, thời điểm)
+        streams.append(sorted(
+            (punches.user_ids[code], epoch, index) for code, epoch in zip(punches.user_codes, punches.epochs)))
+
+    total = devices * size
+    timer = PhaseTimer()
+    with timer.phase(f'merge {devices} devices (k-way)', total):
+        merged, _sources = punch_pairing.merge_streams(streams)
+    with timer.phase('pair merged (presorted)', total):
+        punch_pairing.pair_punches(merged.user_codes, merged.epochs, 15 * 60, presorted=True)
+    with timer.phase(f'concat {devices} devices', total):
+        concatenated = punch_pairing.PunchBuffer()
+        for stream in streams:
+            for user_id, epoch, _source in stream:
+                concatenated.append_epoch(user_id, epoch)
+    with timer.phase('pair concatenated (sort)', total):
+        punch_pairing.pair_punches(concatenated.user_codes, concatenated.epochs, 15 * 60)
+    report(total, timer, out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--parallel', type=int, default=0, help='số thiết bị cho phép đo tải song song')
+    parser.add_argument('--merge', type=int, default=0, help='số thiết bị cho phép đo gộp lần chấm')
+    args = parser.parse_args(argv)
+    run(args.sizes, days=args.days, duplicate_rate=args.duplicate_rate)
+    if args.parallel:
+        bench_parallel(devices=args.parallel)
+    if args.merge:
+        bench_merge(devices=args.merge)
+
+
+if __name__ == '__main__':
+    main()
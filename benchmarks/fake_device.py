@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Thiết bị ZKTeco giả lập dùng thay pyzk khi benchmark.
+
+FakeZKConnection có các method pyzk mà module dùng đến (read_sizes, get_users,
+read_with_buffer, get_time/set_time, ...). Nhật ký chấm công được sinh sẵn ở đúng định dạng
+nhị phân 40 byte của thiết bị nên đi qua cùng đường giải mã với thiết bị thật.
+
+Dùng với device_io::
+
+    device = FakeDevice(users=300, punches=10000, days=30)
+    device_io.connection_factory = device.connect
+"""
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from struct import pack
+
+FakeUser = namedtuple('FakeUser', ['uid', 'name', 'privilege', 'password', 'group_id', 'user_id', 'card'])
+
+
+def encode_time(timestamp):
+    """Nén datetime theo định dạng thời điểm của ZKTeco"""
+    return (
+        ((timestamp.year % 100) * 12 * 31 + (timestamp.month - 1) * 31 + timestamp.day - 1) * 86400
+        + (timestamp.hour * 60 + timestamp.minute) * 60 + timestamp.second
+    )
+
+
+class FakeDevice:
+    """Dữ liệu của một thiết bị giả lập.
+
+    :param users: số user trên máy
+    :param punches: số lần chấm công cần sinh
+    :param days: số ngày tính từ start mà các lần chấm công trải ra
+    :param duplicate_rate: xác suất một lần chấm bị lặp (người dùng bấm nhiều lần liền nhau)
+    :param latency: độ trễ (giây) giả lập cho mỗi lệnh gửi đến máy
+    :param bandwidth: tốc độ truyền (byte/giây) giả lập khi tải buffer, None = không giới hạn
+    """
+
+    def __init__(self, users=100, punches=1000, days=30, duplicate_rate=0.1, start=None,
+                 seed=0, latency=0.0, bandwidth=None, serial_number='FAKE0001'):
+        self.rng = random.Random(seed)
+        self.start = start or datetime(2025, 1, 1)
+        self.days = days
+        self.duplicate_rate = duplicate_rate
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.serial_number = serial_number
+        self.users = [
+            FakeUser(uid, f'User {uid}', 0, '', '', str(1000 + uid), 0)
+            for uid in range(1, users + 1)
+        ]
+        self.punches = self._generate_punches(punches)
+        self.clock_offset = timedelta(0)
+
+    def _generate_punches(self, count):
+        """Sinh (user, thời điểm) theo ca: vào ~8h, ra sau ~8h, kèm các lần bấm lặp"""
+        punches = []
+        while len(punches) < count:
+            user = self.rng.choice(self.users)
+            day = self.start + timedelta(days=self.rng.randrange(self.days))
+            check_in = day + timedelta(seconds=int(self.rng.gauss(8 * 3600, 3600)) % 43200)
+            check_out = check_in + timedelta(seconds=int(abs(self.rng.gauss(8 * 3600, 5400))))
+            for timestamp in (check_in, check_out):
+                if timestamp.date() != day.date():
+                    continue
+                punches.append((user, timestamp))
+                while self.rng.random() < self.duplicate_rate:
+                    timestamp += timedelta(seconds=self.rng.randint(1, 120))
+                    punches.append((user, timestamp))
+        punches = punches[:count]
+        punches.sort(key=lambda punch: punch[1])
+        return punches
+
+    def attendance_buffer(self):
+        """Nhật ký chấm công dạng nhị phân (4 byte tổng kích thước + các bản ghi 40 byte)"""
+        records = b''.join(
+            pack('<H24sBIB8s', user.uid, user.user_id.encode(), 1, encode_time(timestamp), 0, b'')
+            for user, timestamp in self.punches
+        )
+        return pack('<I', len(records)) + records
+
+    def connect(self, params=None):
+        """Dùng làm device_io.connection_factory"""
+        return FakeZKConnection(self)
+
+
+class FakeZKConnection:
+    """Kết nối giả lập, cùng các method pyzk mà module sử dụng"""
+
+    verbose = False
+
+    def __init__(self, device):
+        self.device = device
+        self.is_connect = True
+        self.is_enabled = True
+        self.users = 0
+        self.fingers = 0
+        self.records = 0
+        self._buffer = None
+        self._wait()
+
+    def _wait(self, size=0):
+        delay = self.device.latency
+        if self.device.bandwidth and size:
+            delay += size / self.device.bandwidth
+        if delay:
+            time.sleep(delay)
+
+    def disconnect(self):
+        self.is_connect = False
+
+    def disable_device(self):
+        self._wait()
+        self.is_enabled = False
+
+    def enable_device(self):
+        self._wait()
+        self.is_enabled = True
+
+    def get_serialnumber(self):
+        self._wait()
+        return self.device.serial_number
+
+    def get_firmware_version(self):
+        self._wait()
+        return 'Ver 6.60 (fake)'
+
+    def get_time(self):
+        self._wait()
+        return datetime.now().replace(microsecond=0) + self.device.clock_offset
+
+    def set_time(self, timestamp):
+        self._wait()
+        self.device.clock_offset = timestamp - datetime.now().replace(microsecond=0)
+
+    def read_sizes(self):
+        self._wait()
+        self.users = len(self.device.users)
+        self.records = len(self.device.punches)
+        return True
+
+    def get_users(self):
+        self._wait(len(self.device.users) * 72)
+        return list(self.device.users)
+
+    def read_with_buffer(self, command, fct=0, ext=0):
+        if self._buffer is None:
+            self._buffer = self.device.attendance_buffer()
+        self._wait(len(self._buffer))
+        return self._buffer, len(self._buffer)
+
+    def clear_attendance(self):
+        self._wait()
+        self.device.punches = []
+        self._buffer = None
+        return True
+
+    def _ZK__decode_time(self, packed):
+        """Cho phép gọi zk.base.ZK.get_attendance trên kết nối giả lập (để so sánh)"""
+        from struct import unpack
+
+        packed = unpack('<I', packed)[0]
+        second = packed % 60
+        packed //= 60
+        minute = packed % 60
+        packed //= 60
+        hour = packed % 24
+        packed //= 24
+        day = packed % 31 + 1
+        packed //= 31
+        month = packed % 12 + 1
+        year = packed // 12 + 2000
+        return datetime(year, month, day, hour, minute, second)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from werkzeug.exceptions import BadRequest
+
+from odoo import fields, http
+from odoo.http import request, content_disposition
+
+from ..lib import payroll_export
+
+EXPORT_BATCH_SIZE = 2000  # Số dòng đọc từ server-side cursor mỗi lần
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv;charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class TrcfPayrollExportController(http.Controller):
+
+    @http.route('/trcf_zkteco_attendance_sync/payroll_export', type='http', auth='user')
+    def payroll_export(self, date_from, date_to, file_format='csv', employee_ids='', subtotals='', **kwargs):
+        """Xuất chấm công và tiền lương dạng CSV/XLSX, đọc và gửi theo từng lô.
+
+        Dữ liệu được đọc bằng server-side cursor trên một cursor riêng (cursor của request
+        đã đóng khi body được gửi), nên bộ nhớ dùng không phụ thuộc số dòng xuất.
+        Khoảng ngày tính theo ngày vào theo timezone của từng nhân viên.
+        """
+        if file_format not in EXPORT_MIMETYPES:
+            file_format = 'csv'
+        try:
+            date_from = fields.Date.to_date(date_from)
+            date_to = fields.Date.to_date(date_to)
+            employee_ids = [int(employee_id) for employee_id in employee_ids.split(',') if employee_id.strip()]
+        except ValueError:
+            raise BadRequest('Tham số xuất lương không hợp lệ')
+        if not date_from or not date_to or date_from > date_to:
+            raise BadRequest('Khoảng ngày xuất lương không hợp lệ')
+
+        # Lọc thô theo UTC (dùng được index check_in), rộng hơn một ngày mỗi đầu để gồm mọi
+        # timezone; ngày theo giờ địa phương được lọc chính xác trong câu SQL xuất
+        domain = [
+            ('check_in', '>=', fields.Datetime.to_datetime(date_from) - timedelta(days=1)),
+            ('check_in', '<', fields.Datetime.to_datetime(date_to) + timedelta(days=2)),
+        ]
+        if employee_ids:
+            domain.append(('employee_id', 'in', employee_ids))
+        export_sql = request.env['hr.attendance']._get_payroll_export_sql(domain, date_from, date_to)
+
+        batches = self._iter_export_batches(request.env.registry, export_sql)
+        if subtotals:
+            batches = payroll_export.with_subtotals(batches)
+        writer = payroll_export.iter_xlsx if file_format == 'xlsx' else payroll_export.iter_csv
+        filename = f'cham_cong_luong_{date_from}_{date_to}.{file_format}'
+        return request.make_response(writer(batches), headers=[
+            ('Content-Type', EXPORT_MIMETYPES[file_format]),
+            ('Content-Disposition', content_disposition(filename)),
+            ('X-Accel-Buffering', 'no'),
+        ])
+
+    @staticmethod
+    def _iter_export_batches(registry, export_sql):
+        """Đọc kết quả câu SQL theo lô EXPORT_BATCH_SIZE dòng bằng server-side (named) cursor"""
+        with registry.cursor() as cr:
+            with cr._cnx.cursor('trcf_payroll_export') as server_cursor:
+                server_cursor.itersize = EXPORT_BATCH_SIZE
+                server_cursor.execute(export_sql.code, export_sql.params)
+                while rows := server_cursor.fetchmany(EXPORT_BATCH_SIZE):
+                    yield rows
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+# Các module trong lib/ không phụ thuộc ORM Odoo, có thể import và kiểm thử độc lập.
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Nén/giải nén chấm công của một nhân viên trong một tháng, không phụ thuộc Odoo.
+
+Các phiên được lưu theo cột (mảng giờ vào, mảng giờ ra, ...) rồi nén zlib: giá trị cùng cột
+gần giống nhau nên nén tốt hơn nhiều so với lưu từng dòng.
+"""
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+from struct import Struct
+
+ARCHIVE_FORMAT_VERSION = 1
+NO_CHECK_OUT = -1  # Giờ ra rỗng
+
+FLAG_GENERATED = 1
+FLAG_AUTO_CLOSED = 2
+FLAG_MANUAL_EDIT = 4
+
+ArchivedAttendance = namedtuple(
+    'ArchivedAttendance', ['check_in', 'check_out', 'worked_hours', 'salary', 'device_id', 'flags'])
+
+# (cột, kiểu array) theo thứ tự lưu; thời điểm là epoch UTC
+_COLUMN_TYPES = ('q', 'q', 'd', 'd', 'q', 'B')
+_HEADER = Struct('<BI')  # phiên bản, số phiên
+
+
+def pack(rows):
+    """list ArchivedAttendance -> bytes đã nén"""
+    chunks = [_HEADER.pack(ARCHIVE_FORMAT_VERSION, len(rows))]
+    for index, typecode in enumerate(_COLUMN_TYPES):
+        column = array(typecode, (row[index] for row in rows))
+        if sys.byteorder == 'big':
+            column.byteswap()
+        chunks.append(column.tobytes())
+    return zlib.compress(b''.join(chunks), 9)
+
+
+def unpack(blob):
+    """bytes đã nén -> list ArchivedAttendance"""
+    data = zlib.decompress(blob)
+    version, count = _HEADER.unpack_from(data)
+    if version != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f'Không đọc được dữ liệu lưu trữ phiên bản {version}')
+    offset = _HEADER.size
+    columns = []
+    for typecode in _COLUMN_TYPES:
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(data[offset:offset + size])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns.append(column)
+        offset += size
+    return [ArchivedAttendance(*values) for values in zip(*columns)]
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Giải mã nhật ký chấm công thô của thiết bị ZKTeco vào PunchBuffer, không phụ thuộc Odoo.
+
+Thay cho ``conn.get_attendance()`` của pyzk (tạo một object Attendance cho mỗi bản ghi,
+cắt buffer sau mỗi bản ghi và dò user bằng vòng lặp): buffer được đọc tuần tự qua
+memoryview, thời điểm được giải mã thẳng ra epoch và lọc theo khoảng ngày ngay khi giải mã,
+chỉ các bản ghi cần dùng mới được giữ lại dưới dạng mảng gọn.
+"""
+from datetime import date
+from struct import Struct, unpack_from
+
+from .punch_pairing import EPOCH, SECONDS_PER_DAY
+
+CMD_ATTLOG_RRQ = 13  # zk.const.CMD_ATTLOG_RRQ
+
+# Định dạng bản ghi theo kích thước (giống pyzk); thời điểm được đọc dạng uint32 đã nén
+RECORD_STRUCTS = {
+    8: Struct('<HBIB'),  # uid, status, timestamp, punch
+    16: Struct('<IIBB2sI'),  # user_id, timestamp, status, punch, reserved, workcode
+    40: Struct('<H24sBIB8s'),  # uid, user_id, status, timestamp, punch, space
+}
+
+_EPOCH_ORDINAL = EPOCH.toordinal()
+_OUT_OF_RANGE = object()
+
+
+def read_attendance_buffer(conn):
+    """Đọc buffer nhật ký chấm công thô từ thiết bị.
+
+    :return: (buffer bytes, số bản ghi trên máy)
+    """
+    conn.read_sizes()
+    if not conn.records:
+        return b'', 0
+    data, size = conn.read_with_buffer(CMD_ATTLOG_RRQ)
+    if size < 4:
+        return b'', conn.records
+    return data, conn.records
+
+
+def record_size_of(data, record_count):
+    """Kích thước mỗi bản ghi trong buffer (8, 16 hoặc 40 byte)"""
+    if len(data) < 4 or not record_count:
+        return 0
+    total_size = unpack_from('<I', data)[0]
+    for record_size in (8, 16):
+        if total_size == record_size * record_count:
+            return record_size
+    return 40
+
+
+def packed_day_to_epoch(packed_day, date_from=None, date_to=None):
+    """Số giây đầu ngày (kể từ EPOCH) của phần ngày trong thời điểm đã nén.
+
+    Thời điểm nén của ZKTeco là ((((năm-2000)*12 + tháng-1)*31 + ngày-1)*24 + giờ)*60 + phút)*60 + giây,
+    nên ``packed // 86400`` là phần ngày và ``packed % 86400`` là số giây trong ngày.
+
+    :return: None nếu ngày không hợp lệ hoặc nằm ngoài [date_from, date_to]
+    """
+    day = packed_day % 31 + 1
+    packed_day //= 31
+    month = packed_day % 12 + 1
+    year = packed_day // 12 + 2000
+    try:
+        punch_date = date(year, month, day)
+    except ValueError:
+        return None
+    if (date_from and punch_date < date_from) or (date_to and punch_date > date_to):
+        return None
+    return (punch_date.toordinal() - _EPOCH_ORDINAL) * SECONDS_PER_DAY
+
+
+def decode_attendance(data, record_count, punches, date_from=None, date_to=None, users_by_uid=None):
+    """Giải mã buffer nhật ký chấm công và thêm các lần chấm trong khoảng ngày vào punches.
+
+    :param data: buffer đọc bằng read_attendance_buffer (hoặc file xuất từ máy cùng định dạng)
+    :param punches: punch_pairing.PunchBuffer nhận kết quả
+    :param users_by_uid: dict uid -> user_id, chỉ cần cho định dạng 8 byte
+    :return: số bản ghi đã thêm
+    """
+    record_size = record_size_of(data, record_count)
+    if not record_size:
+        return 0
+    return decode_records(memoryview(data)[4:], record_size, punches, date_from, date_to, users_by_uid)
+
+
+def decode_records(view, record_size, punches, date_from=None, date_to=None, users_by_uid=None):
+    """Giải mã dãy bản ghi cùng kích thước (không có 4 byte tổng kích thước ở đầu).
+
+    :param view: bytes/memoryview/mmap chứa các bản ghi; phần lẻ cuối buffer bị bỏ qua
+    :return: số bản ghi đã thêm
+    """
+    record_struct = RECORD_STRUCTS[record_size]
+    view = memoryview(view)
+    view = view[:len(view) - len(view) % record_size]
+
+    day_epochs = {}
+    user_ids = {}
+    users_by_uid = users_by_uid or {}
+    append = punches.append_epoch
+    added = 0
+    for record in record_struct.iter_unpack(view):
+        if record_size == 40:
+            raw_user_id, packed = record[1], record[3]
+        elif record_size == 16:
+            raw_user_id, packed = record[0], record[1]
+        else:
+            raw_user_id, packed = record[0], record[2]
+
+        packed_day = packed // SECONDS_PER_DAY
+        day_epoch = day_epochs.get(packed_day, _OUT_OF_RANGE)
+        if day_epoch is _OUT_OF_RANGE:
+            day_epoch = day_epochs[packed_day] = packed_day_to_epoch(packed_day, date_from, date_to)
+        if day_epoch is None:
+            continue
+
+        user_id = user_ids.get(raw_user_id)
+        if user_id is None:
+            if record_size == 40:
+                user_id = raw_user_id.split(b'\x00')[0].decode(errors='ignore')
+            elif record_size == 16:
+                user_id = str(raw_user_id)
+            else:
+                user_id = str(users_by_uid.get(raw_user_id, raw_user_id))
+            user_ids[raw_user_id] = user_id
+
+        append(user_id, day_epoch + packed % SECONDS_PER_DAY)
+        added += 1
+    return added
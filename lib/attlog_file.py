@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Đọc file nhật ký chấm công xuất từ thiết bị (USB), không phụ thuộc Odoo.
+
+Hỗ trợ:
+
+* ``text``: attlog.dat dạng văn bản, mỗi dòng ``user_id<TAB>YYYY-MM-DD HH:MM:SS<TAB>...``
+* ``buffer``: nhật ký nhị phân như khi tải qua mạng (4 byte tổng kích thước + các bản ghi 8/16/40 byte)
+* ``records``: các bản ghi nhị phân 40 byte liền nhau, không có phần đầu
+
+File được đọc tuần tự (văn bản theo dòng, nhị phân qua mmap) và trả về từng lô
+PunchBuffer, nên bộ nhớ dùng không tăng theo kích thước file.
+"""
+import mmap
+import re
+from datetime import date
+from struct import unpack_from
+
+from . import attendance_decoder
+from .punch_pairing import EPOCH, SECONDS_PER_DAY, PunchBuffer
+
+ATTLOG_BATCH_SIZE = 20000  # Số lần chấm mỗi lô trả về
+_HEAD_SIZE = 256
+_TEXT_LINE = re.compile(rb'\s*[^\t\r\n]+\t\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+_USER_ID_FIELD = re.compile(rb'[\x20-\x7e]*\x00*$')
+_EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def detect_format(head, size):
+    """Nhận dạng định dạng file từ các byte đầu và kích thước file.
+
+    :return: 'text', 'buffer' hoặc 'records'
+    :raise ValueError: không nhận ra định dạng
+    """
+    if size > 4 and len(head) >= 4 and unpack_from('<I', head)[0] == size - 4:
+        return 'buffer'
+    if _TEXT_LINE.match(head):
+        return 'text'
+    if size and size % 40 == 0 and _is_record(head, 40):
+        return 'records'
+    raise ValueError('Không nhận ra định dạng file chấm công')
+
+
+def _is_record(view, record_size):
+    """Bản ghi đầu tiên có thời điểm hợp lệ (và ID dạng chuỗi với bản ghi 40 byte)"""
+    if len(view) < record_size:
+        return False
+    record = attendance_decoder.RECORD_STRUCTS[record_size].unpack_from(view)
+    if record_size == 40:
+        if not _USER_ID_FIELD.match(bytes(record[1])):
+            return False
+        packed = record[3]
+    elif record_size == 16:
+        packed = record[1]
+    else:
+        packed = record[2]
+    return attendance_decoder.packed_day_to_epoch(packed // SECONDS_PER_DAY) is not None
+
+
+def guess_record_size(view, total_size):
+    """Kích thước bản ghi của vùng dữ liệu nhị phân dài total_size byte"""
+    for record_size in (40, 16, 8):
+        if total_size % record_size == 0 and _is_record(view, record_size):
+            return record_size
+    raise ValueError('Không nhận ra kích thước bản ghi chấm công')
+
+
+def iter_punches(fileobj, date_from=None, date_to=None, users_by_uid=None, batch_size=ATTLOG_BATCH_SIZE):
+    """Đọc file chấm công, trả về từng lô PunchBuffer các lần chấm trong [date_from, date_to].
+
+    :param fileobj: file nhị phân (mở bằng 'rb'), đọc được từ đầu
+    :param users_by_uid: dict uid -> user_id, chỉ cần cho bản ghi 8 byte
+    """
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    head = fileobj.read(_HEAD_SIZE)
+    fileobj.seek(0)
+    file_format = detect_format(head, size)
+    if file_format == 'text':
+        yield from _iter_text(fileobj, date_from, date_to, batch_size)
+        return
+
+    offset = 4 if file_format == 'buffer' else 0
+    with _map(fileobj) as data, memoryview(data) as view:
+        record_size = guess_record_size(view[offset:], size - offset) if offset else 40
+        step = batch_size * record_size
+        for start in range(offset, size, step):
+            punches = PunchBuffer()
+            attendance_decoder.decode_records(
+                view[start:start + step], record_size, punches, date_from, date_to, users_by_uid)
+            if len(punches):
+                yield punches
+
+
+class _map:
+    """mmap chỉ đọc của file; file không có fileno (vd. BytesIO) thì đọc toàn bộ nội dung"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.data = None
+
+    def __enter__(self):
+        try:
+            self.data = mmap.mmap(self.fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            getbuffer = getattr(self.fileobj, 'getbuffer', None)
+            return getbuffer() if getbuffer else self.fileobj.read()
+        return self.data
+
+    def __exit__(self, *exc_info):
+        if self.data is not None:
+            self.data.close()
+
+
+def _iter_text(fileobj, date_from, date_to, batch_size):
+    day_epochs = {}
+    punches = PunchBuffer()
+    for line in fileobj:
+        fields = line.split(b'\t', 2)
+        if len(fields) < 2 or len(fields[1]) < 19:
+            continue
+        user_id = fields[0].strip().decode(errors='ignore')
+        timestamp = fields[1]
+        day_key = timestamp[:10]
+        day_epoch = day_epochs.get(day_key, False)
+        if day_epoch is False:
+            day_epoch = day_epochs[day_key] = _day_epoch(day_key, date_from, date_to)
+        if day_epoch is None or not user_id:
+            continue
+        try:
+            seconds = int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+        except ValueError:
+            continue
+        punches.append_epoch(user_id, day_epoch + seconds)
+        if len(punches) >= batch_size:
+            yield punches
+            punches = PunchBuffer()
+    if len(punches):
+        yield punches
+
+
+def _day_epoch(day_key, date_from, date_to):
+    """'YYYY-MM-DD' -> số giây đầu ngày kể từ EPOCH, None nếu không hợp lệ hoặc ngoài khoảng ngày"""
+    try:
+        punch_date = date(int(day_key[:4]), int(day_key[5:7]), int(day_key[8:10]))
+    except ValueError:
+        return None
+    if (date_from and punch_date < date_from) or (date_to and punch_date > date_to):
+        return None
+    return (punch_date.toordinal() - _EPOCH_ORDINAL) * SECONDS_PER_DAY
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""Giao tiếp với thiết bị ZKTeco (pyzk), không phụ thuộc ORM Odoo.
+
+Các hàm ở đây chỉ nhận tham số thuần (DeviceParams) nên chạy được trong thread riêng;
+toàn bộ việc ghi ORM được thực hiện ở thread chính.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytz
+
+from . import attendance_decoder, roster as device_roster
+from .punch_pairing import PunchBuffer
+from .sync_profiler import SyncProfiler
+
+_logger = logging.getLogger(__name__)
+
+DeviceParams = namedtuple('DeviceParams', ['device_id', 'ip_address', 'port', 'timeout'])
+
+# Kết quả tải dữ liệu: punches (PunchBuffer) là None nếu số bản ghi trên máy không đổi (bỏ qua tải).
+# time_info là kết quả sync_device_time nếu có đặt giờ trong cùng phiên.
+# roster là roster.Roster mới nếu phải tải lại bảng user trong phiên, để lưu đệm lại.
+FetchResult = namedtuple('FetchResult', ['records', 'punches', 'time_info', 'roster'], defaults=(None,))
+
+# Kết quả đẩy nhân viên lên máy: roster sau khi thêm/xoá và số user đã thêm/xoá
+PushResult = namedtuple('PushResult', ['roster', 'added', 'removed'])
+
+# Phiên kết nối đang rảnh được giữ lại ngắn hạn để thao tác kế tiếp dùng lại,
+# tránh bắt tay lại với thiết bị (máy chỉ nhận vài phiên đồng thời).
+# Phiên hết hạn được đóng bởi thread hẹn giờ, kể cả khi không còn thao tác nào sau đó.
+SESSION_IDLE_SECONDS = 15
+
+_idle_sessions = {}  # (ip_address, port) -> (conn, hết hạn lúc)
+_idle_sessions_lock = threading.Lock()
+_idle_reaper = None  # threading.Timer đóng phiên rảnh hết hạn
+
+
+# Hàm tạo kết nối thay cho pyzk, nhận DeviceParams (vd. thiết bị giả lập khi benchmark).
+# None = kết nối thật bằng pyzk.
+connection_factory = None
+
+
+def connect(params):
+    """Mở kết nối đến thiết bị, raise ConnectionError nếu không kết nối được"""
+    if connection_factory is not None:
+        conn = connection_factory(params)
+    else:
+        from zk import ZK
+
+        conn = ZK(params.ip_address, port=params.port, timeout=params.timeout).connect()
+    if not conn:
+        raise ConnectionError('Không thể kết nối đến thiết bị')
+    return conn
+
+
+def _disconnect(conn):
+    try:
+        conn.disconnect()
+    except Exception:
+        pass
+
+
+def _pop_expired_sessions(now):
+    """Lấy ra các phiên rảnh đã hết hạn (gọi khi đang giữ lock)"""
+    expired = [key for key, (conn, expires_at) in _idle_sessions.items() if expires_at <= now]
+    return [_idle_sessions.pop(key)[0] for key in expired]
+
+
+def _checkout(params):
+    """Lấy phiên rảnh của thiết bị nếu còn hạn, không thì kết nối mới"""
+    now = time.monotonic()
+    with _idle_sessions_lock:
+        expired = _pop_expired_sessions(now)
+        conn, _expires_at = _idle_sessions.pop((params.ip_address, params.port), (None, None))
+    for expired_conn in expired:
+        _disconnect(expired_conn)
+    if conn is not None and getattr(conn, 'is_connect', True):
+        return conn
+    return connect(params)
+
+
+def _checkin(params, conn):
+    """Trả phiên về pool; nếu thiết bị đã có phiên rảnh khác thì đóng phiên này"""
+    now = time.monotonic()
+    key = (params.ip_address, params.port)
+    with _idle_sessions_lock:
+        expired = _pop_expired_sessions(now)
+        if key in _idle_sessions:
+            expired.append(conn)
+        else:
+            _idle_sessions[key] = (conn, now + SESSION_IDLE_SECONDS)
+            _schedule_reaper(now)
+    for expired_conn in expired:
+        _disconnect(expired_conn)
+
+
+def _schedule_reaper(now):
+    """Hẹn giờ đóng phiên rảnh hết hạn sớm nhất nếu chưa có thread hẹn giờ (gọi khi đang giữ lock)"""
+    global _idle_reaper
+    if _idle_reaper is not None or not _idle_sessions:
+        return
+    next_expiry = min(expires_at for _conn, expires_at in _idle_sessions.values())
+    _idle_reaper = threading.Timer(max(0.0, next_expiry - now), _reap_idle_sessions)
+    _idle_reaper.daemon = True
+    _idle_reaper.start()
+
+
+def _reap_idle_sessions():
+    """Chạy trong thread hẹn giờ: đóng các phiên rảnh đã hết hạn, hẹn lại nếu còn phiên rảnh"""
+    global _idle_reaper
+    now = time.monotonic()
+    with _idle_sessions_lock:
+        _idle_reaper = None
+        expired = _pop_expired_sessions(now)
+        _schedule_reaper(now)
+    for expired_conn in expired:
+        _disconnect(expired_conn)
+
+
+def close_idle_sessions():
+    """Đóng mọi phiên đang rảnh trong pool"""
+    global _idle_reaper
+    with _idle_sessions_lock:
+        conns = [conn for conn, _expires_at in _idle_sessions.values()]
+        _idle_sessions.clear()
+        if _idle_reaper is not None:
+            _idle_reaper.cancel()
+            _idle_reaper = None
+    for conn in conns:
+        _disconnect(conn)
+
+
+@contextmanager
+def session(params, disable=False, profiler=None):
+    """Một phiên kết nối dùng chung cho mọi thao tác của một lần xử lý.
+
+    Phiên được lấy từ pool (nếu còn) và trả lại pool khi xong; phiên gặp lỗi bị đóng hẳn.
+
+    :param disable: khoá thiết bị (disable_device) trong suốt phiên và mở lại khi xong
+    :param profiler: SyncProfiler ghi thời gian kết nối vào giai đoạn 'connect'
+    """
+    with (profiler or SyncProfiler()).phase('connect'):
+        conn = _checkout(params)
+    healthy = False
+    try:
+        if disable:
+            conn.disable_device()
+        try:
+            yield conn
+        finally:
+            if disable:
+                conn.enable_device()
+        healthy = True
+    finally:
+        if healthy:
+            _checkin(params, conn)
+        else:
+            _disconnect(conn)
+
+
+def sync_device_time(conn, tz_name):
+    """Đặt giờ thiết bị theo giờ hiện tại của timezone tz_name.
+
+    :return: dict thông tin trước/sau khi đặt giờ
+    """
+    device_time_before = conn.get_time()
+    local_now = datetime.now(pytz.timezone(tz_name))
+    try:
+        # Thiết bị lưu giờ local, không có timezone
+        conn.set_time(local_now.replace(tzinfo=None))
+    except Exception as e:
+        _logger.warning("Set local time failed on %s: %s", tz_name, e)
+    device_time_after = conn.get_time()
+    return {
+        'tz': tz_name,
+        'before': device_time_before,
+        'after': device_time_after,
+        'difference': (device_time_after - device_time_before).total_seconds() / 3600,
+        'local_now': local_now,
+    }
+
+
+def fetch_attendance(params, known_records=None, tz_name=None, date_from=None, date_to=None, profiler=None,
+                     cached_roster=None):
+    """Đặt giờ và tải nhật ký chấm công của thiết bị trong một phiên.
+
+    Buffer thô được giải mã ngay trong hàm và chỉ giữ lại các lần chấm trong
+    [date_from, date_to] dưới dạng PunchBuffer.
+
+    :param known_records: số bản ghi đã biết từ lần trước; nếu trên máy vẫn bằng
+        số này thì không tải nhật ký chấm công
+    :param tz_name: nếu có thì đặt giờ thiết bị theo timezone này trước khi tải
+    :param profiler: SyncProfiler ghi thời gian các giai đoạn connect .. decode
+    :param cached_roster: roster.Roster đã lưu đệm, dùng thay cho get_users nếu số user không đổi
+    :rtype: FetchResult
+    """
+    profiler = profiler or SyncProfiler()
+    with session(params, disable=True, profiler=profiler) as conn:
+        time_info = None
+        if tz_name:
+            with profiler.phase('set_time'):
+                time_info = sync_device_time(conn, tz_name)
+
+        with profiler.phase('get_attendance'):
+            conn.read_sizes()
+            if known_records is not None and conn.records == known_records:
+                return FetchResult(conn.records, None, time_info)
+            data, record_count = attendance_decoder.read_attendance_buffer(conn)
+        profiler.count('bytes_fetched', len(data))
+        profiler.count('records_fetched', record_count)
+
+        users_by_uid = None
+        fresh_roster = None
+        if attendance_decoder.record_size_of(data, record_count) == 8:
+            # Bản ghi 8 byte chỉ có uid, cần bảng user để ra user_id
+            with profiler.phase('get_users'):
+                current_roster = _read_roster(conn, cached_roster)
+            if current_roster is not cached_roster:
+                fresh_roster = current_roster
+            users_by_uid = {user.uid: user.user_id for user in current_roster.users}
+
+        punches = PunchBuffer()
+        with profiler.phase('decode'):
+            attendance_decoder.decode_attendance(data, record_count, punches, date_from, date_to, users_by_uid)
+        profiler.count('punches', len(punches))
+        return FetchResult(record_count, punches, time_info, fresh_roster)
+
+
+def _read_roster(conn, cached_roster=None):
+    """Roster hiện tại của thiết bị (cần gọi read_sizes trước).
+
+    Trả về chính cached_roster nếu số user trên máy không đổi, không thì tải lại bảng user.
+    """
+    if cached_roster is not None and cached_roster.users is not None and conn.users == cached_roster.user_count:
+        return cached_roster
+    users = device_roster.from_device_users(conn.get_users())
+    return device_roster.Roster(conn.users, users, getattr(conn, 'user_packet_size', None))
+
+
+def fetch_roster(params, cached_roster=None):
+    """Tải bảng user của thiết bị nếu số user khác với roster đã lưu đệm.
+
+    :return: roster.Roster; users là None nếu không cần tải lại
+    """
+    with session(params) as conn:
+        conn.read_sizes()
+        current_roster = _read_roster(conn, cached_roster)
+        if current_roster is cached_roster:
+            return device_roster.Roster(conn.users, None, cached_roster.packet_size)
+        return current_roster
+
+
+def push_roster(params, cached_roster, wanted, removable):
+    """Thêm/xoá user trên thiết bị để khớp danh sách nhân viên, trong một phiên kết nối.
+
+    Chỉ ghi các user khác biệt so với roster trên máy (roster đã lưu đệm nếu số user không đổi).
+
+    :param wanted: dict user_id -> tên của nhân viên cần có trên máy
+    :param removable: set user_id được phép xoá khỏi máy
+    :rtype: PushResult
+    """
+    with session(params, disable=True) as conn:
+        conn.read_sizes()
+        current_roster = _read_roster(conn, cached_roster)
+        if current_roster.packet_size:
+            # pyzk chỉ biết kích thước gói user sau get_users
+            conn.user_packet_size = current_roster.packet_size
+        additions, removals = device_roster.diff(current_roster.users, wanted, removable)
+        for user in removals:
+            conn.delete_user(uid=user.uid)
+        for user in additions:
+            conn.set_user(uid=user.uid, name=user.name, privilege=user.privilege, user_id=user.user_id)
+        removed_uids = {user.uid for user in removals}
+        users = [user for user in current_roster.users if user.uid not in removed_uids] + additions
+        conn.read_sizes()
+        return PushResult(
+            device_roster.Roster(conn.users, users, current_roster.packet_size), len(additions), len(removals))
+
+
+def clear_attendance(params, expected_records):
+    """Xoá nhật ký chấm công trên máy nếu số bản ghi vẫn bằng expected_records.
+
+    Thiết bị bị khoá trong lúc kiểm tra và xoá nên không thể mất lần chấm công phát sinh
+    sau lần tải dữ liệu.
+
+    :return: True nếu đã xoá
+    """
+    with session(params, disable=True) as conn:
+        conn.read_sizes()
+        if conn.records != expected_records:
+            return False
+        conn.clear_attendance()
+        return True
+
+
+def probe(params):
+    """Kiểm tra tình trạng thiết bị.
+
+    :return: dict serial, firmware, số user, số bản ghi chấm công và độ trễ (ms)
+    """
+    started = time.monotonic()
+    with session(params) as conn:
+        serial_number = conn.get_serialnumber()
+        latency_ms = int((time.monotonic() - started) * 1000)
+        firmware_version = conn.get_firmware_version()
+        conn.read_sizes()
+        return {
+            'serial_number': serial_number,
+            'firmware_version': firmware_version,
+            'users': conn.users,
+            'records': conn.records,
+            'latency_ms': latency_ms,
+        }
+
+
+def run_parallel(func, jobs, max_workers, max_wait=None):
+    """Chạy func(*args) cho từng job trong thread pool giới hạn số worker.
+
+    :param jobs: dict key -> tuple args
+    :param max_wait: thời gian chờ tối đa (giây) cho toàn bộ; job chưa xong bị tính là lỗi timeout
+    :return: dict key -> (True, kết quả) hoặc (False, exception)
+    """
+    results = {}
+    if not jobs:
+        return results
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))))
+    try:
+        futures = {executor.submit(func, *args): key for key, args in jobs.items()}
+        try:
+            for future in as_completed(futures, timeout=max_wait):
+                try:
+                    results[futures[future]] = (True, future.result())
+                except Exception as e:
+                    results[futures[future]] = (False, e)
+        except FuturesTimeoutError:
+            for future, key in futures.items():
+                if key not in results:
+                    future.cancel()
+                    results[key] = (False, TimeoutError('Quá thời gian chờ thiết bị'))
+    finally:
+        # Không chờ thread đang treo ở socket; socket timeout sẽ tự giải phóng chúng
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Nhận lần chấm công trực tiếp từ thiết bị (pyzk live_capture), không phụ thuộc ORM Odoo.
+
+Mỗi thiết bị có một thread giữ kết nối và tự kết nối lại khi lỗi; lần chấm nhận được
+được đưa vào một hàng đợi chung để thread chính lấy ra theo lô nhỏ và ghi bằng ORM.
+Mỗi lần (kết nối lại) thành công cũng được đưa vào hàng đợi đó, kèm số bản ghi trên máy lúc
+kết nối, để thread chính biết có lần chấm phát sinh khi chưa có kết nối (giữa hai lượt nhận
+hoặc trong lúc chờ kết nối lại) cần tải bù hay không.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from . import device_io
+from .punch_pairing import PunchBuffer, to_epoch
+
+_logger = logging.getLogger(__name__)
+
+LiveEvent = namedtuple('LiveEvent', ['device_id', 'user_id', 'epoch'])
+# record_count là None nếu không đọc được số bản ghi trên máy
+Connected = namedtuple('Connected', ['device_id', 'record_count'])
+
+LIVE_POLL_SECONDS = 2  # Socket timeout khi chờ sự kiện, cũng là độ trễ tối đa khi dừng
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)  # Thời gian chờ (giây) trước mỗi lần kết nối lại liên tiếp
+
+
+def capture_device(params, events, stop_event):
+    """Nhận sự kiện chấm công của một thiết bị cho đến khi stop_event được đặt.
+
+    Chạy trong thread riêng; lỗi kết nối được ghi log và kết nối lại sau thời gian chờ tăng dần.
+    Sau mỗi lần kết nối thành công, Connected được đưa vào events trước các lần chấm của kết nối đó.
+    """
+    failures = 0
+    while not stop_event.is_set():
+        conn = None
+        try:
+            conn = device_io.connect(params)
+            failures = 0
+            try:
+                conn.read_sizes()
+                record_count = conn.records
+            except Exception as e:
+                _logger.warning("Cannot read record count of %s: %s", params.ip_address, e)
+                record_count = None
+            events.put(Connected(params.device_id, record_count))
+            for attendance in conn.live_capture(new_timeout=LIVE_POLL_SECONDS):
+                # Sự kiện đã được máy xác nhận (ACK): luôn đưa vào hàng đợi, kể cả khi đang dừng
+                if attendance is not None:
+                    events.put(LiveEvent(params.device_id, str(attendance.user_id), to_epoch(attendance.timestamp)))
+                if stop_event.is_set():
+                    # live_capture tự huỷ đăng ký sự kiện ở vòng lặp kế tiếp
+                    conn.end_live_capture = True
+        except Exception as e:
+            delay = RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+            failures += 1
+            _logger.warning("Live capture on %s failed (%s), reconnecting in %ss", params.ip_address, e, delay)
+            stop_event.wait(delay)
+        finally:
+            if conn is not None:
+                device_io._disconnect(conn)
+
+
+class LiveBatch:
+    """Lần chấm và các lần (kết nối lại) của một thiết bị lấy ra trong một lượt drain"""
+
+    __slots__ = ('punches', 'connections')
+
+    def __init__(self):
+        self.punches = PunchBuffer()
+        # (số bản ghi trên máy lúc kết nối hoặc None, số lần chấm trong punches nhận trước đó)
+        self.connections = []
+
+
+class LiveCapture:
+    """Nhận chấm công trực tiếp từ nhiều thiết bị cùng lúc"""
+
+    def __init__(self, params_list):
+        self.params_list = list(params_list)
+        self.events = queue.Queue()  # LiveEvent và Connected theo thứ tự nhận
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for params in self.params_list:
+            thread = threading.Thread(
+                target=capture_device,
+                args=(params, self.events, self.stop_event),
+                name=f'zkteco-live-{params.device_id}',
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Dừng mọi thread, chờ tối đa một chu kỳ nhận sự kiện"""
+        self.stop_event.set()
+        deadline = time.monotonic() + LIVE_POLL_SECONDS + 1
+        for thread in self.threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+    def drain(self, wait_seconds):
+        """Lấy hết lần chấm và lần kết nối đang chờ, chờ tối đa wait_seconds nếu chưa có.
+
+        :return: dict device id -> LiveBatch
+        """
+        batches = {}
+        try:
+            event = self.events.get(timeout=wait_seconds) if wait_seconds else self.events.get_nowait()
+            while True:
+                batch = batches.get(event.device_id)
+                if batch is None:
+                    batch = batches[event.device_id] = LiveBatch()
+                if isinstance(event, Connected):
+                    batch.connections.append((event.record_count, len(batch.punches)))
+                else:
+                    batch.punches.append_epoch(event.user_id, event.epoch)
+                event = self.events.get_nowait()
+        except queue.Empty:
+            pass
+        return batches
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Chuyển đổi giờ local của thiết bị <-> UTC theo lô, không phụ thuộc Odoo.
+
+Thời điểm được biểu diễn bằng epoch (số giây kể từ 1970-01-01, xem punch_pairing).
+Các mốc đổi giờ (DST) của timezone chỉ được tính một lần cho khoảng thời gian cần xử lý,
+sau đó mỗi thời điểm chỉ cần tra mốc bằng tìm kiếm nhị phân (hoặc NumPy cho cả mảng).
+
+Giờ local rơi vào khoảng bị lặp lại khi lùi giờ được hiểu theo lần xuất hiện đầu tiên;
+giờ local không tồn tại khi tăng giờ được đổi theo độ lệch mới.
+"""
+from array import array
+from bisect import bisect_right
+
+import pytz
+
+from .punch_pairing import SECONDS_PER_DAY, to_epoch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Biên thêm ở hai đầu khoảng thời gian, đủ cho mọi độ lệch giờ và cho cả giờ local lẫn UTC
+WINDOW_MARGIN_SECONDS = 2 * SECONDS_PER_DAY
+
+
+class LocalTimeWindow:
+    """Bảng độ lệch giờ của một timezone trong một khoảng thời gian.
+
+    ``offsets[k]`` (giây) áp dụng từ mốc thứ k: ``utc_transitions[k - 1]`` theo UTC,
+    ``local_transitions[k - 1]`` theo giờ local (tính bằng độ lệch trước khi đổi giờ).
+    """
+
+    __slots__ = ('tz_name', 'utc_transitions', 'local_transitions', 'offsets')
+
+    def __init__(self, tz_name, epoch_from, epoch_to):
+        """:param epoch_from, epoch_to: khoảng thời gian cần chuyển đổi (local hoặc UTC đều được)"""
+        self.tz_name = tz_name
+        self.utc_transitions = []
+        self.local_transitions = []
+        tz = pytz.timezone(tz_name)
+        transition_times = getattr(tz, '_utc_transition_times', None)
+        if not transition_times:
+            # Timezone cố định (UTC, Etc/GMT+7, ...)
+            self.offsets = [int(tz.utcoffset(None).total_seconds())]
+            return
+
+        transition_epochs = [to_epoch(transition) for transition in transition_times]
+        transition_offsets = [int(info[0].total_seconds()) for info in tz._transition_info]
+        first = max(bisect_right(transition_epochs, epoch_from - WINDOW_MARGIN_SECONDS) - 1, 0)
+        last = bisect_right(transition_epochs, epoch_to + WINDOW_MARGIN_SECONDS)
+        self.offsets = [transition_offsets[first]]
+        for index in range(first + 1, last):
+            self.utc_transitions.append(transition_epochs[index])
+            self.local_transitions.append(transition_epochs[index] + transition_offsets[index - 1])
+            self.offsets.append(transition_offsets[index])
+
+    @property
+    def is_fixed(self):
+        """Không có mốc đổi giờ trong khoảng thời gian"""
+        return len(self.offsets) == 1
+
+    def to_utc(self, local_epoch):
+        return local_epoch - self.offsets[bisect_right(self.local_transitions, local_epoch)]
+
+    def to_local(self, utc_epoch):
+        return utc_epoch + self.offsets[bisect_right(self.utc_transitions, utc_epoch)]
+
+    def to_utc_many(self, local_epochs):
+        """Chuyển cả dãy epoch local sang UTC trong một lượt.
+
+        :return: numpy.ndarray nếu có NumPy, ngược lại array('q')
+        """
+        return self._shift_many(local_epochs, self.local_transitions, -1)
+
+    def to_local_many(self, utc_epochs):
+        """Chuyển cả dãy epoch UTC sang giờ local trong một lượt"""
+        return self._shift_many(utc_epochs, self.utc_transitions, 1)
+
+    def _shift_many(self, epochs, transitions, sign):
+        if np is not None:
+            values = np.asarray(epochs, dtype=np.int64)
+            if self.is_fixed:
+                return values + sign * self.offsets[0]
+            offsets = np.asarray(self.offsets, dtype=np.int64)
+            return values + sign * offsets[np.searchsorted(transitions, values, side='right')]
+        if self.is_fixed:
+            shift = sign * self.offsets[0]
+            return array('q', [epoch + shift for epoch in epochs])
+        offsets = self.offsets
+        return array('q', [epoch + sign * offsets[bisect_right(transitions, epoch)] for epoch in epochs])
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Ghi file xuất lương (CSV/XLSX) theo từng lô dòng, không phụ thuộc Odoo.
+
+Dòng vào là tuple theo EXPORT_COLUMNS (đã sắp theo nhân viên); dòng tổng theo nhân viên
+được tính ngay khi đọc, nên bộ nhớ dùng không phụ thuộc số dòng xuất.
+"""
+import csv
+import io
+import os
+import tempfile
+
+# (khoá, tiêu đề cột) theo thứ tự cột trong dòng vào
+EXPORT_COLUMNS = (
+    ('employee_id', 'ID nhân viên'),
+    ('employee', 'Nhân viên'),
+    ('device_user_id', 'ID trên máy'),
+    ('device', 'Thiết bị'),
+    ('check_in', 'Giờ vào'),
+    ('check_out', 'Giờ ra'),
+    ('worked_hours', 'Giờ làm việc'),
+    ('rate', 'Lương theo giờ'),
+    ('salary', 'Tiền lương'),
+    ('auto_closed', 'Tự đóng cuối ngày'),
+)
+HOURS_INDEX = 6
+SALARY_INDEX = 8
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+XLSX_CHUNK_SIZE = 64 * 1024  # Kích thước mỗi lần gửi file XLSX đã ghi xong
+
+
+def with_subtotals(batches):
+    """Chèn dòng tổng (giờ, tiền lương) sau các dòng của mỗi nhân viên.
+
+    Dòng tổng có ô đầu tiên là None và ô Nhân viên là 'Tổng <tên>'.
+    """
+    current = None
+    hours = salary = 0.0
+    for batch in batches:
+        out = []
+        for row in batch:
+            if current is not None and row[0] != current[0]:
+                out.append(_subtotal_row(current, hours, salary))
+                hours = salary = 0.0
+            current = row
+            hours += row[HOURS_INDEX] or 0.0
+            salary += row[SALARY_INDEX] or 0.0
+            out.append(row)
+        yield out
+    if current is not None:
+        yield [_subtotal_row(current, hours, salary)]
+
+
+def _subtotal_row(row, hours, salary):
+    subtotal = [None] * len(EXPORT_COLUMNS)
+    subtotal[1] = f'Tổng {row[1]}'
+    subtotal[HOURS_INDEX] = hours
+    subtotal[SALARY_INDEX] = salary
+    return tuple(subtotal)
+
+
+def _format_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'x' if value else ''
+    if hasattr(value, 'strftime'):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def iter_csv(batches):
+    """Trả về từng khối bytes CSV (UTF-8 có BOM để Excel đọc đúng tiếng Việt), mỗi lô một khối"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([title for _key, title in EXPORT_COLUMNS])
+    yield buffer.getvalue().encode()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_format_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode()
+
+
+def iter_xlsx(batches):
+    """Ghi XLSX ở chế độ constant_memory vào file tạm rồi trả về từng khối bytes.
+
+    XLSX là file zip chỉ hoàn chỉnh khi đóng workbook, nên file được gửi sau khi ghi xong;
+    trong lúc ghi, xlsxwriter chỉ giữ một dòng trong bộ nhớ.
+    """
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'tmpdir': os.path.dirname(path)})
+        sheet = workbook.add_worksheet('Chấm công')
+        bold = workbook.add_format({'bold': True})
+        number = workbook.add_format({'num_format': '#,##0.00'})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        sheet.write_row(0, 0, [title for _key, title in EXPORT_COLUMNS], bold)
+        row_index = 1
+        for batch in batches:
+            for row in batch:
+                cell_format = bold if row[0] is None else None
+                for column, value in enumerate(row):
+                    if value is None:
+                        continue
+                    if hasattr(value, 'strftime'):
+                        sheet.write_datetime(row_index, column, value, date_format)
+                    elif isinstance(value, float):
+                        sheet.write_number(row_index, column, value, cell_format or number)
+                    else:
+                        sheet.write(row_index, column, _format_cell(value), cell_format)
+                row_index += 1
+        workbook.close()
+        with open(path, 'rb') as xlsx_file:
+            while chunk := xlsx_file.read(XLSX_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.unlink(path)
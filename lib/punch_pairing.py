@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""Ghép cặp checkin/checkout từ dữ liệu chấm công thô, không phụ thuộc Odoo.
+
+Lần chấm công được biểu diễn bằng hai mảng song song: mã user (int) và thời điểm
+(số giây kể từ 1970-01-01 theo giờ trên thiết bị, không có timezone). Quy tắc ghép:
+
+* Nhóm theo (user, ngày). Trong mỗi nhóm, lần chấm đầu tiên là checkin.
+* Lần chấm cách lần chấm liền trước (kể cả lần bị coi là trùng) ít hơn
+  ``threshold_seconds`` là trùng (duplicate) và bị bỏ qua.
+* Các lần chấm còn lại luân phiên checkout/checkin.
+* Checkin cuối ngày không có checkout được tự đóng lúc 23:59:59 của ngày đó.
+
+Có NumPy thì chạy theo kiểu vector hoá, không có thì dùng vòng lặp Python với cùng kết quả.
+
+Lần chấm của nhiều thiết bị được gộp bằng ``merge_streams`` (k-way merge các dòng đã sắp xếp)
+trước khi ghép cặp, để nhân viên chấm vào ở máy này, chấm ra ở máy khác vẫn có đủ cặp.
+"""
+import heapq
+from array import array
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SECONDS_PER_DAY = 86400
+EPOCH = datetime(1970, 1, 1)
+
+# Phân loại từng lần chấm công
+PUNCH_CHECKIN = 1
+PUNCH_CHECKOUT = 2
+PUNCH_DUPLICATE = 3
+PUNCH_AUTO_CLOSED = 4  # checkin không có checkout, tự đóng cuối ngày
+
+PUNCH_CLASSIFICATION_LABELS = {
+    PUNCH_CHECKIN: 'checkin',
+    PUNCH_CHECKOUT: 'checkout',
+    PUNCH_DUPLICATE: 'duplicate',
+    PUNCH_AUTO_CLOSED: 'auto-closed',
+}
+
+
+def to_epoch(timestamp):
+    """datetime (naive) -> số giây kể từ EPOCH"""
+    return (timestamp - EPOCH) // timedelta(seconds=1)
+
+
+def from_epoch(seconds):
+    """Số giây kể từ EPOCH -> datetime (naive)"""
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+class PunchBuffer:
+    """Lưu lần chấm công dạng mảng gọn: mã user + epoch, cùng bảng mã -> user_id trên máy."""
+
+    __slots__ = ('user_codes', 'epochs', 'user_ids', '_codes_by_user_id')
+
+    def __init__(self):
+        self.user_codes = array('i')
+        self.epochs = array('q')
+        self.user_ids = []
+        self._codes_by_user_id = {}
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def user_code(self, user_id):
+        """Mã int của user_id trên máy (cấp mới nếu chưa có)"""
+        code = self._codes_by_user_id.get(user_id)
+        if code is None:
+            code = self._codes_by_user_id[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return code
+
+    def append(self, user_id, timestamp):
+        self.append_epoch(user_id, to_epoch(timestamp))
+
+    def append_epoch(self, user_id, epoch):
+        self.user_codes.append(self.user_code(user_id))
+        self.epochs.append(epoch)
+
+    def since(self, min_epoch):
+        """PunchBuffer mới chỉ gồm các lần chấm từ min_epoch trở đi (dùng chung bảng mã user)"""
+        result = PunchBuffer()
+        result.user_ids = list(self.user_ids)
+        result._codes_by_user_id = dict(self._codes_by_user_id)
+        for user_code, epoch in zip(self.user_codes, self.epochs):
+            if epoch >= min_epoch:
+                result.user_codes.append(user_code)
+                result.epochs.append(epoch)
+        return result
+
+
+def merge_streams(streams):
+    """Gộp các dòng lần chấm công đã sắp xếp thành một dòng theo thứ tự (user_id, thời điểm).
+
+    Mỗi dòng (thường là một thiết bị) là iterable các tuple ``(user_id, epoch, source)`` đã sắp
+    theo ``(user_id, epoch)``, user_id so sánh như str của Python (theo code point, vd. ORDER BY
+    ... COLLATE "C" trong PostgreSQL, không theo collation của database); nếu không, lần chấm
+    của một user bị tách thành nhiều nhóm. Các dòng được gộp kiểu k-way merge (heap k phần tử), không nối
+    rồi sắp xếp lại. Mã user được cấp theo thứ tự xuất hiện nên kết quả cũng đã sắp theo
+    (mã user, thời điểm) và có thể ghép cặp với ``presorted=True``.
+
+    :return: (PunchBuffer, array các source song song với lần chấm)
+    """
+    punches = PunchBuffer()
+    sources = array('q')
+    append_code = punches.user_codes.append
+    append_epoch = punches.epochs.append
+    append_source = sources.append
+    previous_user_id = code = None
+    for user_id, epoch, source in heapq.merge(*streams):
+        # Kết quả đã nhóm theo user: chỉ tra mã khi sang user mới
+        if user_id != previous_user_id:
+            code = punches.user_code(user_id)
+            previous_user_id = user_id
+        append_code(code)
+        append_epoch(epoch)
+        append_source(source)
+    return punches, sources
+
+
+class PairingResult:
+    """Kết quả ghép cặp.
+
+    ``user_codes``, ``check_ins``, ``check_outs``, ``auto_closed``, ``check_in_indexes`` là các
+    mảng song song, mỗi phần tử là một phiên làm việc; ``check_in_indexes`` là vị trí của lần
+    chấm vào trong dữ liệu đầu vào. ``classifications`` có cùng thứ tự với dữ liệu đầu vào,
+    mỗi phần tử là một hằng ``PUNCH_*``.
+    """
+
+    __slots__ = ('user_codes', 'check_ins', 'check_outs', 'auto_closed', 'check_in_indexes', 'classifications')
+
+    def __init__(self, user_codes, check_ins, check_outs, auto_closed, check_in_indexes, classifications):
+        self.user_codes = user_codes
+        self.check_ins = check_ins
+        self.check_outs = check_outs
+        self.auto_closed = auto_closed
+        self.check_in_indexes = check_in_indexes
+        self.classifications = classifications
+
+    def __len__(self):
+        return len(self.check_ins)
+
+    def count_punches(self, classification):
+        """Số lần chấm công được phân loại là classification (hằng PUNCH_*)"""
+        if np is not None and isinstance(self.classifications, np.ndarray):
+            return int(np.count_nonzero(self.classifications == classification))
+        return self.classifications.count(classification)
+
+    def __iter__(self):
+        """Duyệt từng phiên: (user_code, check_in, check_out, auto_closed) kiểu Python thuần"""
+        for user_code, check_in, check_out, auto_closed in zip(
+                self.user_codes, self.check_ins, self.check_outs, self.auto_closed):
+            yield int(user_code), int(check_in), int(check_out), bool(auto_closed)
+
+
+def pair_punches(user_codes, epochs, threshold_seconds, presorted=False):
+    """Ghép cặp checkin/checkout cho toàn bộ lần chấm công.
+
+    :param user_codes: dãy mã user (int), song song với ``epochs``
+    :param epochs: dãy thời điểm chấm công (giây kể từ EPOCH, giờ trên thiết bị)
+    :param threshold_seconds: khoảng cách tối thiểu giữa hai lần chấm không bị coi là trùng
+    :param presorted: dữ liệu đã sắp theo (mã user, thời điểm) (vd. kết quả merge_streams),
+        bỏ qua bước sắp xếp
+    :rtype: PairingResult
+    """
+    if len(user_codes) != len(epochs):
+        raise ValueError('user_codes and epochs must have the same length')
+    if np is not None:
+        return _pair_punches_numpy(user_codes, epochs, threshold_seconds, presorted)
+    return _pair_punches_python(user_codes, epochs, threshold_seconds, presorted)
+
+
+def _pair_punches_numpy(user_codes, epochs, threshold_seconds, presorted=False):
+    codes = np.asarray(user_codes, dtype=np.int64)
+    times = np.asarray(epochs, dtype=np.int64)
+    count = len(times)
+    classifications = np.zeros(count, dtype=np.int8)
+    if not count:
+        empty = np.zeros(0, dtype=np.int64)
+        return PairingResult(empty, empty, empty, np.zeros(0, dtype=bool), empty, classifications)
+
+    # Sắp xếp một lần theo (user, thời điểm) - cũng là thứ tự (user, ngày, thời điểm)
+    if presorted:
+        order = np.arange(count)
+    else:
+        order = np.lexsort((times, codes))
+        codes = codes[order]
+        times = times[order]
+    days = times // SECONDS_PER_DAY
+
+    group_start = np.ones(count, dtype=bool)
+    group_start[1:] = (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])
+
+    duplicate = np.zeros(count, dtype=bool)
+    duplicate[1:] = ~group_start[1:] & ((times[1:] - times[:-1]) < threshold_seconds)
+
+    # Thứ tự của lần chấm hợp lệ trong nhóm: chẵn = checkin, lẻ = checkout
+    valid = np.flatnonzero(~duplicate)
+    group_ids = np.cumsum(group_start)[valid]
+    valid_group_start = np.ones(len(valid), dtype=bool)
+    valid_group_start[1:] = group_ids[1:] != group_ids[:-1]
+    starts = np.flatnonzero(valid_group_start)
+    lengths = np.diff(np.append(starts, len(valid)))
+    ranks = np.arange(len(valid)) - np.repeat(starts, lengths)
+    is_checkin = ranks % 2 == 0
+
+    # Checkin không có checkout: là phần tử cuối nhóm với thứ tự chẵn
+    group_end = np.ones(len(valid), dtype=bool)
+    group_end[:-1] = valid_group_start[1:]
+    open_checkin = is_checkin & group_end
+
+    sorted_classes = np.full(count, PUNCH_DUPLICATE, dtype=np.int8)
+    sorted_classes[valid[is_checkin]] = PUNCH_CHECKIN
+    sorted_classes[valid[~is_checkin]] = PUNCH_CHECKOUT
+    sorted_classes[valid[open_checkin]] = PUNCH_AUTO_CLOSED
+    classifications[order] = sorted_classes
+
+    checkin_positions = valid[is_checkin]
+    paired = ~open_checkin[is_checkin]
+    # Checkout của checkin ở vị trí k (trong valid) là phần tử k + 1
+    checkout_positions = np.where(
+        paired,
+        valid[np.minimum(np.flatnonzero(is_checkin) + 1, len(valid) - 1)],
+        0,
+    )
+    check_ins = times[checkin_positions]
+    check_outs = np.where(
+        paired,
+        times[checkout_positions],
+        days[checkin_positions] * SECONDS_PER_DAY + SECONDS_PER_DAY - 1,
+    )
+    return PairingResult(
+        codes[checkin_positions], check_ins, check_outs, ~paired, order[checkin_positions], classifications)
+
+
+def _pair_punches_python(user_codes, epochs, threshold_seconds, presorted=False):
+    count = len(epochs)
+    classifications = array('b', bytes(count))
+    result_codes = array('q')
+    check_ins = array('q')
+    check_outs = array('q')
+    check_in_indexes = array('q')
+    auto_closed = []
+
+    def close_open_checkin(index, code, day):
+        classifications[index] = PUNCH_AUTO_CLOSED
+        result_codes.append(code)
+        check_ins.append(epochs[index])
+        check_outs.append(day * SECONDS_PER_DAY + SECONDS_PER_DAY - 1)
+        check_in_indexes.append(index)
+        auto_closed.append(True)
+
+    if presorted:
+        indexes = range(count)
+    else:
+        indexes = sorted(range(count), key=lambda i: (user_codes[i], epochs[i]))
+    previous_code = previous_day = previous_time = open_index = None
+    valid_count = 0
+    for index in indexes:
+        code = user_codes[index]
+        punch_time = epochs[index]
+        day = punch_time // SECONDS_PER_DAY
+        if code != previous_code or day != previous_day:
+            if open_index is not None:
+                close_open_checkin(open_index, previous_code, previous_day)
+            classifications[index] = PUNCH_CHECKIN
+            open_index = index
+            valid_count = 1
+        elif punch_time - previous_time < threshold_seconds:
+            classifications[index] = PUNCH_DUPLICATE
+        else:
+            valid_count += 1
+            if valid_count % 2 == 1:
+                classifications[index] = PUNCH_CHECKIN
+                open_index = index
+            else:
+                classifications[index] = PUNCH_CHECKOUT
+                result_codes.append(code)
+                check_ins.append(epochs[open_index])
+                check_outs.append(punch_time)
+                check_in_indexes.append(open_index)
+                auto_closed.append(False)
+                open_index = None
+        previous_code, previous_day, previous_time = code, day, punch_time
+
+    if open_index is not None:
+        close_open_checkin(open_index, previous_code, previous_day)
+    return PairingResult(result_codes, check_ins, check_outs, auto_closed, check_in_indexes, classifications)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Danh sách user trên thiết bị (roster), không phụ thuộc Odoo.
+
+Roster được lưu đệm trong Odoo; chỉ tải lại từ máy khi số user trên máy khác số đã lưu.
+So sánh roster với danh sách nhân viên cho ra các user cần thêm/xoá trên máy.
+"""
+import hashlib
+from collections import namedtuple
+
+RosterUser = namedtuple('RosterUser', ['uid', 'user_id', 'name', 'privilege'])
+
+# users là None nếu không tải lại (số user trên máy bằng số đã lưu).
+# packet_size là kích thước gói user của firmware (pyzk cần khi ghi user).
+Roster = namedtuple('Roster', ['user_count', 'users', 'packet_size'])
+
+USER_PRIVILEGE_DEFAULT = 0  # Quyền người dùng thường (pyzk const.USER_DEFAULT)
+USER_NAME_MAX_LENGTH = 24  # Độ dài tên tối đa lưu được trên máy
+USER_UID_MAX = 65535
+
+
+def from_device_users(users):
+    """Đổi list zk.user.User sang list RosterUser"""
+    return [RosterUser(user.uid, str(user.user_id), user.name, user.privilege) for user in users]
+
+
+def checksum(users):
+    """Mã kiểm tra của roster, không phụ thuộc thứ tự user"""
+    digest = hashlib.sha1()
+    for user in sorted(users):
+        digest.update(f'{user.uid}\t{user.user_id}\t{user.name}\t{user.privilege}\n'.encode())
+    return digest.hexdigest()
+
+
+def diff(users, wanted, removable):
+    """So sánh roster với danh sách nhân viên.
+
+    :param users: list RosterUser đang có trên máy
+    :param wanted: dict user_id -> tên của nhân viên cần có trên máy
+    :param removable: set user_id được phép xoá khỏi máy (nhân viên đã lưu trữ)
+    :return: (list RosterUser cần thêm, list RosterUser cần xoá); uid của user thêm mới
+        được cấp tiếp sau uid lớn nhất đang có
+    """
+    present = {user.user_id for user in users}
+    removals = [user for user in users if user.user_id in removable and user.user_id not in wanted]
+    next_uid = max((user.uid for user in users), default=0) + 1
+    additions = []
+    for user_id in sorted(set(wanted) - present):
+        if next_uid > USER_UID_MAX:
+            raise ValueError('Thiết bị đã hết uid để thêm user')
+        name = (wanted[user_id] or '')[:USER_NAME_MAX_LENGTH]
+        additions.append(RosterUser(next_uid, user_id, name, USER_PRIVILEGE_DEFAULT))
+        next_uid += 1
+    return additions, removals
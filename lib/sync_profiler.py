@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Đo thời gian từng giai đoạn và đếm số liệu của một lần đồng bộ, không phụ thuộc Odoo."""
+import logging
+import time
+from contextlib import contextmanager
+
+_logger = logging.getLogger(__name__)
+
+# Các giai đoạn của một lần đồng bộ, theo thứ tự
+SYNC_PHASES = ('connect', 'set_time', 'get_users', 'get_attendance', 'decode', 'stage', 'pair', 'dedupe', 'create')
+
+
+class SyncProfiler:
+    """Cộng dồn thời gian (giây) theo giai đoạn và các bộ đếm.
+
+    Mỗi thiết bị dùng một profiler riêng nên có thể ghi từ thread tải dữ liệu
+    rồi ghi tiếp ở thread chính.
+    """
+
+    __slots__ = ('label', 'phases', 'counters', '_started')
+
+    def __init__(self, label=''):
+        self.label = label
+        self.phases = {}
+        self.counters = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            _logger.debug('%s: %s took %.3fs', self.label, name, elapsed)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def total(self):
+        """Thời gian từ lúc tạo profiler"""
+        return time.perf_counter() - self._started
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Đánh dấu trcf_generated cho chấm công do bản đồng bộ cũ tạo (trước khi có trường này).
+
+Nếu không, mọi ngày đã đồng bộ trước khi nâng cấp bị coi là có chấm công nhập tay và
+lần chấm mới trong các ngày đó không bao giờ được ghép cặp. Chỉ nhận phiên tự đóng cuối ngày
+(giờ ra 23:59:59 giờ địa phương, cùng ngày với giờ vào) của nhân viên có ID trên máy, và chỉ khi:
+
+* bản ghi chưa từng được sửa (write_date = create_date);
+* được tạo bởi superuser hoặc cùng lượt với chấm công khác (bản đồng bộ cũ tạo mọi bản ghi
+  trong một transaction nên chúng có chung create_uid và create_date), để phiên nhập tay
+  từng dòng lúc 23:59:59 không bị coi là do đồng bộ tạo.
+
+Phiên tự đóng đã được sửa sau khi tạo được đánh dấu trcf_manual_edit để đồng bộ không ghi đè.
+Phiên còn lại giống hệt phiên ghép cặp mới được nhận ở lần đồng bộ sau
+(xem TrcfZktecoDevice._replace_attendances).
+"""
+from odoo import SUPERUSER_ID
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        CREATE TEMPORARY TABLE trcf_auto_closed_attendance ON COMMIT DROP AS
+        SELECT attendance.id,
+               attendance.write_date > attendance.create_date AS edited,
+               attendance.create_uid = %s OR EXISTS (
+                    SELECT 1
+                      FROM hr_attendance other
+                     WHERE other.create_uid = attendance.create_uid
+                       AND other.create_date = attendance.create_date
+                       AND other.id != attendance.id
+               ) AS batch_created
+          FROM hr_attendance attendance
+          JOIN hr_employee employee ON employee.id = attendance.employee_id
+          JOIN resource_resource resource ON resource.id = employee.resource_id
+         WHERE COALESCE(employee.trcf_device_id_num, '') != ''
+           AND attendance.trcf_generated IS NOT TRUE
+           AND attendance.trcf_manual_edit IS NOT TRUE
+           AND (attendance.check_out AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::time
+               = '23:59:59'
+           AND (attendance.check_out AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date
+               = (attendance.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date
+    """, [SUPERUSER_ID])
+
+    cr.execute("""
+        UPDATE hr_attendance attendance
+           SET trcf_manual_edit = true
+          FROM trcf_auto_closed_attendance candidate
+         WHERE candidate.id = attendance.id
+           AND candidate.edited
+    """)
+
+    cr.execute("""
+        UPDATE hr_attendance attendance
+           SET trcf_generated = true,
+               trcf_auto_closed = true
+          FROM trcf_auto_closed_attendance candidate
+         WHERE candidate.id = attendance.id
+           AND NOT candidate.edited
+           AND candidate.batch_created
+    """)
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Dựng bảng tổng hợp lương từ chấm công đã có khi nâng cấp module.
+
+data/trcf_payroll_summary_data.xml (noupdate) chỉ chạy khi cài mới. Không dựng lại thì
+bảng tổng hợp chỉ có các ngày phát sinh sau khi nâng cấp và tổng theo tháng bị thiếu.
+"""
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['trcf.attendance.payroll.summary']._rebuild_all()
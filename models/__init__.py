@@ -1,3 +1,10 @@
 from . import trcf_zkteco_device
+from . import trcf_zkteco_device_user
 from . import trcf_hr_attendance
-from . import trcf_hr_employee
\ No newline at end of file
+from . import trcf_hr_employee
+from . import trcf_hr_employee_rate
+from . import trcf_zkteco_sync_job
+from . import trcf_zkteco_sync_run
+from . import trcf_zkteco_punch
+from . import trcf_attendance_payroll_summary
+from . import trcf_attendance_archive
\ No newline at end of file
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+import base64
+import time as time_module
+from collections import defaultdict
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+from ..lib import attendance_archive, local_time, punch_pairing
+
+ARCHIVE_HORIZON_MONTHS = 24  # Chấm công cũ hơn số tháng này được lưu trữ (ghi đè bằng ir.config_parameter)
+ARCHIVE_BATCH_SIZE = 200  # Số (nhân viên, tháng) lưu trữ mỗi lần commit
+ARCHIVE_CRON_TIME_LIMIT = 600  # Thời gian tối đa (giây) một lượt cron lưu trữ
+PUNCH_PURGE_BATCH_SIZE = 50000  # Số lần chấm công thô xoá mỗi lần commit
+
+
+class TrcfAttendanceArchive(models.Model):
+    """Chấm công đã lưu trữ của một nhân viên trong một tháng (theo timezone của nhân viên).
+
+    Các phiên được nén thành một khối dữ liệu để bảng hr.attendance chỉ giữ chấm công trong
+    khoảng thời gian gần đây, giúp việc dò trùng khi đồng bộ và báo cáo lương không chậm dần
+    theo số năm dữ liệu. Bảng tổng hợp lương vẫn giữ số liệu của các tháng đã lưu trữ.
+    """
+    _name = 'trcf.attendance.archive'
+    _description = 'Chấm công đã lưu trữ'
+    _order = 'month desc, employee_id'
+    _rec_name = 'employee_id'
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Nhân viên',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True
+    )
+
+    month = fields.Date(string='Tháng', required=True, readonly=True, help='Ngày đầu tháng')
+    attendance_count = fields.Integer(string='Số phiên', readonly=True)
+    worked_hours = fields.Float(string='Giờ làm việc', readonly=True)
+    salary = fields.Float(string='Tiền lương', digits='Product Price', readonly=True)
+    auto_closed_count = fields.Integer(string='Phiên tự đóng', readonly=True)
+
+    data = fields.Binary(
+        string='Dữ liệu nén',
+        attachment=False,
+        readonly=True,
+        help='Các phiên chấm công dạng cột, nén zlib (lib/attendance_archive.py)'
+    )
+
+    data_size = fields.Integer(string='Kích thước nén (byte)', readonly=True)
+
+    restored = fields.Boolean(
+        string='Đã khôi phục',
+        readonly=True,
+        help='Chấm công của tháng đã được đưa trở lại hr.attendance; tác vụ lưu trữ định kỳ '
+             'bỏ qua tháng này cho đến khi bấm Lưu trữ lại'
+    )
+
+    rows_html = fields.Html(
+        string='Chi tiết chấm công',
+        compute='_compute_rows_html',
+        sanitize=False
+    )
+
+    _sql_constraints = [
+        ('employee_month_uniq', 'unique (employee_id, month)',
+         'Mỗi nhân viên chỉ có một bản lưu trữ cho mỗi tháng.'),
+    ]
+
+    def _read_rows(self):
+        """Các phiên chấm công đã lưu trữ: list lib.attendance_archive.ArchivedAttendance"""
+        self.ensure_one()
+        if not self.data:
+            return []
+        return attendance_archive.unpack(base64.b64decode(self.data))
+
+    @api.depends('data')
+    def _compute_rows_html(self):
+        for record in self:
+            rows = record._read_rows()
+            if not rows:
+                record.rows_html = False
+                continue
+            window = local_time.LocalTimeWindow(
+                record.employee_id.tz or 'UTC', rows[0].check_in, rows[-1].check_in)
+            lines = []
+            for row in rows:
+                check_in = punch_pairing.from_epoch(window.to_local(row.check_in))
+                check_out = '' if row.check_out == attendance_archive.NO_CHECK_OUT else \
+                    punch_pairing.from_epoch(window.to_local(row.check_out))
+                auto_closed = '✓' if row.flags & attendance_archive.FLAG_AUTO_CLOSED else ''
+                lines.append(
+                    f'<tr><td>{check_in}</td><td>{check_out}</td><td>{row.worked_hours:.2f}</td>'
+                    f'<td>{row.salary:,.2f}</td><td>{auto_closed}</td></tr>')
+            record.rows_html = (
+                '<table class="table table-sm"><thead><tr><th>Giờ vào</th><th>Giờ ra</th>'
+                '<th>Giờ làm việc</th><th>Tiền lương</th><th>Tự đóng</th></tr></thead>'
+                f'<tbody>{"".join(lines)}</tbody></table>'
+            )
+
+    # ===== LƯU TRỮ =====
+    @api.model
+    def _cron_archive(self):
+        """Tác vụ định kỳ: lưu trữ chấm công cũ hơn mốc lưu trữ theo lô, xoá lần chấm thô đã ghép cặp"""
+        cutoff = self._get_archive_cutoff()
+        started = time_module.monotonic()
+        while time_module.monotonic() - started < ARCHIVE_CRON_TIME_LIMIT:
+            keys = self._get_months_to_archive(cutoff, ARCHIVE_BATCH_SIZE)
+            if not keys:
+                break
+            self._archive_months(keys)
+            self.env.cr.commit()
+
+        Punch = self.env['trcf.zkteco.punch']
+        while time_module.monotonic() - started < ARCHIVE_CRON_TIME_LIMIT:
+            if not Punch._purge_paired(cutoff, PUNCH_PURGE_BATCH_SIZE):
+                break
+            self.env.cr.commit()
+
+    @api.model
+    def _get_archive_cutoff(self):
+        """Ngày đầu tháng của mốc lưu trữ: chấm công trước ngày này được lưu trữ"""
+        months = self.env['ir.config_parameter'].sudo().get_param(
+            'trcf_zkteco_attendance_sync.archive_months')
+        first_day = fields.Date.context_today(self).replace(day=1)
+        return first_day - relativedelta(months=int(months or ARCHIVE_HORIZON_MONTHS))
+
+    @api.model
+    def _get_months_to_archive(self, cutoff, limit):
+        """Các (nhân viên, tháng) có chấm công trước cutoff, cũ nhất trước (trừ tháng đã khôi phục)"""
+        self.env['hr.attendance'].flush_model()
+        self.env.cr.execute("""
+            SELECT DISTINCT attendance.employee_id,
+                   date_trunc('month', attendance.check_in AT TIME ZONE 'UTC'
+                                       AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date AS month
+              FROM hr_attendance attendance
+              JOIN hr_employee employee ON employee.id = attendance.employee_id
+              JOIN resource_resource resource ON resource.id = employee.resource_id
+             WHERE attendance.check_in < %(cutoff)s::timestamp + interval '1 day'
+               AND (attendance.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date
+                   < %(cutoff)s
+               AND NOT EXISTS (
+                    SELECT 1
+                      FROM trcf_attendance_archive archive
+                     WHERE archive.employee_id = attendance.employee_id
+                       AND archive.restored
+                       AND archive.month = date_trunc('month', attendance.check_in AT TIME ZONE 'UTC'
+                                                      AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date
+                   )
+          ORDER BY month, attendance.employee_id
+             LIMIT %(limit)s
+        """, {'cutoff': cutoff, 'limit': limit})
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _archive_months(self, keys):
+        """Chuyển toàn bộ chấm công của các (nhân viên, tháng) vào bản lưu trữ nén.
+
+        Gồm cả chấm công nhập hoặc sửa tay, không chỉ chấm công do đồng bộ tạo: tháng đã lưu trữ
+        không được thêm/sửa chấm công và bảng tổng hợp giữ số liệu của cả tháng, nên mọi phiên
+        phải nằm trong bản lưu trữ. Cờ trcf_generated/trcf_auto_closed/trcf_manual_edit được lưu
+        kèm và khôi phục nguyên trạng (action_restore).
+
+        Chấm công mới của tháng đã có bản lưu trữ được gộp vào bản lưu trữ đó.
+        Bảng tổng hợp lương không bị tính lại (số liệu của tháng giữ nguyên).
+        """
+        self.env.cr.execute("""
+            SELECT attendance.id, archived.employee_id, archived.month,
+                   EXTRACT(EPOCH FROM attendance.check_in)::bigint,
+                   COALESCE(EXTRACT(EPOCH FROM attendance.check_out)::bigint, %(no_check_out)s),
+                   COALESCE(attendance.worked_hours, 0)::float8,
+                   COALESCE(attendance.trcf_hourly_salary_sum, 0)::float8,
+                   COALESCE(attendance.trcf_device_id, 0),
+                   (CASE WHEN attendance.trcf_generated THEN %(generated)s ELSE 0 END)
+                   | (CASE WHEN attendance.trcf_auto_closed THEN %(auto_closed)s ELSE 0 END)
+                   | (CASE WHEN attendance.trcf_manual_edit THEN %(manual_edit)s ELSE 0 END)
+              FROM unnest(%(employee_ids)s::int[], %(months)s::date[]) AS archived(employee_id, month)
+              JOIN hr_employee employee ON employee.id = archived.employee_id
+              JOIN resource_resource resource ON resource.id = employee.resource_id
+              JOIN hr_attendance attendance
+                ON attendance.employee_id = archived.employee_id
+               AND attendance.check_in >= (archived.month::timestamp AT TIME ZONE COALESCE(resource.tz, 'UTC'))
+                                          AT TIME ZONE 'UTC'
+               AND attendance.check_in < ((archived.month + interval '1 month') AT TIME ZONE COALESCE(resource.tz, 'UTC'))
+                                         AT TIME ZONE 'UTC'
+          ORDER BY archived.employee_id, archived.month, attendance.check_in
+        """, {
+            'no_check_out': attendance_archive.NO_CHECK_OUT,
+            'generated': attendance_archive.FLAG_GENERATED,
+            'auto_closed': attendance_archive.FLAG_AUTO_CLOSED,
+            'manual_edit': attendance_archive.FLAG_MANUAL_EDIT,
+            'employee_ids': [key[0] for key in keys],
+            'months': [key[1] for key in keys],
+        })
+        attendance_ids = []
+        rows_by_key = defaultdict(list)
+        for row in self.env.cr.fetchall():
+            attendance_ids.append(row[0])
+            rows_by_key[row[1], row[2]].append(attendance_archive.ArchivedAttendance(*row[3:]))
+        if not rows_by_key:
+            return
+
+        existing = {
+            (archive.employee_id.id, archive.month): archive
+            for archive in self.search([
+                ('employee_id', 'in', list({key[0] for key in rows_by_key})),
+                ('month', 'in', list({key[1] for key in rows_by_key})),
+            ])
+        }
+        new_vals_list = []
+        for (employee_id, month), rows in rows_by_key.items():
+            archive = existing.get((employee_id, month))
+            if archive:
+                rows = sorted(archive._read_rows() + rows)
+                archive.write(self._prepare_archive_vals(rows))
+            else:
+                new_vals_list.append(dict(self._prepare_archive_vals(rows), employee_id=employee_id, month=month))
+        self.create(new_vals_list)
+        self.env['hr.attendance'].browse(attendance_ids).with_context(trcf_archive=True).unlink()
+
+    @api.model
+    def _prepare_archive_vals(self, rows):
+        blob = attendance_archive.pack(rows)
+        return {
+            'attendance_count': len(rows),
+            'worked_hours': sum(row.worked_hours for row in rows),
+            'salary': sum(row.salary for row in rows),
+            'auto_closed_count': sum(1 for row in rows if row.flags & attendance_archive.FLAG_AUTO_CLOSED),
+            'data': base64.b64encode(blob),
+            'data_size': len(blob),
+            'restored': False,
+        }
+
+    @api.model
+    def _get_archived_months(self, employee_ids, month_from, month_to, include_restored=False):
+        """Các (employee id, ngày đầu tháng) đã lưu trữ (chưa khôi phục) trong khoảng tháng.
+
+        :param include_restored: gồm cả tháng đã khôi phục
+        """
+        domain = [
+            ('employee_id', 'in', list(employee_ids)),
+            ('month', '>=', month_from.replace(day=1)),
+            ('month', '<=', month_to),
+        ]
+        if not include_restored:
+            domain.append(('restored', '=', False))
+        archives = self.search_read(domain, ['employee_id', 'month'])
+        return {(archive['employee_id'][0], archive['month']) for archive in archives}
+
+    @api.model
+    def _check_not_archived(self, attendances):
+        """Không cho tạo/sửa chấm công trong tháng đã lưu trữ.
+
+        Dòng tổng hợp của tháng đã lưu trữ chỉ còn số liệu trong bản lưu trữ: tính lại ngày đó
+        từ hr.attendance sẽ làm mất số liệu cũ, nên cần khôi phục tháng trước khi sửa.
+        """
+        attendances = attendances.filtered(lambda attendance: attendance.employee_id and attendance.check_in)
+        if not attendances or not self.sudo().search_count([
+            ('employee_id', 'in', attendances.employee_id.ids), ('restored', '=', False),
+        ], limit=1):
+            return
+        keys = set()
+        for attendance in attendances:
+            epoch = punch_pairing.to_epoch(attendance.check_in)
+            window = local_time.LocalTimeWindow(attendance.employee_id.tz or 'UTC', epoch, epoch)
+            keys.add((attendance.employee_id.id, punch_pairing.from_epoch(window.to_local(epoch)).date().replace(day=1)))
+        archived = keys & self.sudo()._get_archived_months(
+            {key[0] for key in keys}, min(key[1] for key in keys), max(key[1] for key in keys))
+        if archived:
+            employees = self.env['hr.employee'].browse({key[0] for key in archived})
+            months = ', '.join(sorted({key[1].strftime('%m/%Y') for key in archived}))
+            raise UserError(
+                f"Chấm công tháng {months} của {', '.join(employees.mapped('name'))} đã được lưu trữ. "
+                f"Khôi phục tháng đó (Chấm công đã lưu trữ) trước khi thêm hoặc sửa chấm công.")
+
+    # ===== KHÔI PHỤC =====
+    def action_restore(self):
+        """Đưa chấm công của các tháng đã chọn trở lại hr.attendance.
+
+        Bản lưu trữ được giữ lại với dấu Đã khôi phục để tác vụ định kỳ không lưu trữ lại ngay.
+        """
+        archives = self.filtered(lambda archive: not archive.restored)
+        device_ids = set(self.env['trcf.zkteco.device'].with_context(active_test=False).search([]).ids)
+        vals_list = []
+        for archive in archives:
+            for row in archive._read_rows():
+                vals_list.append({
+                    'employee_id': archive.employee_id.id,
+                    'check_in': punch_pairing.from_epoch(row.check_in),
+                    'check_out': False if row.check_out == attendance_archive.NO_CHECK_OUT
+                    else punch_pairing.from_epoch(row.check_out),
+                    'trcf_device_id': row.device_id if row.device_id in device_ids else False,
+                    'trcf_generated': bool(row.flags & attendance_archive.FLAG_GENERATED),
+                    'trcf_auto_closed': bool(row.flags & attendance_archive.FLAG_AUTO_CLOSED),
+                    'trcf_manual_edit': bool(row.flags & attendance_archive.FLAG_MANUAL_EDIT),
+                })
+        archives.write({
+            'restored': True,
+            'attendance_count': 0,
+            'worked_hours': 0.0,
+            'salary': 0.0,
+            'auto_closed_count': 0,
+            'data': False,
+            'data_size': 0,
+        })
+        # Tạo lại qua ORM: tiền lương và bảng tổng hợp của các ngày được tính lại như chấm công mới
+        self.env['hr.attendance'].with_context(trcf_sync=True).create(vals_list)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': '✅ Đã khôi phục',
+                'message': f'{len(vals_list)} chấm công của {len(archives)} tháng đã được đưa trở lại',
+                'type': 'success',
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
+
+    def action_archive_again(self):
+        """Lưu trữ lại ngay các tháng đã khôi phục"""
+        restored = self.filtered('restored')
+        restored._archive_months([(archive.employee_id.id, archive.month) for archive in restored])
+        # Tháng không còn chấm công: bỏ dấu khôi phục để tác vụ định kỳ lưu trữ khi có lại
+        restored.filtered('restored').unlink()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': '✅ Đã lưu trữ lại',
+                'message': f'{len(restored)} tháng đã được lưu trữ lại',
+                'type': 'success',
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            }
+        }
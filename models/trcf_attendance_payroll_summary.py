@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from odoo import models, fields, api
+
+PENDING_POINTS_KEY = 'trcf_payroll_summary.points'  # (employee_id, check_in) của chấm công đã đổi
+PENDING_RANGES_KEY = 'trcf_payroll_summary.ranges'  # (employee_id, check_in từ) cần tính lại
+RANGE_START = datetime(1970, 1, 1)  # Mốc "từ đầu" khi tính lại toàn bộ một nhân viên
+
+
+class TrcfAttendancePayrollSummary(models.Model):
+    """Tổng hợp giờ công và tiền lương theo nhân viên x ngày và nhân viên x tháng.
+
+    Bảng được cập nhật dần trước mỗi lần commit cho các (nhân viên, ngày) có chấm công
+    thay đổi, để báo cáo lương chỉ đọc vài trăm dòng đã tổng hợp thay vì quét hr.attendance.
+    Ngày được tính theo timezone của nhân viên.
+    """
+    _name = 'trcf.attendance.payroll.summary'
+    _description = 'Tổng hợp lương theo chấm công'
+    _order = 'date desc, employee_id'
+    _rec_name = 'employee_id'
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Nhân viên',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True
+    )
+
+    period = fields.Selection(
+        [('day', 'Ngày'), ('month', 'Tháng')],
+        string='Kỳ',
+        required=True,
+        readonly=True
+    )
+
+    date = fields.Date(
+        string='Ngày',
+        required=True,
+        readonly=True,
+        help='Ngày làm việc, hoặc ngày đầu tháng với dòng tổng hợp theo tháng'
+    )
+
+    worked_hours = fields.Float(string='Giờ làm việc', readonly=True)
+    salary = fields.Float(string='Tiền lương', digits='Product Price', readonly=True)
+    session_count = fields.Integer(string='Số phiên', readonly=True)
+    auto_closed_count = fields.Integer(
+        string='Phiên tự đóng',
+        readonly=True,
+        help='Số phiên không có lần chấm ra, được tự đóng lúc 23:59:59'
+    )
+
+    _sql_constraints = [
+        ('employee_period_date_uniq', 'unique (employee_id, period, date)',
+         'Mỗi nhân viên chỉ có một dòng tổng hợp cho mỗi ngày/tháng.'),
+    ]
+
+    # ===== ĐÁNH DẤU CẦN TÍNH LẠI =====
+    @api.model
+    def _mark_dirty(self, attendances):
+        """Ghi nhận các (nhân viên, ngày) của chấm công vừa tạo/sửa/xoá, tính lại trước khi commit"""
+        points = self._get_pending(PENDING_POINTS_KEY)
+        points.update(
+            (attendance.employee_id.id, attendance.check_in)
+            for attendance in attendances if attendance.employee_id and attendance.check_in
+        )
+
+    @api.model
+    def _mark_dirty_employees(self, employees, check_in_from=RANGE_START):
+        """Ghi nhận mọi ngày có chấm công của nhân viên từ check_in_from (UTC) cần tính lại"""
+        ranges = self._get_pending(PENDING_RANGES_KEY)
+        ranges.update((employee.id, check_in_from) for employee in employees)
+
+    @api.model
+    def _reset_employees(self, employees):
+        """Xoá dòng tổng hợp của nhân viên rồi tính lại từ đầu trước khi commit (khi đổi timezone).
+
+        Ngày của mọi chấm công có thể đổi nên không tính lại theo ngày được; các tháng đã
+        lưu trữ (trcf.attendance.archive) được giữ nguyên như _rebuild_all.
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            DELETE FROM trcf_attendance_payroll_summary summary
+             WHERE summary.employee_id = ANY(%s)
+               AND NOT EXISTS (
+                    SELECT 1
+                      FROM trcf_attendance_archive archive
+                     WHERE archive.employee_id = summary.employee_id
+                       AND archive.month = date_trunc('month', summary.date)::date
+                       AND NOT archive.restored
+                   )
+        """, [employees.ids])
+        self.invalidate_model()
+        self._mark_dirty_employees(employees)
+
+    @api.model
+    def _get_pending(self, key):
+        precommit = self.env.cr.precommit
+        if PENDING_POINTS_KEY not in precommit.data:
+            precommit.data[PENDING_POINTS_KEY] = set()
+            precommit.data[PENDING_RANGES_KEY] = set()
+            precommit.add(self._refresh_pending)
+        return precommit.data[key]
+
+    @api.model
+    def _refresh_pending(self):
+        points = self.env.cr.precommit.data.pop(PENDING_POINTS_KEY, set())
+        ranges = self.env.cr.precommit.data.pop(PENDING_RANGES_KEY, set())
+        if points or ranges:
+            self._refresh(points, ranges)
+
+    # ===== TÍNH LẠI =====
+    @api.model
+    def _refresh(self, points=(), ranges=()):
+        """Tính lại dòng ngày và dòng tháng của các (nhân viên, ngày) bị ảnh hưởng bằng SQL.
+
+        :param points: (employee_id, check_in UTC) - ngày chứa check_in (kể cả chấm công đã xoá)
+        :param ranges: (employee_id, check_in_from UTC) - mọi ngày có chấm công từ mốc này
+        """
+        self.env['hr.attendance'].flush_model()
+        self.flush_model()
+        points = list(points)
+        ranges = list(ranges)
+        self.env.cr.execute("""
+            SELECT DISTINCT touched.employee_id,
+                   (touched.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date,
+                   COALESCE(resource.tz, 'UTC')
+              FROM (
+                    SELECT point.employee_id, point.check_in
+                      FROM unnest(%s::int[], %s::timestamp[]) AS point(employee_id, check_in)
+                     UNION ALL
+                    SELECT attendance.employee_id, attendance.check_in
+                      FROM unnest(%s::int[], %s::timestamp[]) AS range(employee_id, check_in_from)
+                      JOIN hr_attendance attendance
+                        ON attendance.employee_id = range.employee_id
+                       AND attendance.check_in >= range.check_in_from
+                   ) AS touched
+              JOIN hr_employee employee ON employee.id = touched.employee_id
+              JOIN resource_resource resource ON resource.id = employee.resource_id
+        """, [
+            [point[0] for point in points], [point[1] for point in points],
+            [item[0] for item in ranges], [item[1] for item in ranges],
+        ])
+        days = self.env.cr.fetchall()
+        if not days:
+            return
+
+        employee_ids = [day[0] for day in days]
+        dates = [day[1] for day in days]
+        self.env.cr.execute("""
+            DELETE FROM trcf_attendance_payroll_summary summary
+             USING unnest(%s::int[], %s::date[]) AS touched(employee_id, day)
+             WHERE summary.period = 'day'
+               AND summary.employee_id = touched.employee_id
+               AND summary.date = touched.day
+        """, [employee_ids, dates])
+        self.env.cr.execute("""
+            INSERT INTO trcf_attendance_payroll_summary
+                        (employee_id, period, date, worked_hours, salary, session_count, auto_closed_count,
+                         create_uid, create_date, write_uid, write_date)
+                 SELECT touched.employee_id, 'day', touched.day,
+                        COALESCE(SUM(attendance.worked_hours), 0),
+                        COALESCE(SUM(attendance.trcf_hourly_salary_sum), 0),
+                        COUNT(*),
+                        COUNT(*) FILTER (WHERE attendance.trcf_auto_closed),
+                        %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+                   FROM unnest(%s::int[], %s::date[], %s::varchar[]) AS touched(employee_id, day, tz)
+                   JOIN hr_attendance attendance
+                     ON attendance.employee_id = touched.employee_id
+                    AND attendance.check_in >= (touched.day::timestamp AT TIME ZONE touched.tz) AT TIME ZONE 'UTC'
+                    AND attendance.check_in < ((touched.day + 1)::timestamp AT TIME ZONE touched.tz) AT TIME ZONE 'UTC'
+               GROUP BY touched.employee_id, touched.day
+        """, [self.env.uid, self.env.uid, employee_ids, dates, [day[2] for day in days]])
+
+        months = {(employee_id, day.replace(day=1)) for employee_id, day in zip(employee_ids, dates)}
+        self._refresh_months([month[0] for month in months], [month[1] for month in months])
+        self.invalidate_model()
+
+    @api.model
+    def _refresh_months(self, employee_ids, months):
+        """Tính lại dòng tháng từ các dòng ngày"""
+        self.env.cr.execute("""
+            DELETE FROM trcf_attendance_payroll_summary summary
+             USING unnest(%s::int[], %s::date[]) AS touched(employee_id, month)
+             WHERE summary.period = 'month'
+               AND summary.employee_id = touched.employee_id
+               AND summary.date = touched.month
+        """, [employee_ids, months])
+        self.env.cr.execute("""
+            INSERT INTO trcf_attendance_payroll_summary
+                        (employee_id, period, date, worked_hours, salary, session_count, auto_closed_count,
+                         create_uid, create_date, write_uid, write_date)
+                 SELECT touched.employee_id, 'month', touched.month,
+                        SUM(summary.worked_hours), SUM(summary.salary),
+                        SUM(summary.session_count), SUM(summary.auto_closed_count),
+                        %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+                   FROM unnest(%s::int[], %s::date[]) AS touched(employee_id, month)
+                   JOIN trcf_attendance_payroll_summary summary
+                     ON summary.period = 'day'
+                    AND summary.employee_id = touched.employee_id
+                    AND summary.date >= touched.month
+                    AND summary.date < touched.month + interval '1 month'
+               GROUP BY touched.employee_id, touched.month
+        """, [self.env.uid, self.env.uid, employee_ids, months])
+
+    @api.model
+    def _rebuild_all(self):
+        """Tính lại toàn bộ bảng tổng hợp từ hr.attendance (khi cài hoặc nâng cấp module).
+
+        Đổi timezone nhân viên chỉ tính lại nhân viên đó (xem _reset_employees).
+
+        Các tháng đã lưu trữ (trcf.attendance.archive) được giữ nguyên.
+        """
+        self.env['hr.attendance'].flush_model()
+        # Tháng đã lưu trữ không còn chấm công trong hr.attendance: giữ nguyên dòng tổng hợp
+        self.env.cr.execute("""
+            DELETE FROM trcf_attendance_payroll_summary summary
+             WHERE NOT EXISTS (
+                    SELECT 1
+                      FROM trcf_attendance_archive archive
+                     WHERE archive.employee_id = summary.employee_id
+                       AND archive.month = date_trunc('month', summary.date)::date
+                       AND NOT archive.restored
+                   )
+        """)
+        self.env.cr.execute("""
+            INSERT INTO trcf_attendance_payroll_summary
+                        (employee_id, period, date, worked_hours, salary, session_count, auto_closed_count,
+                         create_uid, create_date, write_uid, write_date)
+                 SELECT attendance.employee_id, 'day',
+                        (attendance.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date,
+                        COALESCE(SUM(attendance.worked_hours), 0),
+                        COALESCE(SUM(attendance.trcf_hourly_salary_sum), 0),
+                        COUNT(*),
+                        COUNT(*) FILTER (WHERE attendance.trcf_auto_closed),
+                        %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+                   FROM hr_attendance attendance
+                   JOIN hr_employee employee ON employee.id = attendance.employee_id
+                   JOIN resource_resource resource ON resource.id = employee.resource_id
+               GROUP BY 1, 3
+            ON CONFLICT (employee_id, period, date) DO NOTHING
+        """, [self.env.uid, self.env.uid])
+        self.env.cr.execute("""
+            SELECT DISTINCT employee_id, date_trunc('month', date)::date
+              FROM trcf_attendance_payroll_summary
+             WHERE period = 'day'
+        """)
+        months = self.env.cr.fetchall()
+        self._refresh_months([month[0] for month in months], [month[1] for month in months])
+        self.invalidate_model()
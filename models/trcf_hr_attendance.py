@@ -1,15 +1,16 @@
 from odoo import models, fields, api
+from odoo.tools import SQL
 
 
 class TrcfHrAttendance(models.Model):
     _inherit = 'hr.attendance'
 
-    # Field related - không lưu trữ, chỉ hiển thị
+    # Field compute - không lưu trữ, chỉ hiển thị
     trcf_hourly_salary_display = fields.Float(
         string='Tiền lương/giờ',
-        related='employee_id.trcf_hourly_salary',
+        compute='_compute_hourly_salary_display',
         digits='Product Price',
-        help='Mức lương theo giờ của nhân viên',
+        help='Mức lương theo giờ của nhân viên có hiệu lực tại giờ vào',
         readonly=True,
         aggregator='max'  # Hoặc 'min', 'avg' - sẽ lấy giá trị thay vì sum
     )
@@ -23,11 +24,139 @@ class TrcfHrAttendance(models.Model):
         store=True
     )
 
-    @api.depends('worked_hours', 'employee_id.trcf_hourly_salary')
+    # ===== CHẤM CÔNG TẠO TỪ THIẾT BỊ =====
+    trcf_device_id = fields.Many2one(
+        'trcf.zkteco.device',
+        string='Thiết bị ZKTeco',
+        ondelete='set null',
+        index=True,
+        readonly=True,
+        copy=False,
+        help='Thiết bị có lần chấm công tạo ra bản ghi này'
+    )
+
+    trcf_generated = fields.Boolean(
+        string='Tạo từ máy chấm công',
+        readonly=True,
+        copy=False,
+        help='Bản ghi do đồng bộ tạo ra, được tính lại khi có lần chấm công mới trong ngày'
+    )
+
+    trcf_auto_closed = fields.Boolean(
+        string='Tự đóng cuối ngày',
+        readonly=True,
+        copy=False,
+        help='Không có lần chấm ra, giờ ra được đặt là 23:59:59'
+    )
+
+    trcf_manual_edit = fields.Boolean(
+        string='Đã sửa tay',
+        copy=False,
+        help='Bản ghi đã được sửa tay, đồng bộ sẽ không ghi đè ngày này'
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        attendances = super().create(vals_list)
+        if not self.env.context.get('trcf_sync'):
+            # Đồng bộ và khôi phục đã tự bỏ qua tháng đã lưu trữ
+            self.env['trcf.attendance.archive']._check_not_archived(attendances)
+        self.env['trcf.attendance.payroll.summary']._mark_dirty(attendances)
+        return attendances
+
+    def write(self, vals):
+        manual_edit = (not self.env.context.get('trcf_sync')
+                       and bool({'employee_id', 'check_in', 'check_out'} & set(vals)))
+        if manual_edit:
+            # Sửa giờ/nhân viên ngoài đồng bộ: giữ nguyên bản ghi ở các lần đồng bộ sau
+            vals = dict(vals, trcf_manual_edit=True)
+            self.env['trcf.attendance.archive']._check_not_archived(self)
+        summary_changed = bool({'employee_id', 'check_in', 'check_out', 'trcf_auto_closed'} & set(vals))
+        if summary_changed:
+            # Ngày cũ của chấm công cũng cần tính lại
+            self.env['trcf.attendance.payroll.summary']._mark_dirty(self)
+        res = super().write(vals)
+        if manual_edit:
+            self.env['trcf.attendance.archive']._check_not_archived(self)
+        if summary_changed:
+            self.env['trcf.attendance.payroll.summary']._mark_dirty(self)
+        return res
+
+    def unlink(self):
+        # Chuyển sang lưu trữ: bảng tổng hợp giữ nguyên số liệu của tháng đã lưu trữ
+        if not self.env.context.get('trcf_archive'):
+            self.env['trcf.attendance.payroll.summary']._mark_dirty(self)
+        return super().unlink()
+
+    @api.depends('employee_id', 'check_in')
+    def _compute_hourly_salary_display(self):
+        Rate = self.env['trcf.hr.employee.rate']
+        rate_index = Rate._get_rate_index(self.employee_id)
+        for record in self:
+            record.trcf_hourly_salary_display = record.employee_id and record.check_in and Rate._rate_at(
+                rate_index, record.employee_id, record.check_in) or 0.0
+
+    @api.depends('worked_hours', 'employee_id')
     def _compute_hourly_salary_sum(self):
-        """Tính tiền lương = lương theo giờ * số giờ làm việc"""
+        """Tính tiền lương = lương theo giờ có hiệu lực tại check_in * số giờ làm việc.
+
+        Không phụ thuộc employee_id.trcf_hourly_salary: khi đổi lương, trcf.hr.employee.rate
+        chỉ đưa các chấm công từ ngày hiệu lực vào danh sách cần tính lại.
+        """
+        Rate = self.env['trcf.hr.employee.rate']
+        rate_index = Rate._get_rate_index(self.employee_id)
         for record in self:
-            if record.worked_hours and record.employee_id.trcf_hourly_salary:
-                record.trcf_hourly_salary_sum = record.worked_hours * record.employee_id.trcf_hourly_salary
+            rate = record.employee_id and record.check_in and Rate._rate_at(
+                rate_index, record.employee_id, record.check_in)
+            if record.worked_hours and rate:
+                record.trcf_hourly_salary_sum = record.worked_hours * rate
             else:
-                record.trcf_hourly_salary_sum = 0.0
\ No newline at end of file
+                record.trcf_hourly_salary_sum = 0.0
+
+    # ===== XUẤT LƯƠNG =====
+    @api.model
+    def _get_payroll_export_sql(self, domain, date_from=None, date_to=None):
+        """Câu SQL đọc dữ liệu xuất lương của các chấm công thoả domain (đã áp dụng quyền truy cập).
+
+        Giờ vào/ra theo timezone của nhân viên, mức lương theo lịch sử lương có hiệu lực
+        tại ngày vào; thứ tự cột theo lib.payroll_export.EXPORT_COLUMNS, sắp theo nhân viên.
+
+        :param date_from: chỉ lấy chấm công có ngày vào (theo timezone của nhân viên) từ ngày này
+        :param date_to: chỉ lấy chấm công có ngày vào (theo timezone của nhân viên) đến hết ngày này
+        """
+        self.check_access('read')
+        query = self._search(domain)
+        local_check_in = SQL(
+            "(attendance.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date")
+        conditions = [SQL("attendance.id IN (%s)", query.subselect())]
+        if date_from:
+            conditions.append(SQL("%s >= %s", local_check_in, date_from))
+        if date_to:
+            conditions.append(SQL("%s <= %s", local_check_in, date_to))
+        return SQL("""
+            SELECT attendance.employee_id,
+                   resource.name,
+                   employee.trcf_device_id_num,
+                   device.name,
+                   attendance.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'),
+                   attendance.check_out AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, 'UTC'),
+                   COALESCE(attendance.worked_hours, 0)::float8,
+                   COALESCE(rate.rate, employee.trcf_hourly_salary, 0)::float8,
+                   COALESCE(attendance.trcf_hourly_salary_sum, 0)::float8,
+                   COALESCE(attendance.trcf_auto_closed, false)
+              FROM hr_attendance attendance
+              JOIN hr_employee employee ON employee.id = attendance.employee_id
+              JOIN resource_resource resource ON resource.id = employee.resource_id
+         LEFT JOIN trcf_zkteco_device device ON device.id = attendance.trcf_device_id
+         LEFT JOIN LATERAL (
+                    SELECT employee_rate.rate
+                      FROM trcf_hr_employee_rate employee_rate
+                     WHERE employee_rate.employee_id = attendance.employee_id
+                       AND employee_rate.valid_from <= (attendance.check_in AT TIME ZONE 'UTC'
+                                                        AT TIME ZONE COALESCE(resource.tz, 'UTC'))::date
+                  ORDER BY employee_rate.valid_from DESC
+                     LIMIT 1
+                   ) AS rate ON true
+             WHERE %s
+          ORDER BY resource.name, attendance.employee_id, attendance.check_in
+        """, SQL(" AND ").join(conditions))
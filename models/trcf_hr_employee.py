@@ -1,13 +1,68 @@
-from odoo import models, fields
+from odoo import models, fields, api
 
 class TrcfHrEmployee(models.Model):
     _inherit = 'hr.employee'
-    
+
     trcf_hourly_salary = fields.Float(
         string='Lương theo giờ',
         digits='Product Price',
-        help='Mức lương theo giờ của nhân viên'
+        help='Mức lương theo giờ đang có hiệu lực. Đổi mức lương sẽ thêm một dòng lịch sử '
+             'hiệu lực từ hôm nay, chấm công trước đó giữ nguyên tiền lương'
+    )
+
+    trcf_rate_ids = fields.One2many(
+        'trcf.hr.employee.rate',
+        'employee_id',
+        string='Lịch sử lương theo giờ'
     )
 
     trcf_device_id_num = fields.Char(string='ZkTeco Device ID',
-                                help="Id của nhân viên trên thiết bị")
\ No newline at end of file
+                                help="Id của nhân viên trên thiết bị")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        employees = super().create(vals_list)
+        if any(vals.get('trcf_device_id_num') for vals in vals_list):
+            # Xoá cache bảng tra nhân viên của thiết bị
+            self.env.registry.clear_cache()
+        return employees
+
+    def _employee_index_changed(self, vals):
+        """Ghi vals làm thay đổi bảng tra ID trên máy -> nhân viên (TrcfZktecoDevice._get_employee_index)"""
+        if 'trcf_device_id_num' in vals and any(
+                (employee.trcf_device_id_num or False) != (vals['trcf_device_id_num'] or False) for employee in self):
+            return True
+        return 'active' in vals and any(
+            employee.trcf_device_id_num and employee.active != bool(vals['active']) for employee in self)
+
+    def write(self, vals):
+        rate_changes = []
+        if 'trcf_hourly_salary' in vals and not self.env.context.get('trcf_rate_history'):
+            rate_changes = [
+                (employee, employee.trcf_hourly_salary) for employee in self
+                if employee.trcf_hourly_salary != vals['trcf_hourly_salary']
+            ]
+        # clear_cache xoá toàn bộ ormcache: chỉ gọi khi bảng tra thực sự đổi
+        index_changed = self._employee_index_changed(vals)
+        tz_changed = self.filtered(lambda employee: employee.tz != vals['tz']) if 'tz' in vals else self.browse()
+        res = super().write(vals)
+        if index_changed:
+            self.env.registry.clear_cache()
+        if tz_changed:
+            # Ngày làm việc của chấm công tính theo timezone nhân viên: tính lại bảng tổng hợp
+            self.env['trcf.attendance.payroll.summary']._reset_employees(tz_changed)
+        if rate_changes:
+            # Mức lương mới có hiệu lực từ ngày trong context (mặc định hôm nay),
+            # chỉ chấm công từ ngày đó được tính lại
+            Rate = self.env['trcf.hr.employee.rate']
+            valid_from = self.env.context.get('trcf_rate_valid_from') or fields.Date.context_today(self)
+            for employee, previous_rate in rate_changes:
+                Rate._set_rate(employee, vals['trcf_hourly_salary'], valid_from, previous_rate)
+        return res
+
+    def unlink(self):
+        has_device_id = any(self.mapped('trcf_device_id_num'))
+        res = super().unlink()
+        if has_device_id:
+            self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_right
+from datetime import datetime, time
+
+from odoo import models, fields, api
+
+from ..lib import local_time, punch_pairing
+
+
+class TrcfHrEmployeeRate(models.Model):
+    """Lịch sử lương theo giờ của nhân viên.
+
+    Mỗi mức lương có hiệu lực từ ngày valid_from (theo timezone của nhân viên) đến ngày
+    hiệu lực của mức tiếp theo. Tiền lương của chấm công được tính theo mức có hiệu lực
+    tại check_in, nên đổi lương chỉ tính lại các chấm công từ ngày hiệu lực trở đi.
+    """
+    _name = 'trcf.hr.employee.rate'
+    _description = 'Lịch sử lương theo giờ'
+    _order = 'employee_id, valid_from desc'
+    _rec_name = 'employee_id'
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Nhân viên',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    rate = fields.Float(
+        string='Lương theo giờ',
+        digits='Product Price',
+        required=True
+    )
+
+    valid_from = fields.Date(
+        string='Hiệu lực từ',
+        required=True,
+        default=fields.Date.context_today,
+        help='Áp dụng cho chấm công có giờ vào từ ngày này (theo timezone của nhân viên)'
+    )
+
+    _sql_constraints = [
+        ('employee_valid_from_uniq', 'unique (employee_id, valid_from)',
+         'Nhân viên đã có mức lương hiệu lực từ ngày này.'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if not self.env.context.get('trcf_rate_history'):
+            # Dòng lịch sử đầu tiên (kể cả nhập trực tiếp trên danh sách) cần mức áp dụng từ đầu
+            baseline = punch_pairing.EPOCH.date()
+            employee_ids = {vals['employee_id'] for vals in vals_list if vals.get('employee_id')}
+            employee_ids -= {
+                vals['employee_id'] for vals in vals_list
+                if vals.get('valid_from') and fields.Date.to_date(vals['valid_from']) == baseline
+            }
+            self._seed_baseline(self.env['hr.employee'].browse(employee_ids))
+        rates = super().create(vals_list)
+        if not self.env.context.get('trcf_rate_history'):
+            self._apply_rate_changes([(rate.employee_id, rate.valid_from) for rate in rates])
+        return rates
+
+    def write(self, vals):
+        changes = [(rate.employee_id, rate.valid_from) for rate in self]
+        res = super().write(vals)
+        if {'employee_id', 'rate', 'valid_from'} & set(vals):
+            self._apply_rate_changes(changes + [(rate.employee_id, rate.valid_from) for rate in self])
+        return res
+
+    def unlink(self):
+        changes = [(rate.employee_id, rate.valid_from) for rate in self]
+        res = super().unlink()
+        self._apply_rate_changes(changes)
+        return res
+
+    @api.model
+    def _set_rate(self, employee, rate, valid_from, previous_rate=0.0):
+        """Đặt mức lương của nhân viên từ ngày valid_from (sửa nếu đã có mức cùng ngày).
+
+        Lần đầu có lịch sử thì mức lương trước đó được lưu làm mức áp dụng từ đầu,
+        để chấm công cũ giữ nguyên tiền lương mà không phải tính lại.
+        """
+        self._seed_baseline(employee, {employee.id: previous_rate})
+        history = self.search([('employee_id', '=', employee.id)])
+        same_day = history.filtered(lambda item: item.valid_from == valid_from)
+        if same_day:
+            same_day.rate = rate
+        else:
+            self.create({'employee_id': employee.id, 'rate': rate, 'valid_from': valid_from})
+
+    @api.model
+    def _seed_baseline(self, employees, rates=None):
+        """Tạo mức lương áp dụng từ đầu cho các nhân viên chưa có lịch sử.
+
+        :param rates: dict employee id -> mức lương trước khi đổi; mặc định là lương trên hồ sơ
+        """
+        rates = rates or {}
+        missing = employees - self.search([('employee_id', 'in', employees.ids)]).employee_id
+        if missing:
+            self.with_context(trcf_rate_history=True).create([{
+                'employee_id': employee.id,
+                'rate': rates.get(employee.id, employee.trcf_hourly_salary),
+                'valid_from': punch_pairing.EPOCH.date(),
+            } for employee in missing])
+
+    @api.model
+    def _apply_rate_changes(self, changes):
+        """Tính lại tiền lương của chấm công từ ngày hiệu lực sớm nhất bị đổi của mỗi nhân viên"""
+        Attendance = self.env['hr.attendance']
+        start_by_employee = {}
+        for employee, valid_from in changes:
+            if employee not in start_by_employee or valid_from < start_by_employee[employee]:
+                start_by_employee[employee] = valid_from
+
+        today = fields.Date.context_today(self)
+        for employee, valid_from in start_by_employee.items():
+            check_in_from = self._local_date_to_utc(employee, valid_from)
+            attendances = Attendance.search([
+                ('employee_id', '=', employee.id),
+                ('check_in', '>=', check_in_from),
+            ])
+            self.env.add_to_compute(Attendance._fields['trcf_hourly_salary_sum'], attendances)
+            self.env['trcf.attendance.payroll.summary']._mark_dirty_employees(employee, check_in_from)
+
+            # Lương hiện tại trên hồ sơ nhân viên = mức đang có hiệu lực
+            current = self.search([
+                ('employee_id', '=', employee.id), ('valid_from', '<=', today),
+            ], order='valid_from desc', limit=1)
+            if current and employee.trcf_hourly_salary != current.rate:
+                employee.with_context(trcf_rate_history=True).trcf_hourly_salary = current.rate
+
+    @api.model
+    def _local_date_to_utc(self, employee, day):
+        """Đầu ngày theo timezone của nhân viên -> datetime UTC (naive)"""
+        epoch = punch_pairing.to_epoch(datetime.combine(day, time.min))
+        window = local_time.LocalTimeWindow(employee.tz or 'UTC', epoch, epoch)
+        return punch_pairing.from_epoch(window.to_utc(epoch))
+
+    @api.model
+    def _get_rate_index(self, employees):
+        """Bảng tra mức lương theo thời điểm cho một lô nhân viên.
+
+        :return: dict employee id -> (list mốc hiệu lực UTC tăng dần, list mức lương)
+        """
+        index = {}
+        rates = self.sudo().search_read(
+            [('employee_id', 'in', employees.ids)],
+            ['employee_id', 'valid_from', 'rate'],
+            order='employee_id, valid_from',
+        )
+        employee_by_id = {employee.id: employee for employee in employees}
+        for rate in rates:
+            employee = employee_by_id[rate['employee_id'][0]]
+            starts, values = index.setdefault(employee.id, ([], []))
+            starts.append(self._local_date_to_utc(employee, rate['valid_from']))
+            values.append(rate['rate'])
+        return index
+
+    @api.model
+    def _rate_at(self, index, employee, check_in):
+        """Mức lương có hiệu lực tại check_in; nhân viên chưa có lịch sử dùng lương trên hồ sơ"""
+        starts, values = index.get(employee.id, ((), ()))
+        position = bisect_right(starts, check_in)
+        if not position:
+            return employee.trcf_hourly_salary
+        return values[position - 1]
@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
-from collections import defaultdict
-import pytz
+import logging
+import time as time_module
+
+from odoo import models, fields, api, tools
+from odoo.addons.base.models.res_partner import _tz_get
 from odoo.exceptions import UserError
 from odoo import _
-from datetime import datetime, timedelta, time
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from ..lib import attlog_file, device_io, live_capture, local_time, punch_pairing, roster as device_roster
+from ..lib.sync_profiler import SyncProfiler
+
+_logger = logging.getLogger(__name__)
 
 # Hằng số cấu hình
 DUPLICATE_THRESHOLD_MINUTES = 15  # Ngưỡng phát hiện duplicate (phút)
+CREATE_BATCH_SIZE = 500  # Số (nhân viên, ngày) tính lại mỗi lô (ghi đè bằng ir.config_parameter)
+SYNC_MAX_WORKERS = 8  # Số thiết bị tải dữ liệu đồng thời (ghi đè bằng ir.config_parameter)
+SYNC_SOCKET_TIMEOUT = 30  # Timeout mặc định (giây) cho mỗi thao tác với thiết bị
+SYNC_MAX_WAIT_SECONDS = 1800  # Thời gian chờ tối đa cho cả lượt tải dữ liệu song song
+HEALTH_PROBE_TIMEOUT = 3  # Timeout (giây) khi kiểm tra tình trạng thiết bị
+HEALTH_STALE_SECONDS = 900  # Không phản hồi quá thời gian này coi là mất kết nối (ghi đè bằng ir.config_parameter)
+LIVE_CAPTURE_SECONDS = 100  # Thời gian mỗi lượt nhận chấm công trực tiếp (ghi đè bằng ir.config_parameter)
+LIVE_FLUSH_SECONDS = 2  # Chu kỳ ghi các lần chấm nhận trực tiếp vào hệ thống
 
 class TrcfZktecoDevice(models.Model):
     _name = 'trcf.zkteco.device'
@@ -57,15 +73,100 @@ class TrcfZktecoDevice(models.Model):
         default=30,
         help='Thời gian chờ kết nối tối đa (10-300 giây)'
     )
+
+    tz = fields.Selection(
+        _tz_get,
+        string='Timezone',
+        required=True,
+        default=lambda self: self.env.context.get('tz') or self.env.user.tz or 'Asia/Saigon',
+        help='Timezone nơi đặt thiết bị: giờ trên máy được đặt và quy đổi sang UTC theo timezone này'
+    )
     
     # ===== STATUS FIELDS =====
     is_connected = fields.Boolean(
         string='Trạng thái kết nối',
         compute='_compute_connection_status',
         store=False,
-        help='Trạng thái kết nối hiện tại với thiết bị'
+        help='Thiết bị phản hồi trong lần kiểm tra gần đây (theo dữ liệu kiểm tra định kỳ)'
+    )
+
+    last_seen = fields.Datetime(
+        string='Phản hồi lần cuối',
+        readonly=True,
+        copy=False,
+        help='Thời điểm gần nhất thiết bị phản hồi khi kiểm tra hoặc đồng bộ'
+    )
+
+    last_latency_ms = fields.Integer(
+        string='Độ trễ (ms)',
+        readonly=True,
+        copy=False,
+        help='Thời gian kết nối và lấy serial ở lần kiểm tra gần nhất'
+    )
+
+    last_probe_error = fields.Char(
+        string='Lỗi kiểm tra gần nhất',
+        readonly=True,
+        copy=False
+    )
+
+    serial_number = fields.Char(
+        string='Serial',
+        readonly=True,
+        copy=False
+    )
+
+    firmware_version = fields.Char(
+        string='Firmware',
+        readonly=True,
+        copy=False
+    )
+
+    device_user_count = fields.Integer(
+        string='Số user trên máy',
+        readonly=True,
+        copy=False
+    )
+
+    device_record_count = fields.Integer(
+        string='Số bản ghi chấm công trên máy',
+        readonly=True,
+        copy=False
     )
     
+    # ===== USER TRÊN MÁY (LƯU ĐỆM) =====
+    device_user_ids = fields.One2many(
+        'trcf.zkteco.device.user',
+        'device_id',
+        string='User trên máy'
+    )
+
+    roster_user_count = fields.Integer(
+        string='Số user đã lưu đệm',
+        readonly=True,
+        copy=False,
+        help='Số user trên máy ở lần tải bảng user gần nhất. Bảng user chỉ được tải lại khi số này thay đổi.'
+    )
+
+    roster_checksum = fields.Char(
+        string='Mã kiểm tra bảng user',
+        readonly=True,
+        copy=False
+    )
+
+    roster_packet_size = fields.Integer(
+        string='Kích thước gói user',
+        readonly=True,
+        copy=False,
+        help='Kích thước bản ghi user theo firmware, cần khi ghi user lên máy'
+    )
+
+    roster_synced_at = fields.Datetime(
+        string='Tải bảng user lúc',
+        readonly=True,
+        copy=False
+    )
+
     device_info = fields.Text(
         string='Thông tin thiết bị',
         readonly=True,
@@ -77,7 +178,79 @@ class TrcfZktecoDevice(models.Model):
         readonly=True,
         help='Thời điểm đồng bộ dữ liệu gần nhất'
     )
-    
+
+    # ===== INCREMENTAL SYNC =====
+    sync_mode = fields.Selection(
+        [('range', 'Theo khoảng ngày'), ('incremental', 'Tăng dần (từ mốc đã đồng bộ)')],
+        string='Chế độ đồng bộ',
+        default='range',
+        required=True,
+        help='Theo khoảng ngày: xử lý các lần chấm công trong khoảng Từ ngày - Đến ngày.\n'
+             'Tăng dần: chỉ xử lý các lần chấm công mới hơn mốc đã đồng bộ lần trước.'
+    )
+
+    sync_watermark = fields.Datetime(
+        string='Mốc chấm công đã đồng bộ',
+        readonly=True,
+        copy=False,
+        help='Thời điểm của lần chấm công mới nhất đã được đưa vào hệ thống'
+    )
+
+    sync_record_index = fields.Integer(
+        string='Số bản ghi trên máy lần trước',
+        readonly=True,
+        copy=False,
+        help='Số bản ghi chấm công trên thiết bị ở lần đồng bộ tăng dần gần nhất. '
+             'Nếu không đổi thì bỏ qua việc tải dữ liệu.'
+    )
+
+    clear_log_after_sync = fields.Boolean(
+        string='Xoá dữ liệu trên máy sau khi đồng bộ',
+        default=False,
+        help='Chỉ áp dụng cho chế độ tăng dần: sau khi dữ liệu đã được lưu (commit), '
+             'xoá nhật ký chấm công trên thiết bị để lần tải sau chỉ còn dữ liệu mới.'
+    )
+
+    # ===== SCHEDULED SYNC =====
+    auto_sync = fields.Boolean(
+        string='Tự động đồng bộ',
+        default=False,
+        help='Đưa thiết bị vào hàng đợi đồng bộ theo lịch của tác vụ định kỳ'
+    )
+
+    live_capture = fields.Boolean(
+        string='Nhận chấm công trực tiếp',
+        default=False,
+        help='Giữ kết nối với thiết bị để nhận từng lần chấm công ngay khi phát sinh, '
+             'chấm công được ghép cặp sau vài giây thay vì chờ lần đồng bộ tiếp theo'
+    )
+
+    live_record_count = fields.Integer(
+        string='Số bản ghi trên máy (nhận trực tiếp)',
+        readonly=True,
+        copy=False,
+        help='Số bản ghi trên máy lúc kết nối nhận trực tiếp gần nhất cộng số lần chấm đã nhận sau đó. '
+             'Khi kết nối lại, số bản ghi trên máy khác số này nghĩa là có lần chấm bị lỡ và cần tải bù.'
+    )
+
+    sync_job_ids = fields.One2many(
+        'trcf.zkteco.sync.job',
+        'device_id',
+        string='Job đồng bộ'
+    )
+
+    sync_run_ids = fields.One2many(
+        'trcf.zkteco.sync.run',
+        'device_id',
+        string='Nhật ký đồng bộ'
+    )
+
+    punch_ids = fields.One2many(
+        'trcf.zkteco.punch',
+        'device_id',
+        string='Lần chấm công thô'
+    )
+
     # ===== ADDITIONAL FIELDS =====
     active = fields.Boolean(
         string='Active',
@@ -85,397 +258,937 @@ class TrcfZktecoDevice(models.Model):
         help='Kích hoạt/Vô hiệu hóa thiết bị'
     )
 
-    @api.depends()
+    @api.depends('last_seen')
     def _compute_connection_status(self):
-        """Kiểm tra kết nối bằng cách lấy serial number"""
+        """Đọc trạng thái đã lưu, không kết nối đến thiết bị"""
+        stale_before = fields.Datetime.now() - timedelta(seconds=self._get_health_stale_seconds())
         for record in self:
-            try:
-                from zk import ZK
-                
-                # Kiểm tra có IP không
-                if not record.ip_address:
-                    record.is_connected = False
-                    continue
-                
-                # Thử kết nối và lấy serial
-                zk = ZK(record.ip_address, port=record.port or 4370, timeout=3)
-                conn = zk.connect()
-                
-                if conn:
-                    try:
-                        # Lấy serial number làm test kết nối
-                        serial = conn.get_serialnumber()
-                        record.is_connected = bool(serial)
-                    finally:
-                        conn.disconnect()
-                else:
-                    record.is_connected = False
-                
-            except Exception:
-                record.is_connected = False
+            record.is_connected = bool(record.last_seen and record.last_seen >= stale_before)
+
+    def _get_health_stale_seconds(self):
+        """Quá thời gian này không có phản hồi thì coi là mất kết nối"""
+        stale_seconds = self.env['ir.config_parameter'].sudo().get_param(
+            'trcf_zkteco_attendance_sync.health_stale_seconds')
+        return int(stale_seconds or HEALTH_STALE_SECONDS)
+
+    def _probe_health(self):
+        """Kiểm tra song song các thiết bị và lưu lại tình trạng.
+
+        :return: dict device id -> (True, thông tin) hoặc (False, exception)
+        """
+        jobs = {
+            device.id: (device._get_device_params()._replace(timeout=HEALTH_PROBE_TIMEOUT),)
+            for device in self if device.ip_address
+        }
+        results = device_io.run_parallel(device_io.probe, jobs, self._get_sync_workers(), SYNC_MAX_WAIT_SECONDS)
+        now = fields.Datetime.now()
+        for device in self:
+            success, info = results.get(device.id, (False, ConnectionError('Chưa có địa chỉ IP')))
+            if success:
+                device.write({
+                    'last_seen': now,
+                    'last_latency_ms': info['latency_ms'],
+                    'last_probe_error': False,
+                    'serial_number': info['serial_number'],
+                    'firmware_version': info['firmware_version'],
+                    'device_user_count': info['users'],
+                    'device_record_count': info['records'],
+                })
+            else:
+                device.last_probe_error = str(info)
+        # Số user trên máy thay đổi: làm mới bảng user đã lưu đệm
+        self.filtered(
+            lambda device: results.get(device.id, (False,))[0]
+            and (not device.roster_synced_at or device.device_user_count != device.roster_user_count)
+        )._refresh_rosters()
+        return results
+
+    @api.model
+    def _cron_probe_devices(self):
+        """Tác vụ định kỳ: kiểm tra tình trạng tất cả thiết bị đang hoạt động"""
+        self.search([])._probe_health()
 
     # ====== METHOD =====
     def action_check_connection(self):
-        try:
-            from zk import ZK
-            
-            # Kết nối và lấy tên thiết bị
-            zk = ZK(self.ip_address, port=self.port or 4370, timeout=5)
-            conn = zk.connect()
-            
-            if conn:
-                serial_number = conn.get_serialnumber()
-                user_count = len(conn.get_users())      # Số lượng user
-                # firmware = conn.get_firmware_version()  # Phiên bản firmware
-                # platform = conn.get_platform()         # Platform info
-                # mac_address = conn.get_mac()            # MAC address (nếu hỗ trợ)
-
-                conn.disconnect()
-                
-                # Cập nhật trạng thái
-                self.is_connected = True
-
-                message = f'Serial: {serial_number} - {user_count} nhân viên'
-                
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': '✅ Kết nối thành công',
-                        'message': message,
-                        'type': 'success',
-                    }
-                }
-            else:
-                self.is_connected = False
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': '❌ Kết nối thất bại',
-                        'message': 'Không thể kết nối thiết bị',
-                        'type': 'danger',
-                    }
-                }
-        
-        except Exception as e:
-            self.is_connected = False
+        self.ensure_one()
+        success, info = self._probe_health()[self.id]
+        if success:
+            message = f"Serial: {info['serial_number']} - {info['users']} nhân viên - {info['latency_ms']} ms"
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
                 'params': {
-                    'title': '❌ Lỗi',
-                    'message': f'{str(e)}',
-                    'type': 'danger',
+                    'title': '✅ Kết nối thành công',
+                    'message': message,
+                    'type': 'success',
                 }
             }
 
-    def action_sync_data(self):
-        """Đồng bộ dữ liệu từ thiết bị ZKTeco"""
-
-        # SET TIMEZONE TRƯỚC KHI SYNC
-        self.action_set_timezone()
-
-        try:
-            from zk import ZK
-            # Kết nối đến thiết bị
-            zk = ZK(self.ip_address, port=self.port or 4370, timeout=5)
-            conn = zk.connect()
-            
-            if not conn:
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': '❌ Lỗi kết nối',
-                        'message': 'Không thể kết nối đến thiết bị',
-                        'type': 'danger',
-                    }
-                }
-            
-            try:
-                # Lấy danh sách users => users_data
-                users = conn.get_users()
-                users_data = []
-                for user in users:
-                    user_info = {
-                        'uid': user.uid,
-                        'name': user.name,
-                        'privilege': user.privilege,
-                        'password': user.password,
-                        'group_id': user.group_id,
-                        'user_id': user.user_id,
-                    }
-                    users_data.append(user_info)
-                    print(f"ID: {user.uid} | Name: {user.name} | Privilege: {user.privilege} | Group: {user.group_id}")
-
-                # Lấy dữ liệu chấm công
-                attendances = conn.get_attendance()
-                print("=== DỮ LIỆU CHẤM CÔNG THÁNG===")
-                attendance_data = []
-
-                # ===== FILTER THEO KHOẢNG THỜI GIAN =====
-                sync_from = self.env.context.get('sync_from') or self.sync_date_from
-                sync_to = self.env.context.get('sync_to') or self.sync_date_to
-
-                # Convert về datetime.date - cách Odoo chuẩn
-                if sync_from:
-                    sync_from = fields.Date.from_string(sync_from) if isinstance(sync_from, str) else sync_from
-                if sync_to:
-                    sync_to = fields.Date.from_string(sync_to) if isinstance(sync_to, str) else sync_to
-
-                for att in attendances:
-                    att_date = att.timestamp.date()
-                    # Kiểm tra trong khoảng thời gian
-                    if sync_from <= att_date <= sync_to:
-                        attendance_info = {
-                            'uid': att.uid,
-                            'user_id': att.user_id,
-                            'timestamp': att.timestamp.strftime('%Y-%m-%d %H:%M:%S') if att.timestamp else None,
-                            'status': att.status,
-                            'punch': att.punch,
-                            'date': att.timestamp.date() if att.timestamp else None,
-                            'time': att.timestamp.time() if att.timestamp else None,
-                        }
-                        attendance_data.append(attendance_info)
-                        print(f"User ID: {att.user_id} | Time: {att.timestamp}")
-                
-                # Sắp xếp lại thứ tự theo thời gian
-                attendance_data.sort(key=lambda x: datetime.strptime(x['timestamp'], '%Y-%m-%d %H:%M:%S'))
-                print(f"\nTổng số bản ghi chấm công {sync_from} - {sync_to}: {len(attendance_data)}")
-
-                attendance_group = defaultdict(lambda: defaultdict(list))
-                
-                for record in attendance_data:
-                    user_id_tamp = str(record['user_id'])
-                    date_tamp = str(record['date'])
-                    attendance_group[user_id_tamp][date_tamp].append(record)
-
-                #Danh sách hr_attendance_list sẵn sàn đưa vào dữ liệu
-                hr_attendance_list = []
-                
-                for user_id, dates_dict in attendance_group.items(): 
-                    print(f"\n=== Xử lý User ID: {user_id} ===")
-
-                    # Chuyển user_id trên máy thành employee_id
-                    employee_find  = self._find_employee_by_device_id(user_id)
-                    if not employee_find:
-                        print(f"❌ Không tìm thấy employee với device_user_id: {user_id}")
-                        continue
-                    
-                    # Sắp xếp các ngày theo thứ tự thời gian
-                    sorted_dates = sorted(dates_dict.keys())
-                    
-                    for date_str in sorted_dates:
-                        attendance_list = dates_dict[date_str]
-                        print(f"  📅 Ngày: {date_str}")
-                        
-                        # Sắp xếp theo thời gian trong ngày
-                        attendance_list.sort(key=lambda record: datetime.strptime(record['timestamp'], '%Y-%m-%d %H:%M:%S'))
-                        
-                        check_count = 0;
-                        for current_record in attendance_list: 
-                            if(check_count == 0):
-                                print(f"    ✅ CHECKIN: {current_record['timestamp']}")
-                                checkin_str = current_record['timestamp']
-
-                                hr_attendance_record = {}
-                                hr_attendance_record['employee_id'] = employee_find.id
-                                hr_attendance_record['check_in'] = current_record['timestamp']
-
-                                check_count = 1
-                                previous_time = datetime.strptime(current_record['timestamp'], '%Y-%m-%d %H:%M:%S')
-                            else: 
-                                is_duplicate_record = False
-                                
-                                # Lấy thời gian record hiện tại 
-                                current_time = datetime.strptime(current_record['timestamp'], '%Y-%m-%d %H:%M:%S')
-
-                                #so sánh 2 giá trị gần nhau quá 15 phút là sẽ là duplitcate
-                                time_difference_minutes = abs((current_time - previous_time).total_seconds() / 60)
-
-                                #Lấy lại thời gian record trước
-                                previous_time = datetime.strptime(current_record['timestamp'], '%Y-%m-%d %H:%M:%S')
-
-                                if(time_difference_minutes < DUPLICATE_THRESHOLD_MINUTES): 
-                                    is_duplicate_record = True
-
-                                if(is_duplicate_record == True):
-                                    time_gap = round(time_difference_minutes, 1)
-                                    print(f"    ⏭️  DUPLICATE: {current_record['timestamp']} (cách {time_gap} phút)")
-                                else:
-                                    check_count +=1
-                                    if(check_count % 2 == 1):
-                                        print(f"    ✅ CHECKIN: {current_record['timestamp']}")
-                                        checkin_str = current_record['timestamp']
-                                        hr_attendance_record = {}
-                                        hr_attendance_record['employee_id'] = employee_find.id
-                                        hr_attendance_record['check_in'] = current_record['timestamp']
-                                    else: 
-                                        print(f"    🚪 CHECKOUT: {current_record['timestamp']}")
-                                        hr_attendance_record['check_out'] = current_record['timestamp']
-                                        hr_attendance_list.append(hr_attendance_record)
-                                        # print(f" record: {hr_attendance_record}")
-
-                        if check_count % 2 == 1: 
-                            checkin = datetime.strptime(checkin_str, "%Y-%m-%d %H:%M:%S")
-                            hr_attendance_record['check_out'] = datetime.combine(checkin.date(), time(23, 59, 59)).strftime("%Y-%m-%d %H:%M:%S")
-                            hr_attendance_list.append(hr_attendance_record)
-                            # print(f" record: {hr_attendance_record}")
-
-                # Tạo message tóm tắt
-                message = f"Số lượng nhân viên: chưa tính | Lần chấm công: chưa tính"
-                
-                for hr_record in hr_attendance_list: 
-                    # Tạo record mới trong hr.attendance
-                    
-                    # Lấy timezone user
-                    user_timezone = pytz.timezone(self.env.user.tz or 'UTC')
-                    offset_hours = datetime.now(user_timezone).utcoffset().total_seconds() / 3600
-
-                    # Chuyển thời gian thiết bị về UTC
-                    check_in_record = datetime.strptime(hr_record['check_in'], '%Y-%m-%d %H:%M:%S')
-                    check_out_record = datetime.strptime(hr_record['check_out'], '%Y-%m-%d %H:%M:%S')
-
-                    check_in = check_in_record - timedelta(hours=offset_hours)
-                    check_out = check_out_record - timedelta(hours=offset_hours)
-
-                    # 🔍 KIỂM TRA DUPLICATE: Đã có dữ liệu chấm công trong ngày này chưa?
-                    existing_attendance = self.env['hr.attendance'].search([
-                        ('employee_id', '=', hr_record['employee_id']),
-                        ('check_in', '=', check_in), 
-                    ], limit=1)
-
-                    if existing_attendance :
-                        print(f"❌ Đã có thông tin chấm công user_id {hr_record['employee_id']} : {check_in_record}")
-                        continue; 
-
-                    attendance_record = self.env['hr.attendance'].create({
-                        'employee_id': int(hr_record['employee_id']),
-                        'check_in': check_in,
-                        'check_out': check_out,
-                    })
-                    print(f"✅ đã cập nhật chấm công user_id {hr_record['employee_id']} : {check_in_record} - {check_out_record}")
-
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': '✅ Đồng bộ thành công',
-                        'message': message,
-                        'type': 'success',
-                        'sticky': True,
-                    }
-                }
-                
-            finally:
-                conn.disconnect()
-                
-        except ImportError:
+        if isinstance(info, ConnectionError):
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
                 'params': {
-                    'title': '📦 Thiếu thư viện',
-                    'message': 'Chưa cài đặt thư viện pyzk',
-                    'type': 'warning',
+                    'title': '❌ Kết nối thất bại',
+                    'message': 'Không thể kết nối thiết bị',
+                    'type': 'danger',
                 }
             }
-            
-        except Exception as e:
-            print(f"Lỗi đồng bộ: {str(e)}")
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': '❌ Lỗi',
+                'message': f'{str(info)}',
+                'type': 'danger',
+            }
+        }
+
+    def action_enqueue_sync(self):
+        """Đưa việc đồng bộ vào hàng đợi, job được chạy nền bởi tác vụ định kỳ.
+
+        Gọi được cho nhiều thiết bị (hành động trên danh sách): khoảng ngày được lấy theo
+        từng thiết bị, các thiết bị cùng khoảng ngày được đưa vào hàng đợi cùng lúc.
+        """
+        devices_by_window = defaultdict(lambda: self.browse())
+        for device in self:
+            devices_by_window[device._get_sync_window()] |= device
+        Job = self.env['trcf.zkteco.sync.job']
+        jobs = Job.browse()
+        for (sync_from, sync_to), devices in devices_by_window.items():
+            jobs |= Job._enqueue(devices, sync_from, sync_to)
+        self.env.ref('trcf_zkteco_attendance_sync.ir_cron_trcf_zkteco_sync_job')._trigger()
+
+        if len(self) == 1:
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
                 'params': {
-                    'title': '❌ Lỗi đồng bộ',
-                    'message': f'Chi tiết: {str(e)}',
-                    'type': 'danger',
-                    'sticky': True,
+                    'title': '⏳ Đã đưa vào hàng đợi',
+                    'message': f'{len(jobs)} job đồng bộ sẽ được chạy nền',
+                    'type': 'info',
                 }
             }
-    
+        lines = []
+        for job in jobs:
+            if job.date_from or job.date_to:
+                lines.append(f"⏳ {job.device_id.name}: {job.date_from or ''} - {job.date_to or ''}")
+            else:
+                lines.append(f"⏳ {job.device_id.name}: tăng dần từ mốc đã đồng bộ")
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': f'⏳ Đã đưa {len(self)} thiết bị vào hàng đợi',
+                'message': '\n'.join(lines),
+                'type': 'info',
+                'sticky': True,
+            }
+        }
+
+    @api.model
+    def _cron_enqueue_scheduled_sync(self):
+        """Tác vụ định kỳ: đưa các thiết bị bật Tự động đồng bộ vào hàng đợi.
+
+        Thiết bị theo khoảng ngày được đồng bộ từ hôm qua đến hôm nay.
+        """
+        devices = self.search([('auto_sync', '=', True)])
+        today = fields.Date.today()
+        self.env['trcf.zkteco.sync.job']._enqueue(devices, today - timedelta(days=1), today)
+
+    @api.model
+    def _format_sync_result(self, result):
+        """Message tóm tắt kết quả đồng bộ một thiết bị"""
+        if result.get('no_new_data'):
+            return 'Không có dữ liệu chấm công mới'
+        message = (
+            f"Số lượng nhân viên: {result['employee_count']} | "
+            f"Ngày cần tính lại: {result['dirty_day_count']} | "
+            f"Lần chấm công: {result['punch_count']} ({result['duplicate_count']} lần trùng) | "
+            f"Tạo mới: {result['created_count']} | Đã xoá: {result['removed_count']} | "
+            f"Không đổi: {result['skipped_count']}"
+        )
+        if result['protected_day_count']:
+            message += f" | Giữ nguyên {result['protected_day_count']} ngày có chấm công sửa tay hoặc đã lưu trữ"
+        if result['unmatched_user_ids']:
+            message += f" | Không tìm thấy nhân viên cho ID trên máy: {', '.join(result['unmatched_user_ids'])}"
+        return message
+
+    def _get_sync_workers(self):
+        """Số thiết bị được tải dữ liệu đồng thời"""
+        workers = self.env['ir.config_parameter'].sudo().get_param(
+            'trcf_zkteco_attendance_sync.sync_workers')
+        return int(workers or SYNC_MAX_WORKERS)
+
+    def _get_device_params(self):
+        """Tham số kết nối thuần (không ORM) để dùng trong thread"""
+        self.ensure_one()
+        return device_io.DeviceParams(
+            self.id, self.ip_address, self.port or 4370, self.timeout or SYNC_SOCKET_TIMEOUT)
+
+    def _get_sync_window(self):
+        """Khoảng ngày đồng bộ ở chế độ theo khoảng ngày: (sync_from, sync_to) kiểu date"""
+        sync_from = self.env.context.get('sync_from') or self.sync_date_from
+        sync_to = self.env.context.get('sync_to') or self.sync_date_to
+
+        # Convert về datetime.date - cách Odoo chuẩn
+        if sync_from:
+            sync_from = fields.Date.from_string(sync_from) if isinstance(sync_from, str) else sync_from
+        else:
+            sync_from = fields.Date.today().replace(day=1)
+        if sync_to:
+            sync_to = fields.Date.from_string(sync_to) if isinstance(sync_to, str) else sync_to
+        else:
+            sync_to = fields.Date.today()
+        return sync_from, sync_to
+
+    def _get_fetch_args(self):
+        """Tham số cho device_io.fetch_attendance của thiết bị"""
+        self.ensure_one()
+        known_records = None
+        if self.sync_mode == 'incremental':
+            # Chỉ cần các ngày từ ngày của mốc đã đồng bộ trở đi
+            date_to = None
+            date_from = self._utc_to_device_time(self.sync_watermark).date() if self.sync_watermark else None
+            if self.sync_watermark:
+                known_records = self.sync_record_index
+        else:
+            date_from, date_to = self._get_sync_window()
+        return self._get_device_params(), known_records, self._get_device_tz(), date_from, date_to
+
+    def _create_sync_run(self, profiler, result, job=False):
+        """Lưu nhật ký của một lần đồng bộ (thời gian từng giai đoạn và số liệu)"""
+        self.ensure_one()
+        return self.env['trcf.zkteco.sync.run'].sudo().create(
+            self.env['trcf.zkteco.sync.run']._prepare_run_vals(self, profiler, result, job))
+
+    def _clear_device_logs(self, results):
+        """Xoá nhật ký chấm công trên các thiết bị cần xoá sau khi đồng bộ.
+
+        Dữ liệu được commit trước, chỉ sau đó mới xoá trên máy.
+
+        :param results: dict device id -> kết quả của _process_fetch_result
+        """
+        clear_jobs = {
+            device.id: (device._get_device_params(), results[device.id]['records'])
+            for device in self
+            if not results[device.id].get('error') and results[device.id].get('clear_log')
+        }
+        if not clear_jobs:
+            return
+        self.env.cr.commit()
+        cleared = device_io.run_parallel(
+            device_io.clear_attendance, clear_jobs, self._get_sync_workers(), SYNC_MAX_WAIT_SECONDS)
+        cleared_ids = [device_id for device_id, (success, done) in cleared.items() if success and done]
+        self.browse(cleared_ids).write({'sync_record_index': 0})
+
+    def _process_fetch_result(self, fetch_result, profiler=None):
+        """Bước 1 của đồng bộ: lưu lần chấm công đã tải của một thiết bị vào bảng tạm.
+
+        Việc ghép cặp được làm ở bước 2 (_pair_fetched_punches), sau khi mọi thiết bị
+        trong lượt đồng bộ đã được lưu.
+
+        :param profiler: SyncProfiler của lần đồng bộ (đã có số liệu giai đoạn tải dữ liệu)
+        """
+        self.ensure_one()
+        profiler = profiler or SyncProfiler(self.name)
+        incremental = self.sync_mode == 'incremental'
+        result = {
+            'records': fetch_result.records,
+            'clear_log': incremental and self.clear_log_after_sync,
+            'unmatched_user_ids': [],
+        }
+        # Tải được dữ liệu nghĩa là thiết bị đang phản hồi
+        self.write({
+            'last_seen': fields.Datetime.now(),
+            'device_record_count': fetch_result.records,
+        })
+        if fetch_result.time_info:
+            self._write_time_info(fetch_result.time_info)
+        if fetch_result.roster:
+            self._store_roster(fetch_result.roster)
+
+        # Chế độ tăng dần: số bản ghi trên máy không đổi => không có gì mới để lưu
+        if fetch_result.punches is None:
+            self.write({'last_sync_date': fields.Datetime.now()})
+            result['clear_log'] = False
+            return result
+
+        # Lưu lần chấm công thô; lần chấm mới đánh dấu (ID trên máy, ngày) cần tính lại
+        with profiler.phase('stage'):
+            profiler.count('staged', self.env['trcf.zkteco.punch']._ingest(self, fetch_result.punches))
+
+        sync_vals = {'last_sync_date': fields.Datetime.now()}
+        if incremental:
+            sync_vals['sync_record_index'] = fetch_result.records
+            if len(fetch_result.punches):
+                max_timestamp = self._device_time_to_utc(punch_pairing.from_epoch(max(fetch_result.punches.epochs)))
+                if not self.sync_watermark or max_timestamp > self.sync_watermark:
+                    sync_vals['sync_watermark'] = max_timestamp
+        self.write(sync_vals)
+        return result
+
+    def _pair_fetched_punches(self, result, chunk_callback=None, profiler=None):
+        """Bước 2 của đồng bộ: ghép cặp các ngày có lần chấm mới và cập nhật result của bước 1"""
+        profiler = profiler or SyncProfiler(self.name)
+        result.update(self._pair_dirty_punches(chunk_callback, profiler))
+        if not result['dirty_day_count'] and not profiler.counters.get('staged'):
+            result['no_new_data'] = True
+        return result
+
+    def _pair_dirty_punches(self, chunk_callback=None, profiler=None):
+        """Ghép cặp lại các (nhân viên, ngày) có lần chấm chưa ghép cặp trên thiết bị.
+
+        Mỗi lô gồm một số (ID trên máy, ngày): đọc toàn bộ lần chấm của các ngày đó trên mọi
+        thiết bị từ bảng tạm (đã gộp theo thời gian), ghép cặp, thay hr.attendance do đồng bộ
+        tạo của các ngày đó rồi đánh dấu lần chấm đã ghép cặp - tất cả trong cùng transaction của lô.
+
+        :param chunk_callback: hàm gọi sau mỗi lô với số bản ghi đã tạo đến thời điểm đó
+            (job đồng bộ dùng để commit theo lô)
+        """
+        self.ensure_one()
+        profiler = profiler or SyncProfiler(self.name)
+        Punch = self.env['trcf.zkteco.punch']
+        result = {
+            'dirty_day_count': 0,
+            'punch_count': 0,
+            'created_count': 0,
+            'removed_count': 0,
+            'skipped_count': 0,
+            'protected_day_count': 0,
+        }
+        employee_ids = set()
+        unmatched_user_ids = set()
+
+        dirty_keys = Punch._get_dirty_keys(self)
+        batch_size = self._get_create_batch_size()
+        for start in range(0, len(dirty_keys), batch_size):
+            keys = dirty_keys[start:start + batch_size]
+            punches, device_ids, punch_ids = Punch._load_keys(keys, self._get_device_tz())
+            attendance_vals_list, unmatched = self._prepare_attendance_vals(punches, profiler, device_ids)
+            replace_result = self._replace_attendances(attendance_vals_list, profiler)
+            Punch._mark_paired(punch_ids)
+            self.env.flush_all()
+
+            result['dirty_day_count'] += len(keys)
+            result['punch_count'] += len(punches)
+            for key, value in replace_result.items():
+                result[key] += value
+            employee_ids.update(vals['employee_id'] for vals in attendance_vals_list)
+            unmatched_user_ids.update(unmatched)
+            if chunk_callback:
+                chunk_callback(result['created_count'])
+
+        _logger.debug("%s: %d employee-days re-paired, %d attendances created, %d removed",
+                      self.name, result['dirty_day_count'], result['created_count'], result['removed_count'])
+        result.update({
+            'duplicate_count': profiler.counters.get('duplicates', 0),
+            'employee_count': len(employee_ids),
+            'unmatched_user_ids': sorted(unmatched_user_ids),
+        })
+        return result
+
+    def action_rebuild_attendance(self):
+        """Ghép cặp lại chấm công trong khoảng ngày từ lần chấm công thô đã lưu"""
+        date_from, date_to = self._get_sync_window()
+        result = self._rebuild_attendance(date_from, date_to)
+        message = (
+            f"Ngày tính lại: {result['dirty_day_count']} | Lần chấm công: {result['punch_count']} | "
+            f"Đã xoá: {result['removed_count']} | Tạo mới: {result['created_count']}"
+        )
+        if result['protected_day_count']:
+            message += f" | Giữ nguyên {result['protected_day_count']} ngày có chấm công sửa tay hoặc đã lưu trữ"
+        if result['unmatched_user_ids']:
+            message += f" | Không tìm thấy nhân viên cho ID trên máy: {', '.join(result['unmatched_user_ids'])}"
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': f'✅ Đã dựng lại chấm công {date_from} - {date_to}',
+                'message': message,
+                'type': 'success',
+                'sticky': True,
+            }
+        }
+
+    def _rebuild_attendance(self, date_from, date_to):
+        """Ghép cặp lại chấm công của các thiết bị trong khoảng ngày, không kết nối thiết bị.
+
+        hr.attendance do thiết bị tạo (chưa sửa tay) trong khoảng ngày bị xoá, trừ các ngày có
+        chấm công sửa tay và các ngày bị khoá (_get_frozen_days), được giữ nguyên cả ngày như
+        khi đồng bộ; các lần chấm trong khoảng
+        được đưa về chưa ghép cặp rồi ghép cặp lại theo quy tắc và bảng nhân viên hiện tại.
+
+        :param date_from: ngày đầu (date, giờ trên máy), gồm cả ngày này
+        :param date_to: ngày cuối (date, giờ trên máy), gồm cả ngày này
+        """
+        Attendance = self.env['hr.attendance'].with_context(trcf_sync=True)
+        result = defaultdict(int, unmatched_user_ids=[])
+        for device in self:
+            utc_from = device._device_time_to_utc(datetime.combine(date_from, time.min))
+            utc_to = device._device_time_to_utc(datetime.combine(date_to + timedelta(days=1), time.min))
+            generated = Attendance.search([
+                ('trcf_device_id', '=', device.id),
+                ('trcf_generated', '=', True),
+                ('trcf_manual_edit', '=', False),
+                ('check_in', '>=', utc_from),
+                ('check_in', '<', utc_to),
+            ])
+            # Ngày có chấm công sửa tay bị _replace_attendances bỏ qua: xoá ở đây thì không được tạo lại
+            protected = Attendance.search([
+                ('employee_id', 'in', generated.employee_id.ids),
+                ('check_in', '>=', utc_from),
+                ('check_in', '<', utc_to),
+                '|', ('trcf_generated', '=', False), ('trcf_manual_edit', '=', True),
+            ])
+            protected_keys = {
+                (attendance.employee_id.id, day)
+                for attendance, day in zip(protected, device._get_local_days(protected))
+            }
+            generated_keys = [
+                (attendance.employee_id.id, day)
+                for attendance, day in zip(generated, device._get_local_days(generated))
+            ]
+            # Ngày đã lưu trữ/khôi phục hoặc trước mốc lưu trữ không còn đủ lần chấm thô để tạo lại
+            protected_keys |= self._get_frozen_days(generated_keys)
+            removable = Attendance.browse([
+                attendance.id
+                for attendance, key in zip(generated, generated_keys)
+                if key not in protected_keys
+            ])
+            result['removed_count'] += len(removable)
+            removable.unlink()
+            self.env['trcf.zkteco.punch']._mark_unpaired(device, date_from, date_to)
+
+            device_result = device._pair_dirty_punches()
+            for key in ('dirty_day_count', 'punch_count', 'created_count', 'removed_count', 'protected_day_count'):
+                result[key] += device_result[key]
+            result['unmatched_user_ids'] += device_result['unmatched_user_ids']
+        return result
+
     # ===== THÊM CÁC METHOD HỖ TRỢ =====
     def action_set_timezone(self):
         """Set timezone với thời gian chính xác"""
         try:
-            from zk import ZK
-            
-            zk = ZK(self.ip_address, port=self.port or 4370, timeout=15)
-            conn = zk.connect()
-            
-            if not conn:
-                raise UserError(_("Cannot connect to device."))
-            
-            try:
-                # Lấy thời gian thiết bị trước khi set
-                device_time_before = conn.get_time()
-                print(f"⏰ Device time BEFORE: {device_time_before}")
-                
-                # ✅ SỬA: Lấy đúng thời gian theo timezone
-                user_tz = self.env.context.get('tz') or self.env.user.tz or 'Asia/Saigon'
-                target_timezone = pytz.timezone(user_tz)
-                
-                # ✅ ĐÚNG: Lấy thời gian hiện tại theo timezone
-                local_now = datetime.now(target_timezone)
-                local_naive = local_now.replace(tzinfo=None)  # Remove timezone info for device
-                
-                print(f"🖥️ Server UTC: {datetime.now()}")  # Hiển thị để so sánh
-                print(f"🌍 Local time ({user_tz}): {local_now}")
-                print(f"📱 Setting to device: {local_naive}")
-                
-                # ✅ SỬA: Set đúng thời gian local
-                try:
-                    conn.set_time(local_naive)  # ✅ Set local time thay vì UTC
-                    print("✅ Method: Set local time successfully")
-                except Exception as e1:
-                    print(f"❌ Set local time failed: {e1}")
-
-                # Verify sau khi set
-                device_time_after = conn.get_time()
-                time_diff = (device_time_after - device_time_before).total_seconds() / 3600
-                
-                print(f"✅ Device time AFTER: {device_time_after}")
-                print(f"📊 Time difference: {time_diff:.1f} hours")
-                
-                # ✅ SỬA: Update với thông tin chính xác
-                self.write({
-                    'device_info': f'Timezone: {user_tz} | '
-                                f'Before: {device_time_before} | '
-                                f'After: {device_time_after} | '
-                                f'Difference: {time_diff:.1f}h | '
-                                f'Local time set: {local_now}'  # ✅ Hiển thị thời gian thực tế set
-                })
-                
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': '✅ Set timezone thành công',
-                        'message': f'Device time: {device_time_after}. Adjusted: {time_diff:.1f}h',
-                        'type': 'success',
-                    }
-                }
-            finally:
-                conn.disconnect()
-                
+            with device_io.session(self._get_device_params()._replace(timeout=15)) as conn:
+                time_info = device_io.sync_device_time(conn, self._get_device_tz())
         except Exception as e:
             raise UserError(_(f"Error: {str(e)}"))
 
-    def _find_employee_by_device_id(self, device_user_id):
-        """Tìm employee dựa trên device_user_id """
-        
-        # Phương pháp 1: Tìm theo trcf_device_id_num
-        employee = self.env['hr.employee'].search([
-            ('trcf_device_id_num', '=', str(device_user_id))
-        ], limit=1)
-        if employee.exists():
-            return employee
-        
-        # Phương pháp 2: Tìm theo ID trực tiếp
-        employee = self.env['hr.employee'].browse(device_user_id)
-        if employee.exists():
-            return employee
-        
-        # Không tìm thấy
-        return False
+        self._write_time_info(time_info)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': '✅ Set timezone thành công',
+                'message': f"Device time: {time_info['after']}. Adjusted: {time_info['difference']:.1f}h",
+                'type': 'success',
+            }
+        }
+
+    # ===== NHẬP FILE TỪ USB =====
+    def _import_attlog_file(self, fileobj, date_from=None, date_to=None):
+        """Nhập file nhật ký chấm công xuất từ máy (attlog.dat hoặc file nhị phân).
+
+        File được đọc từng lô và đi cùng đường với đồng bộ qua mạng: lọc theo khoảng ngày
+        khi giải mã, lưu bảng tạm, rồi ghép cặp các (ID trên máy, ngày) có lần chấm mới.
+
+        :param fileobj: file nhị phân mở để đọc
+        :raise ValueError: không nhận ra định dạng file
+        :return: dict kết quả như _pair_fetched_punches
+        """
+        self.ensure_one()
+        profiler = SyncProfiler(self.name)
+        cached_roster = self._get_cached_roster()
+        users_by_uid = {user.uid: user.user_id for user in cached_roster.users} if cached_roster else None
+        Punch = self.env['trcf.zkteco.punch']
+        batches = attlog_file.iter_punches(fileobj, date_from, date_to, users_by_uid)
+        while True:
+            with profiler.phase('decode'):
+                punches = next(batches, None)
+            if punches is None:
+                break
+            profiler.count('punches', len(punches))
+            with profiler.phase('stage'):
+                profiler.count('staged', Punch._ingest(self, punches))
+
+        result = {'unmatched_user_ids': []}
+        self._pair_fetched_punches(result, profiler=profiler)
+        self._create_sync_run(profiler, result)
+        return result
+
+    # ===== NHẬN CHẤM CÔNG TRỰC TIẾP =====
+    @api.model
+    def _cron_live_capture(self):
+        """Tác vụ định kỳ: nhận chấm công trực tiếp từ các thiết bị bật Nhận chấm công trực tiếp.
+
+        Mỗi lượt chạy trong thời gian giới hạn (tác vụ định kỳ chạy lại ngay sau đó); trong lượt,
+        mỗi thiết bị có một thread tự kết nối lại khi lỗi. Lần chấm nhận được ghi theo lô nhỏ
+        qua cùng đường lưu bảng tạm và ghép cặp với đồng bộ, mỗi lô một lần commit.
+        Thiết bị chỉ được đưa vào hàng đợi đồng bộ để tải bù khi lúc (kết nối lại), số bản ghi trên
+        máy khác số đã biết (xem _update_live_record_count), tức có lần chấm phát sinh khi chưa
+        có kết nối; các lượt nhận nối tiếp nhau không có lần chấm bị lỡ thì không tải lại nhật ký.
+        """
+        devices = self.search([('live_capture', '=', True), ('ip_address', '!=', False)])
+        if not devices:
+            return
+        capture = live_capture.LiveCapture(device._get_device_params() for device in devices)
+        capture.start()
+        started = time_module.monotonic()
+        try:
+            while time_module.monotonic() - started < self._get_live_capture_seconds():
+                batches = capture.drain(LIVE_FLUSH_SECONDS)
+                if batches:
+                    self._flush_live_punches(batches)
+        finally:
+            capture.stop()
+            batches = capture.drain(0)
+            if batches:
+                self._flush_live_punches(batches)
+
+    def _get_live_capture_seconds(self):
+        seconds = self.env['ir.config_parameter'].sudo().get_param(
+            'trcf_zkteco_attendance_sync.live_capture_seconds')
+        return int(seconds or LIVE_CAPTURE_SECONDS)
+
+    def _enqueue_live_backfill(self):
+        """Đồng bộ bù các thiết bị có lần chấm không nhận được trực tiếp.
+
+        Lần chấm phát sinh giữa hai lượt nhận hoặc trong lúc chờ kết nối lại không được máy gửi lại;
+        job đồng bộ tải nhật ký trên máy (thiết bị tăng dần bỏ qua nếu số bản ghi không đổi),
+        lần chấm đã nhận trực tiếp bị bỏ qua khi lưu bảng tạm.
+        """
+        if not self:
+            return
+        today = fields.Date.context_today(self)
+        self.env['trcf.zkteco.sync.job']._enqueue(self, today - timedelta(days=1), today)
+        self.env.ref('trcf_zkteco_attendance_sync.ir_cron_trcf_zkteco_sync_job')._trigger()
+        self.env.cr.commit()
+
+    def _update_live_record_count(self, batch):
+        """Cập nhật live_record_count theo một lô nhận trực tiếp.
+
+        Nhật ký trên máy chỉ tăng thêm đúng các lần chấm được gửi trực tiếp, nên lúc (kết nối lại)
+        số bản ghi trên máy phải bằng số đã biết cộng số lần chấm nhận được trước đó. Số đã biết
+        lấy theo sync_record_index nếu thiết bị chưa từng nhận trực tiếp.
+
+        :param batch: live_capture.LiveBatch của thiết bị
+        :return: True nếu có lần chấm không nhận được (cần tải bù)
+        """
+        self.ensure_one()
+        expected = self.live_record_count or self.sync_record_index
+        counted = 0  # số lần chấm của lô đã cộng vào expected
+        missed = False
+        for record_count, received_before in batch.connections:
+            expected += received_before - counted
+            counted = received_before
+            if record_count is None:
+                missed = True
+            elif record_count != expected:
+                missed = True
+                expected = record_count
+        self.live_record_count = expected + len(batch.punches) - counted
+        return missed
+
+    @api.model
+    def _flush_live_punches(self, batches):
+        """Lưu và ghép cặp một lô lần chấm nhận trực tiếp, commit sau mỗi thiết bị.
+
+        Thiết bị có lần chấm bị lỡ (hoặc không lưu được lô) được đưa vào hàng đợi đồng bộ bù.
+
+        :param batches: dict device id -> live_capture.LiveBatch
+        """
+        Punch = self.env['trcf.zkteco.punch']
+        backfill = self.browse()
+        for device in self.browse(list(batches)):
+            batch = batches[device.id]
+            if device._update_live_record_count(batch):
+                backfill |= device
+            try:
+                with self.env.cr.savepoint():
+                    if len(batch.punches) and Punch._ingest(device, batch.punches):
+                        device._pair_dirty_punches()
+                    device.last_seen = fields.Datetime.now()
+            except Exception:
+                _logger.exception("Cannot store live punches from %s", device.name)
+                backfill |= device
+            self.env.cr.commit()
+        backfill._enqueue_live_backfill()
+
+    # ===== USER TRÊN MÁY =====
+    def action_refresh_roster(self):
+        """Tải lại bảng user của các thiết bị, kể cả khi số user không đổi"""
+        results = self._refresh_rosters(force=True)
+        failed = [f"❌ {device.name}: {results[device.id][1]}" for device in self if not results[device.id][0]]
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': f'Đã tải bảng user {len(self) - len(failed)}/{len(self)} thiết bị',
+                'message': '\n'.join(failed) or ', '.join(
+                    f'{device.name}: {device.roster_user_count} user' for device in self),
+                'type': 'warning' if failed else 'success',
+            }
+        }
+
+    def action_push_employees(self):
+        """Đẩy nhân viên lên các thiết bị đã chọn trong một lượt.
+
+        Chỉ thêm nhân viên đang làm việc có ZkTeco Device ID mà máy chưa có và xoá
+        user của nhân viên đã lưu trữ; các user khác trên máy được giữ nguyên.
+        """
+        wanted, removable = self._get_roster_targets()
+        jobs = {
+            device.id: (device._get_device_params(), device._get_cached_roster(), wanted, removable)
+            for device in self if device.ip_address
+        }
+        results = device_io.run_parallel(device_io.push_roster, jobs, self._get_sync_workers(), SYNC_MAX_WAIT_SECONDS)
+        lines = []
+        failed = 0
+        for device in self:
+            success, push_result = results.get(device.id, (False, ConnectionError('Chưa có địa chỉ IP')))
+            if not success:
+                _logger.warning("Cannot push employees to %s: %s", device.name, push_result)
+                failed += 1
+                lines.append(f"❌ {device.name}: {push_result}")
+                continue
+            device._store_roster(push_result.roster)
+            lines.append(f"✅ {device.name}: thêm {push_result.added}, xoá {push_result.removed}")
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': f'Đẩy nhân viên lên {len(self) - failed}/{len(self)} thiết bị thành công',
+                'message': '\n'.join(lines),
+                'type': 'warning' if failed else 'success',
+                'sticky': True,
+            }
+        }
+
+    @api.model
+    def _get_roster_targets(self):
+        """Danh sách nhân viên cần có trên máy và ID được phép xoá khỏi máy.
+
+        :return: (dict ID trên máy -> tên của nhân viên đang làm việc,
+            set ID trên máy của nhân viên đã lưu trữ)
+        """
+        employees = self.env['hr.employee'].sudo().with_context(active_test=False).search_read(
+            [('trcf_device_id_num', '!=', False)],
+            ['trcf_device_id_num', 'name', 'active'],
+            order='id',
+        )
+        wanted = {}
+        archived = set()
+        for employee in employees:
+            device_user_id = employee['trcf_device_id_num'].strip()
+            if employee['active']:
+                wanted.setdefault(device_user_id, employee['name'])
+            else:
+                archived.add(device_user_id)
+        return wanted, archived - set(wanted)
+
+    def _refresh_rosters(self, force=False):
+        """Tải song song bảng user của các thiết bị có số user khác bản lưu đệm.
+
+        :return: dict device id -> (True, roster.Roster) hoặc (False, exception)
+        """
+        jobs = {
+            device.id: (device._get_device_params(), None if force else device._get_cached_roster())
+            for device in self if device.ip_address
+        }
+        results = device_io.run_parallel(device_io.fetch_roster, jobs, self._get_sync_workers(), SYNC_MAX_WAIT_SECONDS)
+        for device in self:
+            success, roster = results.setdefault(device.id, (False, ConnectionError('Chưa có địa chỉ IP')))
+            if success:
+                device._store_roster(roster)
+            else:
+                _logger.warning("Cannot read users from %s: %s", device.name, roster)
+        return results
+
+    def _get_cached_roster(self):
+        """Bảng user đã lưu đệm dưới dạng roster.Roster, None nếu chưa tải lần nào"""
+        self.ensure_one()
+        if not self.roster_synced_at:
+            return None
+        users = [
+            device_roster.RosterUser(user['uid'], user['user_id'], user['name'] or '', user['privilege'])
+            for user in self.env['trcf.zkteco.device.user'].search_read(
+                [('device_id', '=', self.id)], ['uid', 'user_id', 'name', 'privilege'])
+        ]
+        return device_roster.Roster(self.roster_user_count, users, self.roster_packet_size or None)
+
+    def _store_roster(self, roster):
+        """Lưu bảng user vừa đọc từ máy; chỉ ghi lại các user thay đổi"""
+        self.ensure_one()
+        vals = {'roster_synced_at': fields.Datetime.now(), 'roster_user_count': roster.user_count}
+        if roster.packet_size:
+            vals['roster_packet_size'] = roster.packet_size
+        if roster.users is not None:
+            checksum = device_roster.checksum(roster.users)
+            if checksum != self.roster_checksum:
+                vals['roster_checksum'] = checksum
+                self._replace_roster_users(roster.users)
+        self.write(vals)
+
+    def _replace_roster_users(self, users):
+        DeviceUser = self.env['trcf.zkteco.device.user'].sudo()
+        existing = {user.uid: user for user in DeviceUser.search([('device_id', '=', self.id)])}
+        to_create = []
+        for user in users:
+            values = {'user_id': user.user_id, 'name': user.name, 'privilege': user.privilege}
+            record = existing.pop(user.uid, None)
+            if record is None:
+                to_create.append(dict(values, device_id=self.id, uid=user.uid))
+            elif (record.user_id, record.name or '', record.privilege) != (user.user_id, user.name, user.privilege):
+                record.write(values)
+        DeviceUser.browse([record.id for record in existing.values()]).unlink()
+        DeviceUser.create(to_create)
+
+    def _get_device_tz(self):
+        """Timezone của thiết bị, dùng để đặt giờ và quy đổi giờ trên máy sang UTC"""
+        return self.tz or 'Asia/Saigon'
+
+    def _write_time_info(self, time_info):
+        """Ghi kết quả đặt giờ thiết bị vào Thông tin thiết bị"""
+        self.write({
+            'device_info': f"Timezone: {time_info['tz']} | "
+                           f"Before: {time_info['before']} | "
+                           f"After: {time_info['after']} | "
+                           f"Difference: {time_info['difference']:.1f}h | "
+                           f"Local time set: {time_info['local_now']}"
+        })
+
+    def _get_time_window(self, epoch_from, epoch_to):
+        """Bảng độ lệch giờ (có tính DST) của thiết bị cho khoảng thời gian, dùng cho cả lô"""
+        return local_time.LocalTimeWindow(self._get_device_tz(), epoch_from, epoch_to)
+
+    def _device_time_to_utc(self, device_time):
+        """Chuyển thời gian trên thiết bị (naive) về UTC để lưu vào Odoo"""
+        epoch = punch_pairing.to_epoch(device_time)
+        return punch_pairing.from_epoch(self._get_time_window(epoch, epoch).to_utc(epoch))
+
+    def _utc_to_device_time(self, utc_time):
+        """Chuyển thời gian UTC trong Odoo về giờ trên thiết bị"""
+        epoch = punch_pairing.to_epoch(utc_time)
+        return punch_pairing.from_epoch(self._get_time_window(epoch, epoch).to_local(epoch))
+
+    @api.model
+    def _get_frozen_days(self, keys):
+        """Các (nhân viên, ngày) không được tính lại từ lần chấm thô.
+
+        Gồm ngày trước mốc lưu trữ và ngày thuộc tháng đã lưu trữ (kể cả đã khôi phục): lần chấm
+        thô của các ngày này đã bị xoá sau khi lưu trữ, ghép cặp lại sẽ xoá mất các phiên không
+        còn lần chấm. Tháng chưa khôi phục cũng không được ghi thêm chấm công.
+
+        :param keys: iterable (employee id, ngày là số ngày kể từ EPOCH)
+        :return: set các key trong keys bị khoá
+        """
+        keys = set(keys)
+        if not keys:
+            return set()
+        Archive = self.env['trcf.attendance.archive']
+        cutoff_day = (Archive._get_archive_cutoff() - punch_pairing.EPOCH.date()).days
+        frozen = {key for key in keys if key[1] < cutoff_day}
+        dates = {key: punch_pairing.from_epoch(key[1] * punch_pairing.SECONDS_PER_DAY).date()
+                 for key in keys - frozen}
+        if not dates:
+            return frozen
+        archived_months = Archive._get_archived_months(
+            {key[0] for key in dates}, min(dates.values()), max(dates.values()), include_restored=True)
+        frozen.update(key for key, day in dates.items() if (key[0], day.replace(day=1)) in archived_months)
+        return frozen
+
+    def _get_local_days(self, attendances):
+        """Ngày (số ngày kể từ EPOCH, giờ trên thiết bị) của giờ vào từng hr.attendance, cùng thứ tự"""
+        epochs = [punch_pairing.to_epoch(attendance.check_in) for attendance in attendances]
+        if not epochs:
+            return []
+        window = self._get_time_window(min(epochs), max(epochs))
+        return [int(local_epoch) // punch_pairing.SECONDS_PER_DAY for local_epoch in window.to_local_many(epochs)]
+
+    def _prepare_attendance_vals(self, punches, profiler=None, device_ids=None):
+        """Ghép cặp checkin/checkout và tạo giá trị hr.attendance (giờ UTC).
+
+        :param punches: punch_pairing.PunchBuffer - lần chấm công theo giờ trên thiết bị
+        :param device_ids: thiết bị của từng lần chấm khi punches là kết quả gộp nhiều thiết bị
+            (punch_pairing.merge_streams, đã sắp xếp); không có thì mọi lần chấm thuộc self
+        :return: (danh sách vals cho hr.attendance, danh sách device user id không tìm thấy nhân viên)
+        """
+        profiler = profiler or SyncProfiler(self.name)
+        with profiler.phase('pair'):
+            pairing = punch_pairing.pair_punches(
+                punches.user_codes, punches.epochs, DUPLICATE_THRESHOLD_MINUTES * 60,
+                presorted=device_ids is not None)
+            profiler.count('duplicates', pairing.count_punches(punch_pairing.PUNCH_DUPLICATE))
+
+            # Chuyển user_id trên máy thành employee_id (một lần cho tất cả user)
+            employee_map, unmatched_user_ids = self._resolve_employees(punches.user_ids)
+            if not len(pairing):
+                return [], unmatched_user_ids
+
+            # Quy đổi giờ trên máy sang UTC cho cả lô, mốc đổi giờ chỉ tính một lần
+            window = self._get_time_window(min(punches.epochs), max(punches.epochs) + punch_pairing.SECONDS_PER_DAY)
+            utc_check_ins = window.to_utc_many(pairing.check_ins)
+            utc_check_outs = window.to_utc_many(pairing.check_outs)
+
+            attendance_vals_list = []
+            for (user_code, _check_in, _check_out, auto_closed), check_in_index, check_in, check_out in zip(
+                    pairing, pairing.check_in_indexes, utc_check_ins, utc_check_outs):
+                employee_id = employee_map.get(punches.user_ids[user_code])
+                if not employee_id:
+                    continue
+                attendance_vals_list.append({
+                    'employee_id': employee_id,
+                    'check_in': punch_pairing.from_epoch(check_in),
+                    'check_out': punch_pairing.from_epoch(check_out),
+                    # Thiết bị của lần chấm vào
+                    'trcf_device_id': int(device_ids[check_in_index]) if device_ids is not None else self.id,
+                    'trcf_generated': True,
+                    'trcf_auto_closed': auto_closed,
+                })
+        return attendance_vals_list, unmatched_user_ids
+
+    def _get_create_batch_size(self):
+        """Số (ID trên máy, ngày) được ghép cặp lại và ghi trong mỗi lô"""
+        batch_size = self.env['ir.config_parameter'].sudo().get_param(
+            'trcf_zkteco_attendance_sync.create_batch_size')
+        return int(batch_size or CREATE_BATCH_SIZE)
+
+    def _replace_attendances(self, vals_list, profiler=None):
+        """Thay hr.attendance do thiết bị tạo của các (nhân viên, ngày) có trong vals_list.
+
+        Bản ghi cũ giống hệt bản ghi mới (cùng giờ vào/ra) được giữ nguyên, bản ghi cũ không còn
+        đúng bị xoá, bản ghi mới chưa có được tạo. Ngày có bản ghi sửa tay hoặc không do đồng bộ
+        tạo, hoặc ngày bị khoá (_get_frozen_days), thì giữ nguyên cả ngày. vals_list đã gồm lần chấm của mọi thiết bị nên bản ghi do
+        đồng bộ tạo từ thiết bị nào cũng được thay.
+
+        Bản ghi chưa sửa tay, không đánh dấu do đồng bộ tạo nhưng giống hệt một phiên mới
+        (vd. chấm công do bản đồng bộ cũ tạo trước khi có trcf_generated) được nhận là do
+        đồng bộ tạo, để ngày đó không bị giữ nguyên mãi.
+
+        :param vals_list: kết quả _prepare_attendance_vals cho trọn các ngày cần tính lại
+        :return: dict created_count, removed_count, skipped_count (không đổi), protected_day_count
+        """
+        result = {'created_count': 0, 'removed_count': 0, 'skipped_count': 0, 'protected_day_count': 0}
+        if not vals_list:
+            return result
+
+        profiler = profiler or SyncProfiler(self.name)
+        Attendance = self.env['hr.attendance'].with_context(trcf_sync=True)
+        seconds_per_day = punch_pairing.SECONDS_PER_DAY
+
+        # Khoá (nhân viên, ngày theo giờ trên máy), ngày được biểu diễn bằng số ngày kể từ EPOCH
+        check_in_epochs = [punch_pairing.to_epoch(vals['check_in']) for vals in vals_list]
+        window = self._get_time_window(min(check_in_epochs), max(check_in_epochs))
+        new_by_key = defaultdict(list)
+        for vals, local_epoch in zip(vals_list, window.to_local_many(check_in_epochs)):
+            new_by_key[vals['employee_id'], int(local_epoch) // seconds_per_day].append(vals)
+
+        with profiler.phase('dedupe'):
+            days = {day for _employee_id, day in new_by_key}
+            existing = Attendance.search_read([
+                ('employee_id', 'in', list({employee_id for employee_id, _day in new_by_key})),
+                ('check_in', '>=', punch_pairing.from_epoch(window.to_utc(min(days) * seconds_per_day))),
+                ('check_in', '<', punch_pairing.from_epoch(window.to_utc((max(days) + 1) * seconds_per_day))),
+            ], ['employee_id', 'check_in', 'check_out', 'trcf_generated', 'trcf_manual_edit'])
+
+            old_by_key = defaultdict(dict)
+            legacy_by_key = defaultdict(dict)
+            protected_keys = set()
+            existing_local_epochs = window.to_local_many(
+                [punch_pairing.to_epoch(attendance['check_in']) for attendance in existing])
+            for attendance, local_epoch in zip(existing, existing_local_epochs):
+                key = (attendance['employee_id'][0], int(local_epoch) // seconds_per_day)
+                if key not in new_by_key:
+                    continue
+                session = (attendance['check_in'], attendance['check_out'])
+                if attendance['trcf_manual_edit']:
+                    protected_keys.add(key)
+                elif attendance['trcf_generated']:
+                    old_by_key[key][session] = attendance['id']
+                else:
+                    legacy_by_key[key][session] = attendance['id']
+
+            for key, legacy_sessions in legacy_by_key.items():
+                new_sessions = {(vals['check_in'], vals['check_out']) for vals in new_by_key[key]}
+                if not new_sessions.issuperset(legacy_sessions):
+                    protected_keys.add(key)
+
+            protected_keys |= self._get_frozen_days(new_by_key)
+
+            obsolete_ids = []
+            new_vals_list = []
+            adopted_ids = defaultdict(list)  # (thiết bị, tự đóng) -> id bản ghi nhận là do đồng bộ tạo
+            for key, key_vals_list in new_by_key.items():
+                if key in protected_keys:
+                    continue
+                old_sessions = old_by_key.get(key, {})
+                legacy_sessions = legacy_by_key.get(key, {})
+                for vals in key_vals_list:
+                    session = (vals['check_in'], vals['check_out'])
+                    if old_sessions.pop(session, None):
+                        result['skipped_count'] += 1
+                    elif session in legacy_sessions:
+                        adopted_ids[vals['trcf_device_id'], vals['trcf_auto_closed']].append(
+                            legacy_sessions.pop(session))
+                        result['skipped_count'] += 1
+                    else:
+                        new_vals_list.append(vals)
+                obsolete_ids += old_sessions.values()
+
+        with profiler.phase('create'):
+            # Xoá trước để phiên mới không bị chồng giờ với phiên cũ
+            Attendance.browse(obsolete_ids).unlink()
+            Attendance.create(new_vals_list)
+            for (device_id, auto_closed), attendance_ids in adopted_ids.items():
+                Attendance.browse(attendance_ids).write({
+                    'trcf_device_id': device_id,
+                    'trcf_generated': True,
+                    'trcf_auto_closed': auto_closed,
+                })
+
+        result.update({
+            'created_count': len(new_vals_list),
+            'removed_count': len(obsolete_ids),
+            'protected_day_count': len(protected_keys),
+        })
+        return result
+
+    @api.model
+    @tools.ormcache()
+    def _get_employee_index(self):
+        """Bảng tra trcf_device_id_num -> employee id, dùng chung cho mọi thiết bị (có cache).
+
+        Cache bị xoá khi trcf_device_id_num hoặc trạng thái active của nhân viên có ID trên máy
+        thực sự thay đổi (xem TrcfHrEmployee). Không được sửa dict trả về.
+        """
+        employees = self.env['hr.employee'].sudo().search_read(
+            [('trcf_device_id_num', '!=', False)],
+            ['trcf_device_id_num'],
+            order='id',
+        )
+        index = {}
+        for employee in employees:
+            # Trùng ID trên máy: giữ nhân viên tạo trước
+            index.setdefault(employee['trcf_device_id_num'].strip(), employee['id'])
+        return index
+
+    def _resolve_employees(self, device_user_ids):
+        """Ánh xạ hàng loạt device user id -> employee id.
+
+        :return: (dict device_user_id -> employee_id, danh sách device_user_id không tìm thấy)
+        """
+        index = self._get_employee_index()
+        employee_map = {}
+        unmatched = []
+        for device_user_id in device_user_ids:
+            employee_id = index.get(str(device_user_id).strip())
+            if employee_id:
+                employee_map[device_user_id] = employee_id
+            else:
+                unmatched.append(str(device_user_id))
+        if unmatched:
+            _logger.debug("%s: no employee for device user ids %s", self.name, ', '.join(unmatched))
+        return employee_map, unmatched
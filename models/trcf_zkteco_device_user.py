@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+
+
+class TrcfZktecoDeviceUser(models.Model):
+    """User trên thiết bị (bản lưu đệm của bảng user trên máy).
+
+    Được làm mới khi số user trên máy thay đổi hoặc sau khi đẩy nhân viên lên máy,
+    để không phải tải bảng user ở mỗi lần đồng bộ.
+    """
+    _name = 'trcf.zkteco.device.user'
+    _description = 'User trên thiết bị ZKTeco'
+    _order = 'device_id, uid'
+    _rec_name = 'user_id'
+
+    device_id = fields.Many2one(
+        'trcf.zkteco.device',
+        string='Thiết bị',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True
+    )
+
+    uid = fields.Integer(string='UID', required=True, readonly=True, help='Số thứ tự user trong bộ nhớ máy')
+    user_id = fields.Char(string='ID trên máy', required=True, readonly=True)
+    name = fields.Char(string='Tên trên máy', readonly=True)
+    privilege = fields.Integer(string='Quyền', readonly=True, help='0: người dùng, 14: quản trị')
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Nhân viên',
+        compute='_compute_employee_id',
+        help='Nhân viên có ZkTeco Device ID trùng với ID trên máy'
+    )
+
+    _sql_constraints = [
+        ('device_uid_uniq', 'unique (device_id, uid)', 'UID đã tồn tại trên thiết bị này.'),
+    ]
+
+    @api.depends('user_id')
+    def _compute_employee_id(self):
+        index = self.env['trcf.zkteco.device']._get_employee_index()
+        for record in self:
+            record.employee_id = index.get((record.user_id or '').strip(), False)
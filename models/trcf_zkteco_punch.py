@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+from itertools import groupby, repeat
+from operator import itemgetter
+
+from odoo import models, fields, api, tools
+
+from ..lib import local_time, punch_pairing
+
+PUNCH_INSERT_BATCH_SIZE = 20000  # Số lần chấm công ghi vào bảng tạm mỗi câu lệnh INSERT
+
+
+class TrcfZktecoPunch(models.Model):
+    """Lần chấm công thô tải về từ thiết bị.
+
+    Mỗi lần chấm chỉ được lưu một lần (duy nhất theo thiết bị, ID trên máy, thời điểm),
+    để có thể ghép cặp lại chấm công mà không cần tải lại dữ liệu từ máy.
+    Lần chấm chưa ghép cặp (is_paired = False) xác định các (ID trên máy, ngày) cần tính lại.
+    """
+    _name = 'trcf.zkteco.punch'
+    _description = 'Lần chấm công thô ZKTeco'
+    _order = 'timestamp desc, id desc'
+    _rec_name = 'device_user_id'
+
+    device_id = fields.Many2one(
+        'trcf.zkteco.device',
+        string='Thiết bị',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    device_user_id = fields.Char(
+        string='ID trên máy',
+        required=True
+    )
+
+    timestamp = fields.Datetime(
+        string='Thời điểm (giờ trên máy)',
+        required=True,
+        help='Thời điểm chấm công theo giờ trên thiết bị (không phải UTC)'
+    )
+
+    is_paired = fields.Boolean(
+        string='Đã ghép cặp',
+        default=False,
+        readonly=True,
+        help='Ngày chấm công của lần chấm này đã được tính vào hr.attendance'
+    )
+
+    _sql_constraints = [
+        ('device_user_timestamp_uniq', 'unique (device_id, device_user_id, timestamp)',
+         'Lần chấm công đã tồn tại trên thiết bị này.'),
+    ]
+
+    def init(self):
+        # Tìm nhanh lần chấm chưa ghép cặp của một thiết bị
+        tools.create_index(
+            self.env.cr, 'trcf_zkteco_punch_unpaired_idx', self._table, ['device_id'],
+            where='is_paired IS NOT TRUE')
+        # Đọc lần chấm của một ID trên máy ở mọi thiết bị
+        tools.create_index(
+            self.env.cr, 'trcf_zkteco_punch_user_timestamp_idx', self._table, ['device_user_id', 'timestamp'])
+
+    @api.model
+    def _ingest(self, device, punches):
+        """Ghi hàng loạt lần chấm công vào bảng tạm, bỏ qua các lần đã có.
+
+        Không đi qua ORM: mỗi lô là một câu INSERT ... ON CONFLICT DO NOTHING,
+        thời điểm được truyền dưới dạng epoch và chuyển sang timestamp trong SQL.
+
+        :param punches: punch_pairing.PunchBuffer
+        :return: số lần chấm công mới được ghi
+        """
+        if not len(punches):
+            return 0
+        self.flush_model()
+        user_ids = punches.user_ids
+        inserted = 0
+        for start in range(0, len(punches), PUNCH_INSERT_BATCH_SIZE):
+            stop = start + PUNCH_INSERT_BATCH_SIZE
+            self.env.cr.execute("""
+                INSERT INTO trcf_zkteco_punch
+                            (device_id, device_user_id, timestamp, is_paired,
+                             create_uid, create_date, write_uid, write_date)
+                     SELECT %(device_id)s, punch.user_id, to_timestamp(punch.epoch) AT TIME ZONE 'UTC', false,
+                            %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+                       FROM unnest(%(user_ids)s::varchar[], %(epochs)s::bigint[]) AS punch(user_id, epoch)
+                ON CONFLICT (device_id, device_user_id, timestamp) DO NOTHING
+            """, {
+                'device_id': device.id,
+                'uid': self.env.uid,
+                'user_ids': [str(user_ids[code]) for code in punches.user_codes[start:stop]],
+                'epochs': list(punches.epochs[start:stop]),
+            })
+            inserted += self.env.cr.rowcount
+        return inserted
+
+    @api.model
+    def _get_dirty_keys(self, devices):
+        """Các (ID trên máy, ngày) có lần chấm chưa ghép cặp trên các thiết bị, theo thứ tự ngày.
+
+        :return: list of (device_user_id, date)
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT DISTINCT timestamp::date, device_user_id
+              FROM trcf_zkteco_punch
+             WHERE device_id = ANY(%s)
+               AND is_paired IS NOT TRUE
+          ORDER BY 1, 2
+        """, [devices.ids])
+        return [(device_user_id, day) for day, device_user_id in self.env.cr.fetchall()]
+
+    @api.model
+    def _load_keys(self, keys, tz_name):
+        """Đọc toàn bộ lần chấm của các (ID trên máy, ngày) trên mọi thiết bị, kể cả lần đã ghép cặp.
+
+        Lần chấm của từng thiết bị được đọc theo thứ tự (ID trên máy, thời điểm), ID so sánh
+        theo COLLATE "C" (thứ tự byte, giống so sánh str của Python mà merge_streams dùng;
+        collation của database như en_US.UTF-8 xếp 'NV-02' sau 'NV01'), quy đổi về
+        giờ của tz_name nếu thiết bị đặt ở timezone khác, rồi gộp thành một dòng bằng
+        punch_pairing.merge_streams.
+
+        :param keys: list of (device_user_id, date)
+        :param tz_name: timezone dùng để ghép cặp (timezone của thiết bị đang đồng bộ)
+        :return: (punch_pairing.PunchBuffer đã sắp theo (user, thời điểm),
+            array device id song song với lần chấm, list id lần chấm đã đọc)
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT punch.id, punch.device_id, punch.device_user_id, EXTRACT(EPOCH FROM punch.timestamp)::bigint
+              FROM unnest(%s::varchar[], %s::date[]) AS dirty(user_id, day)
+              JOIN trcf_zkteco_punch punch
+                ON punch.device_user_id = dirty.user_id
+               AND punch.timestamp >= dirty.day
+               AND punch.timestamp < dirty.day + 1
+          ORDER BY punch.device_id, punch.device_user_id COLLATE "C", punch.timestamp
+        """, [[key[0] for key in keys], [key[1] for key in keys]])
+        rows = self.env.cr.fetchall()
+        devices = self.env['trcf.zkteco.device'].with_context(active_test=False).browse(
+            {row[1] for row in rows})
+        tz_by_device = {device.id: device._get_device_tz() for device in devices}
+
+        streams = []
+        punch_ids = []
+        for device_id, device_rows in groupby(rows, key=itemgetter(1)):
+            device_rows = list(device_rows)
+            punch_ids += [row[0] for row in device_rows]
+            user_ids = [row[2] for row in device_rows]
+            epochs = [row[3] for row in device_rows]
+            if tz_by_device[device_id] != tz_name:
+                epochs = self._convert_timezone(epochs, tz_by_device[device_id], tz_name)
+            streams.append(zip(user_ids, map(int, epochs), repeat(device_id)))
+        punches, device_ids = punch_pairing.merge_streams(streams)
+        return punches, device_ids, punch_ids
+
+    @api.model
+    def _convert_timezone(self, epochs, from_tz, to_tz):
+        """Quy đổi dãy epoch theo giờ local của from_tz sang giờ local của to_tz"""
+        epoch_from, epoch_to = min(epochs), max(epochs)
+        utc_epochs = local_time.LocalTimeWindow(from_tz, epoch_from, epoch_to).to_utc_many(epochs)
+        return local_time.LocalTimeWindow(to_tz, epoch_from, epoch_to).to_local_many(utc_epochs)
+
+    @api.model
+    def _mark_paired(self, punch_ids):
+        """Đánh dấu các lần chấm đã được tính vào hr.attendance"""
+        if not punch_ids:
+            return
+        self.env.cr.execute("""
+            UPDATE trcf_zkteco_punch
+               SET is_paired = true
+             WHERE id = ANY(%s)
+               AND is_paired IS NOT TRUE
+        """, [punch_ids])
+        self.invalidate_model(['is_paired'])
+
+    @api.model
+    def _mark_unpaired(self, device, date_from, date_to):
+        """Đưa các lần chấm của thiết bị trong khoảng ngày về trạng thái cần ghép cặp lại"""
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE trcf_zkteco_punch
+               SET is_paired = false
+             WHERE device_id = %s
+               AND timestamp >= %s
+               AND timestamp < %s::date + 1
+        """, [device.id, date_from, date_to])
+        self.invalidate_model(['is_paired'])
+
+    @api.model
+    def _purge_paired(self, before, limit):
+        """Xoá tối đa limit lần chấm đã ghép cặp trước ngày before (chấm công đã được lưu trữ)
+
+        :return: số lần chấm đã xoá
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            DELETE FROM trcf_zkteco_punch
+             WHERE id IN (
+                    SELECT id
+                      FROM trcf_zkteco_punch
+                     WHERE timestamp < %s
+                       AND is_paired
+                     LIMIT %s
+                   )
+        """, [before, limit])
+        self.invalidate_model()
+        return self.env.cr.rowcount
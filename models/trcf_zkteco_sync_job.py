@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+import logging
+import time as time_module
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+from ..lib import device_io
+from ..lib.sync_profiler import SyncProfiler
+from .trcf_zkteco_device import SYNC_MAX_WAIT_SECONDS
+
+_logger = logging.getLogger(__name__)
+
+JOB_MAX_ATTEMPTS = 5  # Số lần chạy tối đa trước khi chuyển sang Thất bại
+JOB_RETRY_BASE_MINUTES = 5  # Thời gian chờ lần thử lại đầu tiên, nhân đôi sau mỗi lần lỗi
+JOB_STALE_MINUTES = 60  # Job "Đang chạy" không cập nhật quá thời gian này coi như worker đã chết
+JOB_CRON_TIME_LIMIT = 600  # Thời gian tối đa (giây) một lượt cron nhận thêm job mới
+
+
+class TrcfZktecoSyncJob(models.Model):
+    _name = 'trcf.zkteco.sync.job'
+    _description = 'Job đồng bộ chấm công ZKTeco'
+    _order = 'id desc'
+
+    device_id = fields.Many2one(
+        'trcf.zkteco.device',
+        string='Thiết bị',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    date_from = fields.Date(
+        string='Từ ngày',
+        help='Để trống khi thiết bị đồng bộ theo chế độ tăng dần'
+    )
+
+    date_to = fields.Date(
+        string='Đến ngày'
+    )
+
+    state = fields.Selection(
+        [('pending', 'Chờ chạy'), ('running', 'Đang chạy'), ('done', 'Hoàn thành'), ('failed', 'Thất bại')],
+        string='Trạng thái',
+        default='pending',
+        required=True,
+        index=True
+    )
+
+    attempt_count = fields.Integer(
+        string='Số lần đã chạy',
+        readonly=True
+    )
+
+    next_attempt_date = fields.Datetime(
+        string='Chạy lúc',
+        default=fields.Datetime.now,
+        help='Job chỉ được chạy từ thời điểm này (dùng cho thử lại có giãn cách)'
+    )
+
+    progress_count = fields.Integer(
+        string='Số chấm công đã lưu',
+        readonly=True,
+        help='Số bản ghi hr.attendance đã tạo và commit ở lần chạy gần nhất'
+    )
+
+    date_started = fields.Datetime(string='Bắt đầu', readonly=True)
+    date_finished = fields.Datetime(string='Kết thúc', readonly=True)
+
+    result_message = fields.Text(string='Kết quả', readonly=True)
+    last_error = fields.Text(string='Lỗi gần nhất', readonly=True)
+
+    sync_run_ids = fields.One2many(
+        'trcf.zkteco.sync.run',
+        'job_id',
+        string='Nhật ký đồng bộ'
+    )
+
+    @api.model
+    def _enqueue(self, devices, date_from=False, date_to=False):
+        """Đưa các thiết bị vào hàng đợi, dùng lại job đang chờ nếu trùng khoảng ngày"""
+        jobs = self.browse()
+        for device in devices:
+            window_from = False if device.sync_mode == 'incremental' else date_from
+            window_to = False if device.sync_mode == 'incremental' else date_to
+            job = self.search([
+                ('device_id', '=', device.id),
+                ('state', '=', 'pending'),
+                ('date_from', '=', window_from),
+                ('date_to', '=', window_to),
+            ], limit=1)
+            jobs |= job or self.create({
+                'device_id': device.id,
+                'date_from': window_from,
+                'date_to': window_to,
+            })
+        return jobs
+
+    def action_retry(self):
+        """Chạy lại job thất bại"""
+        self.write({
+            'state': 'pending',
+            'attempt_count': 0,
+            'next_attempt_date': fields.Datetime.now(),
+        })
+        self.env.ref('trcf_zkteco_attendance_sync.ir_cron_trcf_zkteco_sync_job')._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Chạy các job đến hạn theo từng lô, mỗi thiết bị tối đa một job cùng lúc"""
+        self._requeue_stale_jobs()
+        started = time_module.monotonic()
+        while time_module.monotonic() - started < JOB_CRON_TIME_LIMIT:
+            jobs = self._acquire_jobs(self.env['trcf.zkteco.device']._get_sync_workers())
+            if not jobs:
+                break
+            jobs._run()
+
+    @api.model
+    def _requeue_stale_jobs(self):
+        """Đưa job của worker đã chết về hàng đợi để chạy tiếp"""
+        stale_jobs = self.search([
+            ('state', '=', 'running'),
+            ('write_date', '<', fields.Datetime.now() - timedelta(minutes=JOB_STALE_MINUTES)),
+        ])
+        stale_jobs.write({'state': 'pending', 'next_attempt_date': fields.Datetime.now()})
+        self.env.cr.commit()
+
+    @api.model
+    def _acquire_jobs(self, limit):
+        """Khoá và đánh dấu Đang chạy các job đến hạn (bỏ qua job đang bị worker khác khoá)"""
+        self.env.cr.execute("""
+            SELECT id, device_id
+              FROM trcf_zkteco_sync_job
+             WHERE state = 'pending'
+               AND (next_attempt_date IS NULL OR next_attempt_date <= (now() AT TIME ZONE 'UTC'))
+               AND device_id NOT IN (SELECT device_id FROM trcf_zkteco_sync_job WHERE state = 'running')
+          ORDER BY id
+             LIMIT %s
+        FOR UPDATE SKIP LOCKED
+        """, [limit * 4])
+        job_ids = {}
+        for job_id, device_id in self.env.cr.fetchall():
+            job_ids.setdefault(device_id, job_id)
+        jobs = self.browse(list(job_ids.values())[:limit])
+        if jobs:
+            jobs.write({
+                'state': 'running',
+                'date_started': fields.Datetime.now(),
+                'date_finished': False,
+                'progress_count': 0,
+            })
+        self.env.cr.commit()
+        return jobs
+
+    def _run(self):
+        """Tải dữ liệu song song cho các job, lưu lần chấm của từng job rồi ghép cặp, commit theo từng lô"""
+        Device = self.env['trcf.zkteco.device']
+        profilers = {job.id: SyncProfiler(job.device_id.name) for job in self}
+        fetched = device_io.run_parallel(
+            device_io.fetch_attendance,
+            {
+                job.id: job.device_id.with_context(
+                    sync_from=job.date_from, sync_to=job.date_to)._get_fetch_args()
+                + (profilers[job.id], job.device_id._get_cached_roster())
+                for job in self
+            },
+            Device._get_sync_workers(),
+            SYNC_MAX_WAIT_SECONDS,
+        )
+        results = {}
+        for job in self:
+            success, fetch_result = fetched[job.id]
+            if not success:
+                job._fail(profilers[job.id], fetch_result)
+                continue
+            try:
+                device = job.device_id.with_context(sync_from=job.date_from, sync_to=job.date_to)
+                results[job.id] = device._process_fetch_result(fetch_result, profiler=profilers[job.id])
+                self.env.cr.commit()
+            except Exception as e:
+                job._fail(profilers[job.id], e)
+
+        # Ghép cặp sau khi đã lưu lần chấm của mọi thiết bị trong lượt
+        for job in self.filtered(lambda job: job.id in results):
+            try:
+                device = job.device_id.with_context(sync_from=job.date_from, sync_to=job.date_to)
+                result = device._pair_fetched_punches(
+                    results[job.id], chunk_callback=job._commit_progress, profiler=profilers[job.id])
+                device._create_sync_run(profilers[job.id], result, job)
+                device._clear_device_logs({device.id: result})
+                job.write({
+                    'state': 'done',
+                    'date_finished': fields.Datetime.now(),
+                    'result_message': Device._format_sync_result(result),
+                    'last_error': False,
+                })
+                self.env.cr.commit()
+            except Exception as e:
+                job._fail(profilers[job.id], e)
+
+    def _fail(self, profiler, error):
+        """Huỷ phần chưa commit, lưu nhật ký đồng bộ lỗi và hẹn chạy lại"""
+        if isinstance(error, Exception):
+            _logger.warning("Sync job %s failed: %s", self.id, error, exc_info=error)
+        # Giữ lại các lô đã commit, lần chạy sau tiếp tục từ lần chấm chưa ghép cặp
+        self.env.cr.rollback()
+        self.device_id._create_sync_run(profiler, {'error': str(error)}, self)
+        self._mark_failed(error)
+
+    def _commit_progress(self, created_count):
+        self.progress_count = created_count
+        self.env.cr.commit()
+
+    def _mark_failed(self, error):
+        """Ghi nhận lỗi và hẹn thử lại với thời gian chờ tăng dần"""
+        attempt_count = self.attempt_count + 1
+        vals = {
+            'attempt_count': attempt_count,
+            'last_error': str(error),
+            'date_finished': fields.Datetime.now(),
+        }
+        if attempt_count >= JOB_MAX_ATTEMPTS:
+            vals['state'] = 'failed'
+        else:
+            vals.update({
+                'state': 'pending',
+                'next_attempt_date': fields.Datetime.now() + timedelta(
+                    minutes=JOB_RETRY_BASE_MINUTES * 2 ** (attempt_count - 1)),
+            })
+        self.write(vals)
+        self.env.cr.commit()
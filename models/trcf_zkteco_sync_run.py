@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+from ..lib.sync_profiler import SYNC_PHASES
+
+SYNC_RUN_KEEP_DAYS = 90  # Nhật ký đồng bộ cũ hơn số ngày này được tự động xoá
+
+
+class TrcfZktecoSyncRun(models.Model):
+    _name = 'trcf.zkteco.sync.run'
+    _description = 'Nhật ký đồng bộ chấm công ZKTeco'
+    _order = 'id desc'
+
+    device_id = fields.Many2one(
+        'trcf.zkteco.device',
+        string='Thiết bị',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    job_id = fields.Many2one(
+        'trcf.zkteco.sync.job',
+        string='Job',
+        ondelete='set null'
+    )
+
+    state = fields.Selection(
+        [('done', 'Hoàn thành'), ('no_new_data', 'Không có dữ liệu mới'), ('failed', 'Thất bại')],
+        string='Trạng thái',
+        required=True
+    )
+
+    error_message = fields.Text(string='Lỗi')
+
+    # ===== THỜI GIAN TỪNG GIAI ĐOẠN (GIÂY) =====
+    time_total = fields.Float(string='Tổng thời gian (s)', digits=(16, 3))
+    time_connect = fields.Float(string='Kết nối (s)', digits=(16, 3))
+    time_set_time = fields.Float(string='Đặt giờ (s)', digits=(16, 3))
+    time_get_users = fields.Float(string='Tải user (s)', digits=(16, 3))
+    time_get_attendance = fields.Float(string='Tải chấm công (s)', digits=(16, 3))
+    time_decode = fields.Float(string='Giải mã (s)', digits=(16, 3))
+    time_stage = fields.Float(string='Lưu bảng tạm (s)', digits=(16, 3))
+    time_pair = fields.Float(string='Ghép cặp (s)', digits=(16, 3))
+    time_dedupe = fields.Float(string='Lọc trùng (s)', digits=(16, 3))
+    time_create = fields.Float(string='Ghi dữ liệu (s)', digits=(16, 3))
+
+    # ===== SỐ LIỆU =====
+    bytes_fetched = fields.Integer(string='Số byte đã tải')
+    records_fetched = fields.Integer(string='Số bản ghi trên máy')
+    staged_count = fields.Integer(
+        string='Lần chấm mới vào bảng tạm',
+        help='Số lần chấm công chưa có trong bảng lần chấm công thô'
+    )
+    punch_count = fields.Integer(
+        string='Lần chấm công',
+        help='Số lần chấm công trong khoảng đồng bộ sau khi giải mã'
+    )
+    duplicate_count = fields.Integer(
+        string='Lần chấm trùng',
+        help='Lần chấm công bị bỏ qua vì cách lần trước trong vòng vài phút'
+    )
+    dirty_day_count = fields.Integer(
+        string='Ngày cần tính lại',
+        help='Số (nhân viên, ngày) có lần chấm công mới được ghép cặp lại'
+    )
+    created_count = fields.Integer(string='Chấm công tạo mới')
+    removed_count = fields.Integer(string='Chấm công đã xoá')
+    skipped_count = fields.Integer(string='Chấm công không đổi')
+    protected_day_count = fields.Integer(
+        string='Ngày giữ nguyên',
+        help='Ngày có chấm công sửa tay hoặc không do đồng bộ tạo nên không được tính lại'
+    )
+    unmatched_count = fields.Integer(string='User không khớp nhân viên')
+    unmatched_user_ids = fields.Text(string='Device user ID không khớp')
+
+    @api.model
+    def _prepare_run_vals(self, device, profiler, result, job=False):
+        """Giá trị nhật ký từ SyncProfiler và kết quả _process_fetch_result của một thiết bị"""
+        if result.get('error'):
+            state = 'failed'
+        elif result.get('no_new_data'):
+            state = 'no_new_data'
+        else:
+            state = 'done'
+        unmatched = result.get('unmatched_user_ids') or []
+        vals = {
+            'device_id': device.id,
+            'job_id': job.id if job else False,
+            'state': state,
+            'error_message': result.get('error') or False,
+            'time_total': profiler.total,
+            'bytes_fetched': profiler.counters.get('bytes_fetched', 0),
+            'records_fetched': profiler.counters.get('records_fetched', 0),
+            'staged_count': profiler.counters.get('staged', 0),
+            'punch_count': result.get('punch_count', 0),
+            'duplicate_count': result.get('duplicate_count', 0),
+            'dirty_day_count': result.get('dirty_day_count', 0),
+            'created_count': result.get('created_count', 0),
+            'removed_count': result.get('removed_count', 0),
+            'skipped_count': result.get('skipped_count', 0),
+            'protected_day_count': result.get('protected_day_count', 0),
+            'unmatched_count': len(unmatched),
+            'unmatched_user_ids': ', '.join(unmatched) or False,
+        }
+        for phase in SYNC_PHASES:
+            vals[f'time_{phase}'] = profiler.phases.get(phase, 0.0)
+        return vals
+
+    @api.autovacuum
+    def _gc_old_runs(self):
+        """Xoá nhật ký đồng bộ cũ"""
+        self.search([
+            ('create_date', '<', fields.Datetime.now() - timedelta(days=SYNC_RUN_KEEP_DAYS)),
+        ]).unlink()
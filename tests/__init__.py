@@ -0,0 +1,6 @@
+import importlib.util
+
+# Odoo chỉ chạy các kiểm thử được import ở đây (cần cơ sở dữ liệu).
+# Các kiểm thử còn lại không cần Odoo, chạy bằng python -m unittest discover tests.
+if importlib.util.find_spec('odoo'):
+    from . import test_attendance_sync
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử nén/giải nén chấm công lưu trữ (lib/attendance_archive.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+"""
+import random
+import unittest
+import zlib
+
+try:
+    from ..lib import attendance_archive
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import attendance_archive
+
+ArchivedAttendance = attendance_archive.ArchivedAttendance
+
+
+class TestAttendanceArchive(unittest.TestCase):
+
+    def test_round_trip(self):
+        rows = [
+            ArchivedAttendance(1709539200, 1709571600, 9.0, 225000.0, 3, attendance_archive.FLAG_GENERATED),
+            ArchivedAttendance(1709625600, attendance_archive.NO_CHECK_OUT, 0.0, 0.0, 0, 0),
+            ArchivedAttendance(
+                1709712000, 1709755199, 11.999722, 299993.06, 3,
+                attendance_archive.FLAG_GENERATED | attendance_archive.FLAG_AUTO_CLOSED),
+            ArchivedAttendance(1709798400, 1709830800, 9.0, 225000.0, 0, attendance_archive.FLAG_MANUAL_EDIT),
+        ]
+        self.assertEqual(attendance_archive.unpack(attendance_archive.pack(rows)), rows)
+
+    def test_round_trip_empty(self):
+        self.assertEqual(attendance_archive.unpack(attendance_archive.pack([])), [])
+
+    def test_round_trip_month(self):
+        rng = random.Random(2024)
+        start = 1709251200  # 2024-03-01 00:00 UTC
+        rows = []
+        for day in range(31):
+            check_in = start + day * 86400 + rng.randrange(6 * 3600, 9 * 3600)
+            check_out = check_in + rng.randrange(4 * 3600, 10 * 3600)
+            hours = (check_out - check_in) / 3600
+            rows.append(ArchivedAttendance(check_in, check_out, hours, hours * 25000, 1, 1))
+        blob = attendance_archive.pack(rows)
+        self.assertEqual(attendance_archive.unpack(blob), rows)
+
+    def test_rejects_unknown_version(self):
+        blob = attendance_archive.pack([])
+        data = bytearray(zlib.decompress(blob))
+        data[0] = attendance_archive.ARCHIVE_FORMAT_VERSION + 1
+        with self.assertRaises(ValueError):
+            attendance_archive.unpack(zlib.compress(bytes(data)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử giải mã nhật ký chấm công thô (lib/attendance_decoder.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+"""
+import unittest
+from datetime import date, datetime
+from struct import pack
+
+try:
+    from ..lib import attendance_decoder, punch_pairing
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import attendance_decoder, punch_pairing
+
+RECORD_STRUCTS = attendance_decoder.RECORD_STRUCTS
+
+
+def packed_time(moment):
+    """Thời điểm nén theo định dạng ZKTeco"""
+    return ((((((moment.year - 2000) * 12 + moment.month - 1) * 31 + moment.day - 1) * 24
+              + moment.hour) * 60 + moment.minute) * 60 + moment.second)
+
+
+def encode(record_size, punches):
+    """punches: list (uid, user_id, datetime hoặc giá trị đã nén) -> bản ghi (không có 4 byte đầu)"""
+    records = []
+    for uid, user_id, moment in punches:
+        packed = moment if isinstance(moment, int) else packed_time(moment)
+        if record_size == 8:
+            records.append(RECORD_STRUCTS[8].pack(uid, 1, packed, 0))
+        elif record_size == 16:
+            records.append(RECORD_STRUCTS[16].pack(int(user_id), packed, 1, 0, b'\x00\x00', 0))
+        else:
+            records.append(RECORD_STRUCTS[40].pack(uid, user_id.encode(), 1, packed, 0, b'\x00' * 8))
+    return b''.join(records)
+
+
+def with_size(records):
+    return pack('<I', len(records)) + records
+
+
+def decoded(punches):
+    return [(punches.user_ids[code], punch_pairing.from_epoch(epoch))
+            for code, epoch in zip(punches.user_codes, punches.epochs)]
+
+
+PUNCHES = [
+    (1, '7', datetime(2024, 3, 4, 8, 0, 5)),
+    (2, '12', datetime(2024, 3, 4, 8, 1, 0)),
+    (1, '7', datetime(2024, 3, 5, 17, 30, 59)),
+]
+EXPECTED = [(user_id, moment) for _uid, user_id, moment in PUNCHES]
+
+
+class TestRecordSize(unittest.TestCase):
+
+    def test_detects_each_size(self):
+        for record_size in (8, 16, 40):
+            data = with_size(encode(record_size, PUNCHES))
+            self.assertEqual(attendance_decoder.record_size_of(data, len(PUNCHES)), record_size)
+
+    def test_empty_buffer(self):
+        self.assertEqual(attendance_decoder.record_size_of(b'', 3), 0)
+        self.assertEqual(attendance_decoder.record_size_of(with_size(encode(16, PUNCHES)), 0), 0)
+
+
+class TestDecodeAttendance(unittest.TestCase):
+
+    def decode(self, record_size, punches=PUNCHES, **kwargs):
+        buffer = punch_pairing.PunchBuffer()
+        data = with_size(encode(record_size, punches))
+        added = attendance_decoder.decode_attendance(data, len(punches), buffer, **kwargs)
+        self.assertEqual(added, len(buffer))
+        return decoded(buffer)
+
+    def test_record_16(self):
+        self.assertEqual(self.decode(16), EXPECTED)
+
+    def test_record_40(self):
+        self.assertEqual(self.decode(40), EXPECTED)
+
+    def test_record_40_user_id_padding(self):
+        self.assertEqual(self.decode(40, [(3, 'NV-0012', datetime(2024, 3, 4, 8, 0))]),
+                         [('NV-0012', datetime(2024, 3, 4, 8, 0))])
+
+    def test_record_8_maps_uid_to_user_id(self):
+        self.assertEqual(self.decode(8, users_by_uid={1: '7', 2: '12'}), EXPECTED)
+        # Không có bảng user: dùng uid
+        self.assertEqual([user_id for user_id, _moment in self.decode(8)], ['1', '2', '1'])
+
+    def test_date_filter(self):
+        self.assertEqual(self.decode(16, date_from=date(2024, 3, 5)), EXPECTED[2:])
+        self.assertEqual(self.decode(16, date_to=date(2024, 3, 4)), EXPECTED[:2])
+        self.assertEqual(self.decode(16, date_from=date(2024, 3, 6)), [])
+
+    def test_invalid_date_is_skipped(self):
+        # Ngày 30/2 không tồn tại
+        invalid = ((24 * 12 + 1) * 31 + 29) * punch_pairing.SECONDS_PER_DAY + 8 * 3600
+        self.assertEqual(self.decode(16, PUNCHES + [(1, '7', invalid)]), EXPECTED)
+
+    def test_partial_trailing_record_is_ignored(self):
+        buffer = punch_pairing.PunchBuffer()
+        records = encode(16, PUNCHES)
+        attendance_decoder.decode_records(records + records[:5], 16, buffer)
+        self.assertEqual(decoded(buffer), EXPECTED)
+
+    def test_packed_day_to_epoch(self):
+        packed_day = packed_time(datetime(2024, 3, 4)) // punch_pairing.SECONDS_PER_DAY
+        self.assertEqual(attendance_decoder.packed_day_to_epoch(packed_day),
+                         punch_pairing.to_epoch(datetime(2024, 3, 4)))
+        self.assertIsNone(attendance_decoder.packed_day_to_epoch(packed_day, date_from=date(2024, 3, 5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử cần Odoo: thay chấm công do đồng bộ tạo, bảng tổng hợp lương, lịch sử lương.
+
+Chạy bằng Odoo::
+
+    odoo-bin -d <db> -i trcf_zkteco_attendance_sync --test-tags /trcf_zkteco_attendance_sync
+
+Ngoài Odoo (python -m unittest discover tests) các kiểm thử này được bỏ qua.
+"""
+import unittest
+from datetime import date, datetime
+
+try:
+    from odoo.tests import TransactionCase, tagged
+except ImportError:
+    raise unittest.SkipTest('Cần Odoo để chạy các kiểm thử này')
+
+from ..lib import live_capture
+
+
+@tagged('post_install', '-at_install')
+class TestAttendanceSync(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Chấm công thử năm 2024 không bị coi là trước mốc lưu trữ
+        cls.env['ir.config_parameter'].sudo().set_param('trcf_zkteco_attendance_sync.archive_months', 1200)
+        cls.device = cls.env['trcf.zkteco.device'].create({
+            'name': 'Cổng chính',
+            'ip_address': '192.0.2.10',
+            'tz': 'Asia/Ho_Chi_Minh',
+        })
+        cls.employee = cls.env['hr.employee'].create({
+            'name': 'Nhân viên thử',
+            'trcf_device_id_num': '7',
+            'trcf_hourly_salary': 25000.0,
+            'tz': 'Asia/Ho_Chi_Minh',
+        })
+
+    def _session(self, check_in, check_out, auto_closed=False):
+        """vals như _prepare_attendance_vals (giờ UTC)"""
+        return {
+            'employee_id': self.employee.id,
+            'check_in': check_in,
+            'check_out': check_out,
+            'trcf_device_id': self.device.id,
+            'trcf_generated': True,
+            'trcf_auto_closed': auto_closed,
+        }
+
+    def _attendances(self):
+        return self.env['hr.attendance'].search([('employee_id', '=', self.employee.id)], order='check_in')
+
+    # ===== _replace_attendances =====
+    def test_replace_creates_and_keeps_identical_sessions(self):
+        vals_list = [self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0))]
+        result = self.device._replace_attendances(vals_list)
+        self.assertEqual(result['created_count'], 1)
+        attendance = self._attendances()
+        self.assertTrue(attendance.trcf_generated)
+
+        result = self.device._replace_attendances(vals_list)
+        self.assertEqual((result['created_count'], result['skipped_count']), (0, 1))
+        self.assertEqual(self._attendances(), attendance)
+
+    def test_replace_updates_the_whole_day(self):
+        self.device._replace_attendances([
+            self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 16, 59, 59), auto_closed=True),
+        ])
+        # Lần chấm ra đến muộn: phiên tự đóng được thay bằng phiên đủ giờ vào/ra
+        result = self.device._replace_attendances([
+            self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0)),
+        ])
+        self.assertEqual((result['created_count'], result['removed_count']), (1, 1))
+        attendance = self._attendances()
+        self.assertEqual(attendance.check_out, datetime(2024, 3, 4, 4, 0))
+        self.assertFalse(attendance.trcf_auto_closed)
+
+    def test_replace_keeps_manually_edited_days(self):
+        self.device._replace_attendances([self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0))])
+        attendance = self._attendances()
+        attendance.check_out = datetime(2024, 3, 4, 5, 0)
+        self.assertTrue(attendance.trcf_manual_edit)
+
+        result = self.device._replace_attendances([
+            self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0)),
+        ])
+        self.assertEqual(result['protected_day_count'], 1)
+        self.assertEqual(self._attendances(), attendance)
+        self.assertEqual(attendance.check_out, datetime(2024, 3, 4, 5, 0))
+
+    def test_replace_adopts_identical_legacy_sessions(self):
+        # Bản ghi của bản đồng bộ cũ (chưa có trcf_generated) giống hệt phiên mới
+        legacy = self.env['hr.attendance'].create({
+            'employee_id': self.employee.id,
+            'check_in': datetime(2024, 3, 4, 1, 0),
+            'check_out': datetime(2024, 3, 4, 4, 0),
+        })
+        result = self.device._replace_attendances([
+            self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0)),
+        ])
+        self.assertEqual((result['created_count'], result['skipped_count']), (0, 1))
+        self.assertEqual(self._attendances(), legacy)
+        self.assertTrue(legacy.trcf_generated)
+        self.assertEqual(legacy.trcf_device_id, self.device)
+
+    def test_replace_keeps_days_before_archive_cutoff(self):
+        self.device._replace_attendances([self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0))])
+        attendance = self._attendances()
+        # Lần chấm thô trước mốc lưu trữ đã bị xoá: không tính lại ngày đó
+        self.env['ir.config_parameter'].sudo().set_param('trcf_zkteco_attendance_sync.archive_months', 1)
+        result = self.device._replace_attendances([
+            self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 16, 59, 59), auto_closed=True),
+        ])
+        self.assertEqual((result['created_count'], result['protected_day_count']), (0, 1))
+        self.assertEqual(self._attendances(), attendance)
+
+    def test_replace_keeps_restored_months(self):
+        self.device._replace_attendances([self._session(datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 4, 0))])
+        Archive = self.env['trcf.attendance.archive']
+        Archive._archive_months([(self.employee.id, date(2024, 3, 1))])
+        archive = Archive.search([('employee_id', '=', self.employee.id)])
+        archive.action_restore()
+        attendance = self._attendances()
+        self.assertTrue(attendance.trcf_generated)
+
+        result = self.device._replace_attendances([
+            self._session(datetime(2024, 3, 4, 2, 0), datetime(2024, 3, 4, 5, 0)),
+        ])
+        self.assertEqual(result['protected_day_count'], 1)
+        self.assertEqual(self._attendances(), attendance)
+
+    # ===== Hàng đợi đồng bộ =====
+    def test_enqueue_sync_multiple_devices(self):
+        incremental = self.env['trcf.zkteco.device'].create({
+            'name': 'Cửa kho',
+            'ip_address': '192.0.2.11',
+            'sync_mode': 'incremental',
+        })
+        devices = self.device | incremental
+        action = devices.action_enqueue_sync()
+        jobs = self.env['trcf.zkteco.sync.job'].search([('device_id', 'in', devices.ids)])
+        self.assertEqual(jobs.device_id, devices)
+        self.assertFalse(jobs.filtered(lambda job: job.device_id == incremental).date_from)
+        self.assertIn('Cửa kho', action['params']['message'])
+
+        # Bấm lại dùng lại job đang chờ
+        devices.action_enqueue_sync()
+        self.assertEqual(self.env['trcf.zkteco.sync.job'].search_count([('device_id', 'in', devices.ids)]), 2)
+
+    # ===== Nhận chấm công trực tiếp =====
+    def _live_batch(self, connections, punch_count):
+        batch = live_capture.LiveBatch()
+        batch.connections = connections
+        for index in range(punch_count):
+            batch.punches.append_epoch('7', 1709539200 + index)
+        return batch
+
+    def test_live_backfill_only_after_missed_punches(self):
+        self.device.sync_record_index = 100
+        # Kết nối đầu tiên: máy có đúng số bản ghi đã đồng bộ
+        self.assertFalse(self.device._update_live_record_count(self._live_batch([(100, 0)], 2)))
+        self.assertEqual(self.device.live_record_count, 102)
+        # Lượt nhận kế tiếp: máy có thêm đúng 2 lần chấm đã nhận trực tiếp
+        self.assertFalse(self.device._update_live_record_count(self._live_batch([(102, 0)], 0)))
+        # Kết nối lại trong cùng lô sau 1 lần chấm, trong lúc mất kết nối có 2 lần chấm bị lỡ
+        self.assertTrue(self.device._update_live_record_count(self._live_batch([(105, 1)], 1)))
+        self.assertEqual(self.device.live_record_count, 105)
+        # Không đọc được số bản ghi: luôn tải bù
+        self.assertTrue(self.device._update_live_record_count(self._live_batch([(None, 0)], 0)))
+
+    # ===== Bảng tổng hợp lương =====
+    def test_payroll_summary_refresh(self):
+        Summary = self.env['trcf.attendance.payroll.summary']
+        attendance = self.env['hr.attendance'].create({
+            'employee_id': self.employee.id,
+            'check_in': datetime(2024, 3, 4, 1, 0),
+            'check_out': datetime(2024, 3, 4, 4, 0),
+        })
+        # Bình thường chạy trước khi commit
+        Summary._refresh_pending()
+        day = Summary.search([('employee_id', '=', self.employee.id), ('period', '=', 'day')])
+        month = Summary.search([('employee_id', '=', self.employee.id), ('period', '=', 'month')])
+        self.assertEqual(day.date, date(2024, 3, 4))
+        self.assertEqual(month.date, date(2024, 3, 1))
+        self.assertEqual(day.session_count, 1)
+        self.assertAlmostEqual(day.worked_hours, attendance.worked_hours)
+        self.assertAlmostEqual(month.salary, attendance.trcf_hourly_salary_sum)
+
+        attendance.unlink()
+        Summary._refresh_pending()
+        self.assertFalse(Summary.search([('employee_id', '=', self.employee.id)]))
+
+    def test_payroll_summary_uses_employee_timezone(self):
+        Summary = self.env['trcf.attendance.payroll.summary']
+        # 18:00 UTC ngày 4 là 01:00 ngày 5 giờ Việt Nam
+        self.env['hr.attendance'].create({
+            'employee_id': self.employee.id,
+            'check_in': datetime(2024, 3, 4, 18, 0),
+            'check_out': datetime(2024, 3, 4, 20, 0),
+        })
+        Summary._refresh_pending()
+        day = Summary.search([('employee_id', '=', self.employee.id), ('period', '=', 'day')])
+        self.assertEqual(day.date, date(2024, 3, 5))
+
+    def test_payroll_summary_follows_timezone_change(self):
+        Summary = self.env['trcf.attendance.payroll.summary']
+        self.env['hr.attendance'].create({
+            'employee_id': self.employee.id,
+            'check_in': datetime(2024, 3, 4, 18, 0),
+            'check_out': datetime(2024, 3, 4, 20, 0),
+        })
+        Summary._refresh_pending()
+        self.employee.tz = 'UTC'
+        Summary._refresh_pending()
+        day = Summary.search([('employee_id', '=', self.employee.id), ('period', '=', 'day')])
+        self.assertEqual(day.date, date(2024, 3, 4))
+
+    # ===== Lịch sử lương =====
+    def test_rate_at(self):
+        Rate = self.env['trcf.hr.employee.rate']
+        self.employee.with_context(trcf_rate_valid_from=date(2024, 3, 10)).trcf_hourly_salary = 30000.0
+        index = Rate._get_rate_index(self.employee)
+        # Mức cũ được lưu làm mức áp dụng từ đầu; mức mới từ 00:00 ngày 10 giờ Việt Nam (17:00 UTC ngày 9)
+        self.assertEqual(Rate._rate_at(index, self.employee, datetime(2024, 3, 4, 1, 0)), 25000.0)
+        self.assertEqual(Rate._rate_at(index, self.employee, datetime(2024, 3, 9, 16, 59)), 25000.0)
+        self.assertEqual(Rate._rate_at(index, self.employee, datetime(2024, 3, 9, 17, 0)), 30000.0)
+
+    def test_rate_at_without_history(self):
+        Rate = self.env['trcf.hr.employee.rate']
+        index = Rate._get_rate_index(self.employee)
+        self.assertEqual(Rate._rate_at(index, self.employee, datetime(2024, 3, 4, 1, 0)), 25000.0)
+
+    def test_rate_change_recomputes_salary_from_valid_date(self):
+        before = self.env['hr.attendance'].create({
+            'employee_id': self.employee.id,
+            'check_in': datetime(2024, 3, 4, 1, 0),
+            'check_out': datetime(2024, 3, 4, 4, 0),
+        })
+        after = self.env['hr.attendance'].create({
+            'employee_id': self.employee.id,
+            'check_in': datetime(2024, 3, 11, 1, 0),
+            'check_out': datetime(2024, 3, 11, 4, 0),
+        })
+        self.employee.with_context(trcf_rate_valid_from=date(2024, 3, 10)).trcf_hourly_salary = 30000.0
+        self.assertAlmostEqual(before.trcf_hourly_salary_sum, before.worked_hours * 25000.0)
+        self.assertAlmostEqual(after.trcf_hourly_salary_sum, after.worked_hours * 30000.0)
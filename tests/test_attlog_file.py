@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử đọc file chấm công xuất từ máy (lib/attlog_file.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+"""
+import io
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from struct import pack
+
+try:
+    from ..lib import attendance_decoder, attlog_file, punch_pairing
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import attendance_decoder, attlog_file, punch_pairing
+
+RECORD_STRUCTS = attendance_decoder.RECORD_STRUCTS
+
+PUNCHES = [
+    (1, '7', datetime(2024, 3, 4, 8, 0, 5)),
+    (2, '12', datetime(2024, 3, 4, 8, 1, 0)),
+    (1, '7', datetime(2024, 3, 5, 17, 30, 59)),
+    (3, '15', datetime(2024, 3, 6, 7, 59, 0)),
+    (2, '12', datetime(2024, 3, 6, 17, 0, 0)),
+]
+EXPECTED = [(user_id, moment) for _uid, user_id, moment in PUNCHES]
+
+
+def packed_time(moment):
+    return ((((((moment.year - 2000) * 12 + moment.month - 1) * 31 + moment.day - 1) * 24
+              + moment.hour) * 60 + moment.minute) * 60 + moment.second)
+
+
+def encode(record_size, punches=PUNCHES):
+    records = []
+    for uid, user_id, moment in punches:
+        if record_size == 8:
+            records.append(RECORD_STRUCTS[8].pack(uid, 1, packed_time(moment), 0))
+        elif record_size == 16:
+            records.append(RECORD_STRUCTS[16].pack(int(user_id), packed_time(moment), 1, 0, b'\x00\x00', 0))
+        else:
+            records.append(RECORD_STRUCTS[40].pack(uid, user_id.encode(), 1, packed_time(moment), 0, b'\x00' * 8))
+    return b''.join(records)
+
+
+def read(data, **kwargs):
+    """Đọc data qua iter_punches -> (list (user_id, datetime), số lô)"""
+    batches = list(attlog_file.iter_punches(io.BytesIO(data), **kwargs))
+    punches = [(batch.user_ids[code], punch_pairing.from_epoch(epoch))
+               for batch in batches for code, epoch in zip(batch.user_codes, batch.epochs)]
+    return punches, len(batches)
+
+
+TEXT = (
+    b'        7\t2024-03-04 08:00:05\t1\t0\t1\t0\r\n'
+    b'       12\t2024-03-04 08:01:00\t1\t0\t1\t0\r\n'
+    b'\r\n'
+    b'malformed line without tab\r\n'
+    b'       12\t2024-03-04\r\n'  # thiếu giờ
+    b'       12\t2024-02-30 08:00:00\t1\t0\t1\t0\r\n'  # ngày không tồn tại
+    b'       12\t2024-03-04 ab:00:00\t1\t0\t1\t0\r\n'  # giờ không hợp lệ
+    b'         \t2024-03-04 09:00:00\t1\t0\t1\t0\r\n'  # thiếu ID
+    b'        7\t2024-03-05 17:30:59\t1\t0\t1\t0\r\n'
+    b'       15\t2024-03-06 07:59:00\n'
+    b'       12\t2024-03-06 17:00:00\t1\t0\t1\t0'
+)
+
+
+class TestDetectFormat(unittest.TestCase):
+
+    def test_text(self):
+        self.assertEqual(attlog_file.detect_format(TEXT[:256], len(TEXT)), 'text')
+
+    def test_buffer(self):
+        records = encode(16)
+        data = pack('<I', len(records)) + records
+        self.assertEqual(attlog_file.detect_format(data[:256], len(data)), 'buffer')
+
+    def test_records(self):
+        data = encode(40)
+        self.assertEqual(attlog_file.detect_format(data[:256], len(data)), 'records')
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            attlog_file.detect_format(b'\xff' * 40, 40)
+        with self.assertRaises(ValueError):
+            attlog_file.detect_format(b'', 0)
+
+
+class TestGuessRecordSize(unittest.TestCase):
+
+    def test_same_total_size(self):
+        # 80 byte chia hết cho cả 40 và 16: phân biệt bằng nội dung bản ghi đầu
+        records_16 = encode(16, PUNCHES[:5])
+        records_40 = encode(40, PUNCHES[:2])
+        self.assertEqual(len(records_16), len(records_40))
+        self.assertEqual(attlog_file.guess_record_size(records_16, len(records_16)), 16)
+        self.assertEqual(attlog_file.guess_record_size(records_40, len(records_40)), 40)
+
+    def test_record_8(self):
+        records = encode(8, PUNCHES[:3])
+        self.assertEqual(attlog_file.guess_record_size(records, len(records)), 8)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            attlog_file.guess_record_size(b'\x00' * 44, 44)
+
+
+class TestIterPunches(unittest.TestCase):
+
+    def test_text_skips_malformed_lines(self):
+        self.assertEqual(read(TEXT), (EXPECTED, 1))
+
+    def test_text_date_filter(self):
+        punches, _batches = read(TEXT, date_from=date(2024, 3, 5), date_to=date(2024, 3, 5))
+        self.assertEqual(punches, EXPECTED[2:3])
+
+    def test_text_batches(self):
+        self.assertEqual(read(TEXT, batch_size=2), (EXPECTED, 3))
+
+    def test_buffer(self):
+        for record_size in (16, 40):
+            with self.subTest(record_size=record_size):
+                records = encode(record_size)
+                self.assertEqual(read(pack('<I', len(records)) + records), (EXPECTED, 1))
+
+    def test_buffer_record_8(self):
+        records = encode(8)
+        punches, _batches = read(pack('<I', len(records)) + records, users_by_uid={1: '7', 2: '12', 3: '15'})
+        self.assertEqual(punches, EXPECTED)
+
+    def test_records_date_filter_and_batches(self):
+        punches, batches = read(encode(40), date_from=date(2024, 3, 5), batch_size=2)
+        self.assertEqual(punches, EXPECTED[2:])
+        # Lô đầu (2 bản ghi ngày 4/3) không còn lần chấm nào nên không được trả về
+        self.assertEqual(batches, 2)
+
+    def test_real_file(self):
+        # File thật được đọc qua mmap
+        records = encode(40)
+        fd, path = tempfile.mkstemp(suffix='.dat')
+        try:
+            with os.fdopen(fd, 'wb') as attlog:
+                attlog.write(pack('<I', len(records)) + records)
+            with open(path, 'rb') as attlog:
+                batches = list(attlog_file.iter_punches(attlog))
+        finally:
+            os.unlink(path)
+        self.assertEqual(sum(len(batch) for batch in batches), len(PUNCHES))
+
+
+if __name__ == '__main__':
+    unittest.main()
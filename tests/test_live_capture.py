@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử hàng đợi nhận chấm công trực tiếp (lib/live_capture.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+"""
+import unittest
+
+try:
+    from ..lib import live_capture
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import live_capture
+
+
+class TestDrain(unittest.TestCase):
+
+    def test_keeps_connections_in_event_order(self):
+        capture = live_capture.LiveCapture([])
+        for event in (
+            live_capture.Connected(1, 100),
+            live_capture.LiveEvent(1, '7', 1000),
+            live_capture.LiveEvent(2, '9', 1001),
+            live_capture.LiveEvent(1, '7', 1002),
+            # Kết nối lại thiết bị 1 sau 2 lần chấm, không đọc được số bản ghi
+            live_capture.Connected(1, None),
+            live_capture.LiveEvent(1, '8', 1003),
+        ):
+            capture.events.put(event)
+        batches = capture.drain(0)
+        self.assertEqual(sorted(batches), [1, 2])
+        self.assertEqual(batches[1].connections, [(100, 0), (None, 2)])
+        self.assertEqual(len(batches[1].punches), 3)
+        self.assertEqual(batches[2].connections, [])
+        self.assertEqual(list(batches[2].punches.epochs), [1001])
+        self.assertEqual(capture.drain(0), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử đổi giờ local <-> UTC quanh các mốc đổi giờ (lib/local_time.py), không cần Odoo.
+
+Kết quả được so với pytz cho từng thời điểm. Chạy từ thư mục module::
+
+    python -m unittest discover tests
+"""
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytz
+
+try:
+    from ..lib import local_time, punch_pairing
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import local_time, punch_pairing
+
+STEP_SECONDS = 15 * 60
+
+# (timezone, ngày tăng giờ, ngày lùi giờ) năm 2024
+DST_ZONES = [
+    ('America/New_York', datetime(2024, 3, 10), datetime(2024, 11, 3)),
+    ('Europe/Berlin', datetime(2024, 3, 31), datetime(2024, 10, 27)),
+    ('Australia/Sydney', datetime(2024, 10, 6), datetime(2024, 4, 7)),
+]
+
+
+def epochs_around(day):
+    """Mỗi 15 phút từ 12 giờ trước đến 36 giờ sau đầu ngày"""
+    start = punch_pairing.to_epoch(day - timedelta(hours=12))
+    return list(range(start, start + 48 * 3600, STEP_SECONDS))
+
+
+def pytz_to_local(tz, utc_epoch):
+    moment = pytz.utc.localize(punch_pairing.from_epoch(utc_epoch)).astimezone(tz)
+    return punch_pairing.to_epoch(moment.replace(tzinfo=None))
+
+
+def pytz_to_utc(tz, local_epoch):
+    # Giờ lặp lại: lần xuất hiện đầu (còn DST); giờ không tồn tại: theo độ lệch mới (đã sang DST)
+    moment = tz.localize(punch_pairing.from_epoch(local_epoch), is_dst=True)
+    return punch_pairing.to_epoch(moment.astimezone(pytz.utc).replace(tzinfo=None))
+
+
+class TestLocalTimeWindow(unittest.TestCase):
+
+    def check_zone(self, tz_name, day):
+        tz = pytz.timezone(tz_name)
+        epochs = epochs_around(day)
+        window = local_time.LocalTimeWindow(tz_name, epochs[0], epochs[-1])
+        self.assertFalse(window.is_fixed)
+        expected_local = [pytz_to_local(tz, epoch) for epoch in epochs]
+        expected_utc = [pytz_to_utc(tz, epoch) for epoch in epochs]
+        self.assertEqual([window.to_local(epoch) for epoch in epochs], expected_local)
+        self.assertEqual([window.to_utc(epoch) for epoch in epochs], expected_utc)
+        self.assertEqual([int(epoch) for epoch in window.to_local_many(epochs)], expected_local)
+        self.assertEqual([int(epoch) for epoch in window.to_utc_many(epochs)], expected_utc)
+
+    def test_spring_forward(self):
+        for tz_name, spring, _fall in DST_ZONES:
+            with self.subTest(tz=tz_name):
+                self.check_zone(tz_name, spring)
+
+    def test_fall_back(self):
+        for tz_name, _spring, fall in DST_ZONES:
+            with self.subTest(tz=tz_name):
+                self.check_zone(tz_name, fall)
+
+    def test_without_numpy(self):
+        with mock.patch.object(local_time, 'np', None):
+            self.test_spring_forward()
+            self.test_fall_back()
+
+    def test_skipped_and_repeated_local_times(self):
+        to_epoch, from_epoch = punch_pairing.to_epoch, punch_pairing.from_epoch
+        window = local_time.LocalTimeWindow(
+            'America/New_York', to_epoch(datetime(2024, 3, 1)), to_epoch(datetime(2024, 11, 30)))
+        # 02:30 ngày 10/3 không tồn tại: đổi theo EDT (UTC-4)
+        self.assertEqual(from_epoch(window.to_utc(to_epoch(datetime(2024, 3, 10, 2, 30)))),
+                         datetime(2024, 3, 10, 6, 30))
+        # 01:30 ngày 3/11 lặp lại: lấy lần đầu (EDT)
+        self.assertEqual(from_epoch(window.to_utc(to_epoch(datetime(2024, 11, 3, 1, 30)))),
+                         datetime(2024, 11, 3, 5, 30))
+
+    def test_fixed_offset(self):
+        for tz_name, offset in (('UTC', 0), ('Asia/Ho_Chi_Minh', 7 * 3600), ('Etc/GMT+5', -5 * 3600)):
+            with self.subTest(tz=tz_name):
+                epoch = punch_pairing.to_epoch(datetime(2024, 3, 4, 8, 0))
+                window = local_time.LocalTimeWindow(tz_name, epoch, epoch + punch_pairing.SECONDS_PER_DAY)
+                self.assertTrue(window.is_fixed)
+                self.assertEqual(window.to_local(epoch), epoch + offset)
+                self.assertEqual(window.to_utc(epoch), epoch - offset)
+                self.assertEqual([int(value) for value in window.to_utc_many([epoch])], [epoch - offset])
+
+
+if __name__ == '__main__':
+    unittest.main()
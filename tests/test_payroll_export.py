@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử ghi file xuất lương (lib/payroll_export.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+
+Kiểm thử XLSX được bỏ qua nếu chưa cài xlsxwriter.
+"""
+import csv
+import io
+import unittest
+import zipfile
+from datetime import datetime
+
+try:
+    from ..lib import payroll_export
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import payroll_export
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+ROWS = [
+    (1, 'An', '7', 'Cổng', datetime(2024, 3, 4, 1, 0), datetime(2024, 3, 4, 10, 0), 9.0, 25000.0, 225000.0, False),
+    (1, 'An', '7', 'Cổng', datetime(2024, 3, 5, 1, 0), datetime(2024, 3, 5, 16, 59, 59), 15.99, 25000.0, 399750.0, True),
+    (2, 'Bình', '9', 'Kho', datetime(2024, 3, 4, 2, 0), None, 0.0, 30000.0, 0.0, False),
+]
+
+
+class TestSubtotals(unittest.TestCase):
+
+    def test_subtotal_after_each_employee(self):
+        # Dòng của một nhân viên có thể nằm ở hai lô liên tiếp
+        batches = list(payroll_export.with_subtotals([ROWS[:1], ROWS[1:]]))
+        rows = [row for batch in batches for row in batch]
+        self.assertEqual(rows[0], ROWS[0])
+        self.assertEqual(rows[1], ROWS[1])
+        self.assertIsNone(rows[2][0])
+        self.assertEqual(rows[2][1], 'Tổng An')
+        self.assertAlmostEqual(rows[2][payroll_export.HOURS_INDEX], 24.99)
+        self.assertAlmostEqual(rows[2][payroll_export.SALARY_INDEX], 624750.0)
+        self.assertEqual(rows[3], ROWS[2])
+        self.assertEqual(rows[4][1], 'Tổng Bình')
+        self.assertEqual(len(rows), 5)
+
+    def test_no_rows(self):
+        self.assertEqual(list(payroll_export.with_subtotals([[], []])), [[], []])
+
+
+class TestCsv(unittest.TestCase):
+
+    def test_rows(self):
+        content = b''.join(payroll_export.iter_csv(payroll_export.with_subtotals([ROWS])))
+        self.assertTrue(content.startswith('\ufeff'.encode()))
+        rows = list(csv.reader(io.StringIO(content.decode()[1:])))
+        self.assertEqual(rows[0], [title for _key, title in payroll_export.EXPORT_COLUMNS])
+        self.assertEqual(rows[1], [
+            '1', 'An', '7', 'Cổng', '2024-03-04 01:00:00', '2024-03-04 10:00:00', '9.0', '25000.0', '225000.0', ''])
+        self.assertEqual(rows[2][-1], 'x')
+        self.assertEqual(rows[3][:2], ['', 'Tổng An'])
+        self.assertEqual(rows[4][5], '')
+        self.assertEqual(len(rows), 6)
+
+
+@unittest.skipIf(xlsxwriter is None, 'xlsxwriter không được cài đặt')
+class TestXlsx(unittest.TestCase):
+
+    def test_rows(self):
+        content = b''.join(payroll_export.iter_xlsx(payroll_export.with_subtotals([ROWS])))
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        # Dòng tiêu đề, 3 dòng chấm công, 2 dòng tổng
+        self.assertEqual(sheet.count('<row '), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử quy tắc ghép cặp chấm công (lib/punch_pairing.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+
+Mỗi trường hợp chạy với cả cài đặt Python thuần và NumPy (bỏ qua nếu không có NumPy).
+tests/__init__.py không import các kiểm thử này nên Odoo không chạy chúng cùng module.
+"""
+import random
+import unittest
+from datetime import datetime
+from itertools import groupby
+
+try:
+    from ..lib import punch_pairing
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import punch_pairing
+
+THRESHOLD = 60
+DAY = punch_pairing.SECONDS_PER_DAY
+
+
+def epoch(*args):
+    return punch_pairing.to_epoch(datetime(*args))
+
+
+def end_of_day(*args):
+    return epoch(*args, 23, 59, 59)
+
+
+class PairPunchesMixin:
+    """Các trường hợp dùng chung; lớp con chọn cài đặt qua ``pair``"""
+
+    pair = None
+
+    def run_pairing(self, punches, threshold=THRESHOLD, presorted=False):
+        """punches: list (mã user, epoch) -> (list phiên, list phân loại)"""
+        user_codes = [code for code, _epoch in punches]
+        epochs = [punch_epoch for _code, punch_epoch in punches]
+        result = type(self).pair(user_codes, epochs, threshold, presorted)
+        classifications = [int(value) for value in result.classifications]
+        return list(result), classifications
+
+    def test_empty(self):
+        sessions, classifications = self.run_pairing([])
+        self.assertEqual(sessions, [])
+        self.assertEqual(classifications, [])
+
+    def test_checkin_checkout(self):
+        sessions, classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 8, 0)),
+            (0, epoch(2024, 3, 4, 17, 0)),
+        ])
+        self.assertEqual(sessions, [(0, epoch(2024, 3, 4, 8, 0), epoch(2024, 3, 4, 17, 0), False)])
+        self.assertEqual(classifications, [punch_pairing.PUNCH_CHECKIN, punch_pairing.PUNCH_CHECKOUT])
+
+    def test_debounce(self):
+        sessions, classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 8, 0, 0)),
+            (0, epoch(2024, 3, 4, 8, 0, 30)),
+            (0, epoch(2024, 3, 4, 17, 0, 0)),
+        ])
+        self.assertEqual(sessions, [(0, epoch(2024, 3, 4, 8, 0), epoch(2024, 3, 4, 17, 0), False)])
+        self.assertEqual(classifications, [
+            punch_pairing.PUNCH_CHECKIN, punch_pairing.PUNCH_DUPLICATE, punch_pairing.PUNCH_CHECKOUT])
+
+    def test_debounce_chains_from_previous_duplicate(self):
+        # 08:01:40 cách lần chấm đầu 100 giây nhưng chỉ cách lần trùng liền trước 50 giây
+        sessions, classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 8, 0, 0)),
+            (0, epoch(2024, 3, 4, 8, 0, 50)),
+            (0, epoch(2024, 3, 4, 8, 1, 40)),
+        ])
+        self.assertEqual(sessions, [(0, epoch(2024, 3, 4, 8, 0), end_of_day(2024, 3, 4), True)])
+        self.assertEqual(classifications, [
+            punch_pairing.PUNCH_AUTO_CLOSED, punch_pairing.PUNCH_DUPLICATE, punch_pairing.PUNCH_DUPLICATE])
+
+    def test_threshold_is_exclusive(self):
+        sessions, _classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 8, 0, 0)),
+            (0, epoch(2024, 3, 4, 8, 1, 0)),
+        ])
+        self.assertEqual(sessions, [(0, epoch(2024, 3, 4, 8, 0), epoch(2024, 3, 4, 8, 1), False)])
+
+    def test_odd_punch_count_auto_closes_last_checkin(self):
+        sessions, classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 8, 0)),
+            (0, epoch(2024, 3, 4, 12, 0)),
+            (0, epoch(2024, 3, 4, 13, 0)),
+        ])
+        self.assertEqual(sessions, [
+            (0, epoch(2024, 3, 4, 8, 0), epoch(2024, 3, 4, 12, 0), False),
+            (0, epoch(2024, 3, 4, 13, 0), end_of_day(2024, 3, 4), True),
+        ])
+        self.assertEqual(classifications, [
+            punch_pairing.PUNCH_CHECKIN, punch_pairing.PUNCH_CHECKOUT, punch_pairing.PUNCH_AUTO_CLOSED])
+
+    def test_day_boundary_splits_sessions(self):
+        # Ca qua nửa đêm không được ghép: mỗi ngày một checkin tự đóng
+        sessions, classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 22, 0)),
+            (0, epoch(2024, 3, 5, 6, 0)),
+        ])
+        self.assertEqual(sessions, [
+            (0, epoch(2024, 3, 4, 22, 0), end_of_day(2024, 3, 4), True),
+            (0, epoch(2024, 3, 5, 6, 0), end_of_day(2024, 3, 5), True),
+        ])
+        self.assertEqual(classifications, [punch_pairing.PUNCH_AUTO_CLOSED] * 2)
+
+    def test_debounce_does_not_cross_day_boundary(self):
+        sessions, classifications = self.run_pairing([
+            (0, epoch(2024, 3, 4, 23, 59, 50)),
+            (0, epoch(2024, 3, 5, 0, 0, 10)),
+        ])
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(classifications, [punch_pairing.PUNCH_AUTO_CLOSED] * 2)
+
+    def test_users_are_paired_separately(self):
+        sessions, _classifications = self.run_pairing([
+            (1, epoch(2024, 3, 4, 8, 0)),
+            (0, epoch(2024, 3, 4, 8, 0, 10)),
+            (1, epoch(2024, 3, 4, 17, 0)),
+        ])
+        self.assertEqual(sessions, [
+            (0, epoch(2024, 3, 4, 8, 0, 10), end_of_day(2024, 3, 4), True),
+            (1, epoch(2024, 3, 4, 8, 0), epoch(2024, 3, 4, 17, 0), False),
+        ])
+
+    def test_unsorted_input_keeps_input_order_for_classifications(self):
+        punches = [
+            (0, epoch(2024, 3, 4, 17, 0)),
+            (0, epoch(2024, 3, 4, 8, 0)),
+            (0, epoch(2024, 3, 4, 8, 0, 5)),
+        ]
+        user_codes = [code for code, _epoch in punches]
+        epochs = [punch_epoch for _code, punch_epoch in punches]
+        result = type(self).pair(user_codes, epochs, THRESHOLD)
+        self.assertEqual([int(index) for index in result.check_in_indexes], [1])
+        self.assertEqual([int(value) for value in result.classifications], [
+            punch_pairing.PUNCH_CHECKOUT, punch_pairing.PUNCH_CHECKIN, punch_pairing.PUNCH_DUPLICATE])
+        self.assertEqual(result.count_punches(punch_pairing.PUNCH_DUPLICATE), 1)
+
+    def test_presorted_matches_sorted(self):
+        punches = sorted(_random_punches(random.Random(7), 500))
+        self.assertEqual(
+            self.run_pairing(punches, presorted=True),
+            self.run_pairing(punches),
+        )
+
+
+class TestPairPunchesPython(PairPunchesMixin, unittest.TestCase):
+    pair = staticmethod(punch_pairing._pair_punches_python)
+
+
+@unittest.skipIf(punch_pairing.np is None, 'NumPy không được cài đặt')
+class TestPairPunchesNumpy(PairPunchesMixin, unittest.TestCase):
+    pair = staticmethod(punch_pairing._pair_punches_numpy)
+
+
+def _random_punches(rng, count, users=20, days=10):
+    start = epoch(2024, 3, 1)
+    punches = []
+    for _index in range(count):
+        # Dồn lần chấm vào vài khung giờ để có cả lần chấm trùng
+        hour = rng.choice((7, 8, 12, 13, 17, 23))
+        seconds = hour * 3600 + rng.randrange(0, 3600) // rng.choice((1, 30))
+        punches.append((rng.randrange(users), start + rng.randrange(days) * DAY + seconds))
+    return punches
+
+
+class TestImplementationsAgree(unittest.TestCase):
+
+    def test_random_punches(self):
+        if punch_pairing.np is None:
+            self.skipTest('NumPy không được cài đặt')
+        rng = random.Random(2024)
+        for count in (1, 2, 17, 1000, 5000):
+            punches = _random_punches(rng, count)
+            user_codes = [code for code, _epoch in punches]
+            epochs = [punch_epoch for _code, punch_epoch in punches]
+            expected = punch_pairing._pair_punches_python(user_codes, epochs, THRESHOLD)
+            actual = punch_pairing._pair_punches_numpy(user_codes, epochs, THRESHOLD)
+            self.assertEqual(list(actual), list(expected))
+            self.assertEqual(list(map(int, actual.classifications)), list(expected.classifications))
+            self.assertEqual(list(map(int, actual.check_in_indexes)), list(expected.check_in_indexes))
+
+
+class TestPairPunches(unittest.TestCase):
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            punch_pairing.pair_punches([0, 0], [epoch(2024, 3, 4, 8, 0)], THRESHOLD)
+
+    def test_merge_streams_pairs_across_devices(self):
+        # Chấm vào ở máy 1, chấm ra ở máy 2
+        device_1 = [('7', epoch(2024, 3, 4, 8, 0), 1), ('9', epoch(2024, 3, 4, 9, 0), 1)]
+        device_2 = [('7', epoch(2024, 3, 4, 17, 0), 2)]
+        punches, sources = punch_pairing.merge_streams([device_1, device_2])
+        self.assertEqual(list(sources), [1, 2, 1])
+        result = punch_pairing.pair_punches(punches.user_codes, punches.epochs, THRESHOLD, presorted=True)
+        sessions = [(punches.user_ids[code], check_in, check_out, auto_closed)
+                    for code, check_in, check_out, auto_closed in result]
+        self.assertEqual(sessions, [
+            ('7', epoch(2024, 3, 4, 8, 0), epoch(2024, 3, 4, 17, 0), False),
+            ('9', epoch(2024, 3, 4, 9, 0), end_of_day(2024, 3, 4), True),
+        ])
+
+    def test_merge_streams_mixed_alphanumeric_ids(self):
+        # Lần chấm cách nhau 10 giây ở 3 máy. Mỗi dòng sắp theo so sánh str (như ORDER BY ... COLLATE "C"): '10' < '9', 'NV-02' < 'NV01'
+        user_ids = ['NV01', 'NV-02', '9', '10', 'nv01', 'NV1']
+        streams = []
+        expected = {}
+        for device_id in (1, 2, 3):
+            stream = []
+            for position, user_id in enumerate(user_ids):
+                check_in = epoch(2024, 3, 4, 7, position, device_id * 10)
+                stream.append((user_id, check_in, device_id))
+                expected.setdefault(user_id, []).append(check_in)
+            streams.append(sorted(stream))
+        punches, sources = punch_pairing.merge_streams(streams)
+
+        # Mỗi user là một nhóm liền nhau, thời điểm tăng dần
+        groups = [punches.user_ids[code] for code, _group in groupby(punches.user_codes)]
+        self.assertEqual(groups, sorted(user_ids))
+        for user_id, check_ins in expected.items():
+            code = punches.user_code(user_id)
+            self.assertEqual([punch_epoch for punch_code, punch_epoch in zip(punches.user_codes, punches.epochs)
+                              if punch_code == code], sorted(check_ins))
+        self.assertEqual(sorted(sources), [1] * 6 + [2] * 6 + [3] * 6)
+
+        result = punch_pairing.pair_punches(punches.user_codes, punches.epochs, THRESHOLD, presorted=True)
+        self.assertEqual(result.count_punches(punch_pairing.PUNCH_DUPLICATE), 12)
+        self.assertEqual(len(result), len(user_ids))
+
+    def test_punch_buffer_since(self):
+        punches = punch_pairing.PunchBuffer()
+        punches.append('7', datetime(2024, 3, 4, 8, 0))
+        punches.append('9', datetime(2024, 3, 5, 8, 0))
+        recent = punches.since(epoch(2024, 3, 5))
+        self.assertEqual(len(recent), 1)
+        self.assertEqual(recent.user_ids[recent.user_codes[0]], '9')
+        self.assertEqual(punch_pairing.from_epoch(recent.epochs[0]), datetime(2024, 3, 5, 8, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Kiểm thử so sánh roster trên máy với danh sách nhân viên (lib/roster.py), không cần Odoo.
+
+Chạy từ thư mục module::
+
+    python -m unittest discover tests
+"""
+import unittest
+
+try:
+    from ..lib import roster
+except ImportError:
+    # Chạy bằng python -m unittest từ thư mục module
+    from lib import roster
+
+RosterUser = roster.RosterUser
+
+
+class TestRosterDiff(unittest.TestCase):
+
+    def test_adds_missing_users_after_highest_uid(self):
+        users = [RosterUser(1, '1', 'An', 0), RosterUser(5, '5', 'Bình', 0)]
+        additions, removals = roster.diff(users, {'1': 'An', '5': 'Bình', '9': 'Chi', '10': 'Dũng'}, set())
+        self.assertEqual(additions, [
+            RosterUser(6, '10', 'Dũng', roster.USER_PRIVILEGE_DEFAULT),
+            RosterUser(7, '9', 'Chi', roster.USER_PRIVILEGE_DEFAULT),
+        ])
+        self.assertEqual(removals, [])
+
+    def test_empty_device_starts_at_uid_one(self):
+        additions, _removals = roster.diff([], {'7': 'An'}, set())
+        self.assertEqual(additions, [RosterUser(1, '7', 'An', roster.USER_PRIVILEGE_DEFAULT)])
+
+    def test_removes_only_removable_users(self):
+        users = [RosterUser(1, '1', 'An', 0), RosterUser(2, '2', 'Bình', 0), RosterUser(3, '3', 'Admin', 14)]
+        additions, removals = roster.diff(users, {'1': 'An'}, {'1', '2'})
+        self.assertEqual(additions, [])
+        # '1' vẫn cần có trên máy, '3' không thuộc nhân viên đã lưu trữ
+        self.assertEqual(removals, [RosterUser(2, '2', 'Bình', 0)])
+
+    def test_truncates_long_names(self):
+        additions, _removals = roster.diff([], {'1': 'x' * 40, '2': False}, set())
+        self.assertEqual(len(additions[0].name), roster.USER_NAME_MAX_LENGTH)
+        self.assertEqual(additions[1].name, '')
+
+    def test_uid_overflow(self):
+        users = [RosterUser(roster.USER_UID_MAX, '1', 'An', 0)]
+        with self.assertRaises(ValueError):
+            roster.diff(users, {'1': 'An', '2': 'Bình'}, set())
+
+
+class TestRosterChecksum(unittest.TestCase):
+
+    def test_ignores_order(self):
+        users = [RosterUser(1, '1', 'An', 0), RosterUser(2, '2', 'Bình', 0)]
+        self.assertEqual(roster.checksum(users), roster.checksum(list(reversed(users))))
+
+    def test_detects_changes(self):
+        users = [RosterUser(1, '1', 'An', 0)]
+        self.assertNotEqual(roster.checksum(users), roster.checksum([RosterUser(1, '1', 'An', 14)]))
+        self.assertNotEqual(roster.checksum(users), roster.checksum([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
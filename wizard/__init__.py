@@ -0,0 +1,2 @@
+from . import trcf_zkteco_attlog_import_wizard
+from . import trcf_attendance_payroll_export_wizard
\ No newline at end of file
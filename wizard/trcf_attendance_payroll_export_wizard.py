@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from urllib.parse import urlencode
+
+from odoo import models, fields
+
+
+class TrcfAttendancePayrollExportWizard(models.TransientModel):
+    """Xuất chấm công và tiền lương (thay cho export chung của Odoo với khoảng thời gian lớn)"""
+    _name = 'trcf.attendance.payroll.export.wizard'
+    _description = 'Xuất chấm công và tiền lương'
+
+    date_from = fields.Date(
+        string='Từ ngày',
+        required=True,
+        default=lambda self: fields.Date.context_today(self).replace(day=1)
+    )
+
+    date_to = fields.Date(
+        string='Đến ngày',
+        required=True,
+        default=fields.Date.context_today
+    )
+
+    employee_ids = fields.Many2many(
+        'hr.employee',
+        string='Nhân viên',
+        help='Để trống: xuất tất cả nhân viên'
+    )
+
+    file_format = fields.Selection(
+        [('csv', 'CSV'), ('xlsx', 'Excel (XLSX)')],
+        string='Định dạng',
+        default='csv',
+        required=True,
+        help='CSV được gửi ngay trong lúc đọc dữ liệu; XLSX được gửi sau khi ghi xong file'
+    )
+
+    subtotals = fields.Boolean(
+        string='Dòng tổng theo nhân viên',
+        default=True
+    )
+
+    def action_export(self):
+        self.ensure_one()
+        params = {
+            'date_from': fields.Date.to_string(self.date_from),
+            'date_to': fields.Date.to_string(self.date_to),
+            'file_format': self.file_format,
+            'employee_ids': ','.join(str(employee_id) for employee_id in self.employee_ids.ids),
+            'subtotals': '1' if self.subtotals else '',
+        }
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/trcf_zkteco_attendance_sync/payroll_export?{urlencode(params)}',
+            'target': 'download',
+        }
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import io
+from contextlib import contextmanager
+
+from odoo import models, fields
+from odoo.exceptions import UserError
+
+
+class TrcfZktecoAttlogImportWizard(models.TransientModel):
+    """Nhập file chấm công xuất từ thiết bị ra USB (cho nơi không kết nối mạng được tới máy)"""
+    _name = 'trcf.zkteco.attlog.import.wizard'
+    _description = 'Nhập file chấm công ZKTeco'
+
+    device_id = fields.Many2one(
+        'trcf.zkteco.device',
+        string='Thiết bị',
+        required=True,
+        ondelete='cascade',
+        help='Thiết bị đã xuất file; giờ trong file được hiểu theo timezone của thiết bị này'
+    )
+
+    attlog_file = fields.Binary(
+        string='File chấm công',
+        required=True,
+        attachment=True,
+        help='attlog.dat dạng văn bản hoặc file nhật ký nhị phân xuất từ máy'
+    )
+
+    filename = fields.Char(string='Tên file')
+
+    date_from = fields.Date(
+        string='Từ ngày',
+        help='Bỏ qua lần chấm công trước ngày này (để trống: không giới hạn)'
+    )
+
+    date_to = fields.Date(
+        string='Đến ngày',
+        help='Bỏ qua lần chấm công sau ngày này (để trống: không giới hạn)'
+    )
+
+    def action_import(self):
+        self.ensure_one()
+        with self._open_attlog_file() as fileobj:
+            try:
+                result = self.device_id._import_attlog_file(fileobj, self.date_from, self.date_to)
+            except ValueError as e:
+                raise UserError(str(e))
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': '✅ Nhập file thành công',
+                'message': self.device_id._format_sync_result(result),
+                'type': 'success',
+                'sticky': True,
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }
+
+    @contextmanager
+    def _open_attlog_file(self):
+        """Mở file đã tải lên từ filestore để đọc tuần tự, không giải mã base64 cả file"""
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'attlog_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as fileobj:
+                yield fileobj
+        else:
+            yield io.BytesIO(attachment.raw or b'')